@@ -0,0 +1,170 @@
+import numpy as np
+
+from OptionPriceCalculator import OptionPriceCalculator
+from PositionProfitCalculator import PositionProfitCalculator
+
+# 每年交易分钟数，用于把分钟K线换算成年（交易时间口径，期限也应按 交易日 / 252 表示）
+MINUTES_PER_YEAR = 252 * 390
+
+
+class DeltaHedgeSimulator:
+
+    def __init__(self, T, r, sigma, K=None, moneyness=1.0, option_type='put', option_quantity=1, multiplier=100,
+                 rebalance_every=1, commission=0.0, commission_per_share=0.0, spread=0.0, round_shares=False):
+        """
+        模拟买入期权后用股票做Delta对冲，并按固定间隔再平衡的整个过程。所有路径同时计算，只在时间步上循环。
+
+        参数:
+        T (float): 建仓时期权的剩余期限（年），必须与run的dt使用同一时间口径：分钟K线按交易时间计，
+                   一年为 MINUTES_PER_YEAR 个交易分钟，例如剩余5个交易日为 5 / 252 而不是 7 / 365。
+        r (float): 无风险利率，现金账户按此利率计息。
+        sigma (float): 定价和计算Delta使用的波动率（隐含波动率）。
+        K (float): 行权价；None时每条路径按 起始股价 × moneyness 设定（用于历史路径起始价各不相同的情况）。
+        moneyness (float): K为None时行权价相对起始股价的比例。
+        option_type (str): 'put' 或 'call'。
+        option_quantity (float): 买入的合约数，负数表示卖出。
+        multiplier (int): 每张合约对应的股数。
+        rebalance_every (int): 每隔多少个时间步再平衡一次。
+        commission (float): 每笔股票交易的固定佣金。
+        commission_per_share (float): 每股佣金。
+        spread (float): 股票买卖价差占股价的比例，每次交易付出一半价差。
+        round_shares (bool): 对冲股数是否取整。
+        """
+        self.T = T
+        self.r = r
+        self.sigma = sigma
+        self.K = K
+        self.moneyness = moneyness
+        self.option_type = option_type
+        self.option_quantity = option_quantity
+        self.multiplier = multiplier
+        self.rebalance_every = rebalance_every
+        self.commission = commission
+        self.commission_per_share = commission_per_share
+        self.spread = spread
+        self.round_shares = round_shares
+
+    @staticmethod
+    def historical_paths(prices, num_steps, stride=1, sessions=None):
+        # 用滑动窗口把一段历史价格切成多条长度为 num_steps+1 的路径（视图，不复制数据）
+        # 传入sessions（每根K线所属的交易日）时只保留首尾在同一交易日的窗口，避免把隔夜跳空当成一个时间步的价格变动
+        windows = np.lib.stride_tricks.sliding_window_view(np.asarray(prices, dtype=float), num_steps + 1)[::stride]
+        if sessions is None:
+            return windows
+        sessions = np.asarray(sessions)
+        starts = np.arange(len(windows)) * stride
+        return windows[sessions[starts] == sessions[starts + num_steps]]
+
+    def _hedge_shares(self, S, K, T):
+        # 抵消期权Delta所需的股数
+        delta = OptionPriceCalculator.get_delta(S, K, T, self.r, self.sigma, self.option_type)
+        shares = -self.option_quantity * self.multiplier * delta
+        return np.round(shares) if self.round_shares else shares
+
+    def _trading_cost(self, traded, S):
+        traded = np.abs(traded)
+        return (np.where(traded > 0, self.commission, 0.0) + traded * self.commission_per_share
+                + 0.5 * self.spread * S * traded)
+
+    def run(self, paths, dt):
+        """
+        参数:
+        paths (np.ndarray): 形状 (路径数, 时间步数+1) 的股价路径，例如 MonteCarloEngine.simulate_paths 的结果
+                            或 historical_paths 切出的历史窗口。
+        dt (float): 每个时间步的长度（年），分钟K线为 1 / MINUTES_PER_YEAR。T、dt以及sigma、r的年化都按同一口径，
+                    到期、时间价值衰减和"路径不超过到期日"的检查才一致。
+
+        返回:
+        dict: 每条路径一个值的数组 'hedge_error'（对冲组合期末价值，建仓时价值为0，理想对冲下接近0）、
+              'unhedged_pnl'（只持有期权的收益）、'costs'（交易成本合计）、'num_trades'（交易次数），
+              以及 'summary' 对冲误差分布的统计量。
+        """
+        paths = np.asarray(paths, dtype=float)
+        num_paths, num_points = paths.shape
+        num_steps = num_points - 1
+        if num_steps * dt > self.T + 1e-12:
+            raise ValueError("Paths extend beyond the option expiry")
+        S0 = paths[:, 0]
+        K = S0 * self.moneyness if self.K is None else np.full(num_paths, float(self.K))
+        contract_shares = self.option_quantity * self.multiplier
+
+        premium = OptionPriceCalculator.black_scholes_batch(S0, K, self.T, self.r, self.sigma, self.option_type)
+        shares = self._hedge_shares(S0, K, self.T)
+        costs = self._trading_cost(shares, S0)
+        num_trades = (shares != 0).astype(int)
+        # 建仓：支付期权费、买卖对冲股票，初始组合价值为0
+        cash = -contract_shares * premium - shares * S0 - costs
+        growth = np.exp(self.r * dt)
+
+        for step in range(1, num_steps + 1):
+            S = paths[:, step]
+            cash *= growth
+            remaining = self.T - step * dt
+            if step % self.rebalance_every == 0 and step < num_steps and remaining > 0:
+                new_shares = self._hedge_shares(S, K, remaining)
+                traded = new_shares - shares
+                trade_costs = self._trading_cost(traded, S)
+                cash -= traded * S + trade_costs
+                costs += trade_costs
+                num_trades += traded != 0
+                shares = new_shares
+
+        # 期末：按剩余期限给期权估值（到期则为内在价值），平掉对冲股票
+        S_end = paths[:, -1]
+        remaining = self.T - num_steps * dt
+        option_end = PositionProfitCalculator.option_value(S_end, K, remaining if remaining > 1e-12 else 0, self.r,
+                                                           self.sigma, self.option_type)
+        closing_costs = self._trading_cost(shares, S_end)
+        costs += closing_costs
+        num_trades += shares != 0
+        hedge_error = contract_shares * option_end + shares * S_end - closing_costs + cash
+        unhedged_pnl = contract_shares * (option_end - premium * np.exp(self.r * num_steps * dt))
+
+        return {
+            'hedge_error': hedge_error,
+            'unhedged_pnl': unhedged_pnl,
+            'costs': costs,
+            'num_trades': num_trades,
+            'summary': self.summarize(hedge_error),
+        }
+
+    @staticmethod
+    def summarize(values):
+        percentiles = np.percentile(values, [1, 5, 50, 95, 99])
+        return {
+            'mean': float(np.mean(values)),
+            'std': float(np.std(values)),
+            'p1': float(percentiles[0]), 'p5': float(percentiles[1]), 'median': float(percentiles[2]),
+            'p95': float(percentiles[3]), 'p99': float(percentiles[4]),
+        }
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+    from MonteCarloEngine import MonteCarloEngine
+
+    # 模拟路径：30天期看跌期权，每天78个5分钟时间步，波动率与定价波动率相同时对冲误差随再平衡频率下降
+    S0, K, T, r, sigma = 123.0, 118, 30 / 365, 0.05, 0.4614
+    num_steps = 30 * 78
+    engine = MonteCarloEngine(S0, r, sigma, T, num_steps=num_steps, seed=42)
+    paths = engine.simulate_paths(10_000)
+    for rebalance_every in (1, 13, 78, 390):
+        simulator = DeltaHedgeSimulator(T, r, sigma, K=K, option_quantity=10, rebalance_every=rebalance_every,
+                                        commission_per_share=0.005, spread=0.0002)
+        start = time.perf_counter()
+        result = simulator.run(paths, T / num_steps)
+        summary = result['summary']
+        print(f"Rebalance every {rebalance_every:>3} steps: hedge error mean {summary['mean']:8.2f}, "
+              f"std {summary['std']:8.2f}, 1% {summary['p1']:9.2f}, costs {result['costs'].mean():7.2f}, "
+              f"unhedged std {result['unhedged_pnl'].std():8.2f} ({time.perf_counter() - start:.2f}s)")
+
+    # 历史路径：AAPL分钟K线，每条路径为同一交易日内的360分钟（不跨隔夜），每15分钟再平衡一次，
+    # 期权剩余5个交易日；步长是交易分钟，期限也按交易时间计（5 / 252），两者在同一时钟上
+    bars = pd.read_csv('../tradingBot/test/AAPL_minute_data.csv')
+    historical = DeltaHedgeSimulator.historical_paths(bars['Close'].to_numpy(), 360, stride=5,
+                                                      sessions=bars['Datetime'].str[:10])
+    simulator = DeltaHedgeSimulator(5 / 252, r, 0.2, moneyness=1.0, rebalance_every=15, commission_per_share=0.005,
+                                    spread=0.0002)
+    result = simulator.run(historical, 1 / MINUTES_PER_YEAR)
+    print(f"AAPL minute bars, {len(historical)} paths: {result['summary']}")
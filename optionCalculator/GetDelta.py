@@ -5,6 +5,8 @@ if __name__ == "__main__":
     import pandas as pd
     import matplotlib.pyplot as plt
     from OptionPriceCalculator import OptionPriceCalculator
+    from OptionChainLoader import OptionChainLoader
+    from GreeksCache import GreeksCache
 
     # 获取NVIDIA的当前股价
     ticker = 'NVDA'
@@ -16,12 +18,11 @@ if __name__ == "__main__":
 
     # 获取期权链
     expiration = '2024-07-19'
-    options = stock.option_chain(expiration)
-    puts = options.puts
+    chains = OptionChainLoader().load([ticker], [expiration])
+    puts = chains[chains['optionType'] == 'put']
 
     # 获取行权价格在100到130之间的看跌期权市场价格
     strike_prices = np.arange(100, 131, 1)
-    implied_vols = []
 
     expiration_date = pd.to_datetime(expiration)
     current_date = pd.Timestamp('now')
@@ -30,33 +31,28 @@ if __name__ == "__main__":
     calc = OptionPriceCalculator()
     risk_free_rate = calc.get_risk_free_rate(days_to_expiration)
 
-    for strike_price in strike_prices:
-        try:
-            put_option_market_price = puts[puts['strike'] == strike_price]['lastPrice'].values[0]
-            implied_vol = calc.implied_volatility(put_option_market_price, current_stock_price, strike_price,
-                                                  days_to_expiration / 365, risk_free_rate, option_type='put')
-            implied_vols.append(implied_vol)
-        except IndexError:
-            print(f"No market price available for strike price {strike_price}")
-            implied_vols.append(None)
+    # 一次求解所有行权价的隐含波动率，无报价或违反无套利边界的行权价为NaN
+    put_prices = puts.drop_duplicates('strike').set_index('strike')['lastPrice'].reindex(strike_prices).values
+    implied_vols, iv_status = calc.implied_volatility_batch(put_prices, current_stock_price, strike_prices,
+                                                            days_to_expiration / 365, risk_free_rate,
+                                                            option_type='put')
+    for strike_price, status in zip(strike_prices, iv_status):
+        if status != calc.IV_CONVERGED:
+            print(f"No implied volatility for strike price {strike_price}: {calc.IV_STATUS_MESSAGES[status]}")
 
-    # 计算Delta和Gamma
-    deltas = []
-    gammas = []
+    # 一次计算所有行权价的Delta和Gamma
+    # 反复运行时输入没有变化的行权价直接从磁盘缓存读取
+    greeks_cache = GreeksCache(disk_path=GreeksCache.DEFAULT_DISK_PATH)
+    option_greeks = greeks_cache.greeks(current_stock_price, strike_prices, days_to_expiration / 365,
+                                        risk_free_rate, implied_vols, option_type='put')
+    deltas = option_greeks['delta']
+    gammas = option_greeks['gamma']
 
-    for i, strike_price in enumerate(strike_prices):
-        if implied_vols[i] is not None:
-            delta = calc.get_delta(current_stock_price, strike_price, days_to_expiration / 365, risk_free_rate,
-                                   implied_vols[i], option_type='put')
-            gamma = calc.get_gamma(current_stock_price, strike_price, days_to_expiration / 365, risk_free_rate,
-                                   implied_vols[i])
-            deltas.append(delta)
-            gammas.append(gamma)
+    for strike_price, delta, gamma in zip(strike_prices, deltas, gammas):
+        if not np.isnan(delta):
             # 打印每个行权价对应的Delta和Gamma
             print(f"Strike Price: {strike_price}, Delta: {delta:.4f}, Gamma: {gamma:.4f}")
         else:
-            deltas.append(None)
-            gammas.append(None)
             print(f"Strike Price: {strike_price}, Delta: N/A, Gamma: N/A")
 
     # 绘制Delta和Gamma图
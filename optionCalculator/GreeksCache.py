@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from OptionPriceCalculator import OptionPriceCalculator
+
+GREEK_NAMES = ('price', 'delta', 'gamma', 'vega', 'theta', 'rho', 'vanna', 'volga')
+KEY_COLUMNS = ('model_version', 'steps', 's', 'k', 't', 'r', 'sigma', 'is_call')
+
+
+class GreeksCache:
+    DEFAULT_DISK_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'investPortfolio', 'greeks.sqlite')
+    # 输入量化的步长：两次输入的差小于步长时视为同一个合约状态
+    DEFAULT_STEPS = {'S': 1e-4, 'K': 1e-4, 'T': 1e-6, 'r': 1e-6, 'sigma': 1e-6}
+    # 定价公式的版本，是缓存键的一部分：修改OptionPriceCalculator.greeks的计算方式时加1，旧结果（包括磁盘层）不再使用
+    MODEL_VERSION = 2
+
+    def __init__(self, max_size=100_000, ttl=None, steps=None, disk_path=None):
+        """
+        OptionPriceCalculator.greeks 的LRU/TTL缓存，键为 (MODEL_VERSION, 量化步长, 量化后的S, K, T, r, sigma, 看涨/看跌)。
+
+        未命中的合约合并成一次批量计算，并且按量化后的输入计算，保证同一个键的结果与实际输入无关。
+
+        参数:
+        max_size (int): 内存中最多保存的合约数，超出时淘汰最久未使用的。
+        ttl (float): 有效期（秒），None表示不过期。
+        steps (dict): 覆盖DEFAULT_STEPS中的量化步长，例如 {'S': 0.01}。
+        disk_path (str): sqlite3文件路径，启用持久化的第二层缓存（跨进程、跨运行共享）；None表示只用内存。
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.steps = {**self.DEFAULT_STEPS, **(steps or {})}
+        # 量化步长不同，同一个整数键对应的输入也不同，因此步长也是键的一部分
+        self._key_prefix = (self.MODEL_VERSION, ','.join(f'{name}={self.steps[name]!r}'
+                                                         for name in ('S', 'K', 'T', 'r', 'sigma')))
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+        self._connection = None
+        if disk_path is not None:
+            os.makedirs(os.path.dirname(disk_path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(disk_path, check_same_thread=False)
+            columns = [row[1] for row in self._connection.execute('PRAGMA table_info(greeks)')]
+            if columns and 'model_version' not in columns:
+                # 早期没有版本列的缓存无法判断由哪个版本的公式计算，直接丢弃
+                self._connection.execute('DROP TABLE greeks')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS greeks (model_version INTEGER, steps TEXT, s INTEGER, k INTEGER, '
+                't INTEGER, r INTEGER, sigma INTEGER, is_call INTEGER, created REAL, ' +
+                ', '.join(f'{name} REAL' for name in GREEK_NAMES) + f', PRIMARY KEY ({", ".join(KEY_COLUMNS)}))')
+            # 其他公式版本的结果已经过时；其他步长的结果可能仍被别的进程使用，保留
+            self._connection.execute('DELETE FROM greeks WHERE model_version != ?', (self.MODEL_VERSION,))
+            self._connection.commit()
+
+    def _quantize(self, S, K, T, r, sigma, option_type):
+        # 返回 (量化后的整数键数组, 输入是否全部有限)；含NaN的行不进入缓存
+        S, K, T, r, sigma, is_call = np.broadcast_arrays(
+            *(np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)), OptionPriceCalculator._call_flags(option_type))
+        inputs = (S, K, T, r, sigma)
+        finite = np.logical_and.reduce([np.isfinite(x) for x in inputs])
+        columns = [np.rint(np.where(finite, x, 0) / self.steps[name]).astype(np.int64)
+                   for name, x in zip(('S', 'K', 'T', 'r', 'sigma'), inputs)]
+        return np.stack([*columns, is_call.astype(np.int64)], axis=-1), finite
+
+    def _is_expired(self, created, now):
+        return self.ttl is not None and now - created >= self.ttl
+
+    def _disk_lookup(self, keys, now):
+        # 用临时表一次连接查询所有未命中的键
+        cursor = self._connection.cursor()
+        num_keys = len(KEY_COLUMNS)
+        cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS lookup ({", ".join(KEY_COLUMNS)})')
+        cursor.execute('DELETE FROM lookup')
+        cursor.executemany(f'INSERT INTO lookup VALUES ({", ".join("?" * num_keys)})', keys)
+        cursor.execute('SELECT ' + ', '.join(f'g.{name}' for name in (*KEY_COLUMNS, 'created', *GREEK_NAMES)) +
+                       f' FROM lookup l JOIN greeks g USING ({", ".join(KEY_COLUMNS)})')
+        found = {}
+        for row in cursor.fetchall():
+            if not self._is_expired(row[num_keys], now):
+                found[tuple(row[:num_keys])] = (row[num_keys], row[num_keys + 1:])
+        return found
+
+    def _store(self, key, created, values):
+        self._entries[key] = (created, values)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def greeks(self, S, K, T, r, sigma, option_type='call'):
+        """
+        参数和返回值同 OptionPriceCalculator.greeks，结果为量化后输入对应的值；输入含NaN的合约结果为NaN。
+        """
+        quantized, finite = self._quantize(S, K, T, r, sigma, option_type)
+        shape = finite.shape
+        prefix = self._key_prefix
+        keys = [(*prefix, *row) for row in quantized.reshape(-1, 6).tolist()]
+        finite = finite.ravel()
+        results = np.full((len(keys), len(GREEK_NAMES)), np.nan)
+        now = time.time()
+
+        with self._lock:
+            missing = {}
+            for row in np.flatnonzero(finite).tolist():
+                key = keys[row]
+                entry = self._entries.get(key)
+                if entry is not None and self._is_expired(entry[0], now):
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing.setdefault(key, []).append(row)
+                else:
+                    self._entries.move_to_end(key)
+                    results[row] = entry[1]
+                    self.hits += 1
+
+            if missing and self._connection is not None:
+                for key, (created, values) in self._disk_lookup(list(missing), now).items():
+                    rows = missing.pop(key)
+                    results[rows] = values
+                    self._store(key, created, values)
+                    self.disk_hits += len(rows)
+
+            if missing:
+                self.misses += sum(len(rows) for rows in missing.values())
+                missing_keys = np.array([key[len(prefix):] for key in missing], dtype=np.int64)
+                inputs = [missing_keys[:, i] * self.steps[name]
+                          for i, name in enumerate(('S', 'K', 'T', 'r', 'sigma'))]
+                computed = OptionPriceCalculator.greeks(*inputs, missing_keys[:, 5].astype(bool))
+                computed = np.column_stack([computed[name] for name in GREEK_NAMES])
+                for key, values in zip(missing, computed):
+                    results[missing[key]] = values
+                    self._store(key, now, tuple(values.tolist()))
+                if self._connection is not None:
+                    self._connection.executemany(
+                        f'INSERT OR REPLACE INTO greeks VALUES '
+                        f'({", ".join("?" * (len(KEY_COLUMNS) + 1 + len(GREEK_NAMES)))})',
+                        [(*key, now, *values) for key, values in zip(missing, computed.tolist())])
+                    self._connection.commit()
+
+        return {name: results[:, i].reshape(shape) for i, name in enumerate(GREEK_NAMES)}
+
+    def black_scholes(self, S, K, T, r, sigma, option_type='call'):
+        return self.greeks(S, K, T, r, sigma, option_type)['price']
+
+    def get_delta(self, S, K, T, r, sigma, option_type='call'):
+        return self.greeks(S, K, T, r, sigma, option_type)['delta']
+
+    def get_gamma(self, S, K, T, r, sigma):
+        return self.greeks(S, K, T, r, sigma)['gamma']
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations, 'size': len(self._entries),
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0}
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            if disk and self._connection is not None:
+                self._connection.execute('DELETE FROM greeks')
+                self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    # 模拟每分钟刷新一次的看板：1000个合约，每次只有约5%的股价变动
+    rng = np.random.default_rng(0)
+    strikes = np.repeat(np.arange(50, 150, 1.0), 10)
+    T = np.tile(np.linspace(0.05, 1.0, 10), 100)
+    spots = np.full(strikes.shape, 100.0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        disk_path = os.path.join(directory, 'greeks.sqlite')
+        cache = GreeksCache(max_size=50_000, disk_path=disk_path)
+        start = time.perf_counter()
+        for _ in range(60):
+            moved = rng.random(spots.shape) < 0.05
+            spots = np.where(moved, spots + rng.normal(0, 0.05, spots.shape), spots)
+            result = cache.greeks(spots, strikes, T, 0.05, 0.3, 'put')
+        print(f"60 refreshes in {time.perf_counter() - start:.3f}s, stats: {cache.stats()}")
+
+        expected = OptionPriceCalculator.greeks(spots, strikes, T, 0.05, 0.3, 'put')
+        print(f"Max delta difference vs direct calculation: {np.abs(result['delta'] - expected['delta']).max():.2e}")
+        cache.close()
+
+        # 新进程重新启动时从磁盘层恢复
+        restarted = GreeksCache(disk_path=disk_path)
+        restarted.greeks(spots, strikes, T, 0.05, 0.3, 'put')
+        print(f"After restart: {restarted.stats()}")
+        restarted.close()
@@ -0,0 +1,222 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import least_squares
+
+from OptionPriceCalculator import OptionPriceCalculator
+
+
+class IVSurface:
+    DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'investPortfolio', 'iv_surfaces')
+
+    def __init__(self, S, expiries, rates, log_moneyness, total_variance):
+        """
+        隐含波动率曲面，在 (到期时间, 对数远期moneyness) 网格上保存总方差 w = sigma^2 * T。
+
+        一般通过 IVSurface.from_chain 构建，或用 IVSurface.load 从缓存读取。
+
+        参数:
+        S (float): 构建曲面时的标的价格。
+        expiries (np.ndarray): 升序的到期时间（年），形状 (n,)。
+        rates (np.ndarray): 每个到期时间的无风险利率，形状 (n,)。
+        log_moneyness (np.ndarray): 升序的 k = ln(K/F) 网格，形状 (m,)。
+        total_variance (np.ndarray): 总方差网格，形状 (n, m)，每一列随到期时间单调不减（无日历套利）。
+        """
+        self.S = float(S)
+        self.expiries = np.asarray(expiries, dtype=float)
+        self.rates = np.asarray(rates, dtype=float)
+        self.log_moneyness = np.asarray(log_moneyness, dtype=float)
+        self.total_variance = np.asarray(total_variance, dtype=float)
+
+    @staticmethod
+    # SVI原始参数化: w(k) = a + b * (rho * (k - m) + sqrt((k - m)^2 + s^2))
+    def svi_total_variance(k, a, b, rho, m, s):
+        return a + b * (rho * (k - m) + np.sqrt((k - m) ** 2 + s ** 2))
+
+    @staticmethod
+    def fit_svi(k, w):
+        """
+        用最小二乘拟合单个到期日的SVI微笑。
+
+        参数约束 b >= 0、|rho| < 1、s > 0，并要求最小总方差 a + b*s*sqrt(1-rho^2) 非负；不满足时返回None。
+
+        返回:
+        tuple: (a, b, rho, m, s)，拟合失败时为None。
+        """
+        k = np.asarray(k, dtype=float)
+        w = np.asarray(w, dtype=float)
+        w_max = w.max()
+        initial = [w.min(), 0.1, -0.3, k[np.argmin(w)], 0.1]
+        lower = [-w_max, 0.0, -0.999, k.min() - 1.0, 1e-4]
+        upper = [w_max, 10.0, 0.999, k.max() + 1.0, 5.0]
+        try:
+            result = least_squares(lambda p: IVSurface.svi_total_variance(k, *p) - w, np.clip(initial, lower, upper),
+                                   bounds=(lower, upper))
+        except ValueError:
+            return None
+        a, b, rho, m, s = result.x
+        if not result.success or a + b * s * np.sqrt(1 - rho ** 2) < 0:
+            return None
+        return tuple(result.x)
+
+    @staticmethod
+    # 从期权链构建曲面：批量求解隐含波动率，逐到期日拟合微笑，再在统一网格上消除日历套利
+    def from_chain(chain, S, valuation_date=None, r=None, method='svi', min_points=5, grid_size=101):
+        """
+        参数:
+        chain (pd.DataFrame): OptionChainLoader.load 的结果，需包含 expiry、strike、optionType、lastPrice 列，
+                              有 bid/ask 时优先使用中间价。
+        S (float): 标的价格。
+        valuation_date (str 或 pd.Timestamp): 估值日期，默认为今天。
+        r (float): 无风险利率；None时按每个到期日的期限从收益率曲线插值。
+        method (str): 'svi' 拟合SVI微笑（报价点少于5个或拟合失败时退回线性插值），
+                      'linear' 在总方差上对 k 做线性插值。
+        min_points (int): 每个到期日至少需要的有效隐含波动率个数，不足的到期日被跳过。
+        grid_size (int): k 网格的点数。
+
+        只使用虚值期权（K < F 的看跌、K >= F 的看涨），实值期权的时间价值小，隐含波动率噪声大。
+
+        返回:
+        IVSurface
+        """
+        if method not in ('svi', 'linear'):
+            raise ValueError("method must be either 'svi' or 'linear'")
+        valuation_date = pd.Timestamp('now').normalize() if valuation_date is None else pd.Timestamp(valuation_date)
+
+        chain = chain.copy()
+        days = (pd.to_datetime(chain['expiry']) - valuation_date).dt.days.to_numpy()
+        chain['T'] = days / 365
+        chain['r'] = OptionPriceCalculator.get_risk_free_rate(days) if r is None else r
+        price = chain['lastPrice'].to_numpy(dtype=float)
+        if {'bid', 'ask'} <= set(chain.columns):
+            bid, ask = chain['bid'].to_numpy(dtype=float), chain['ask'].to_numpy(dtype=float)
+            price = np.where((bid > 0) & (ask > bid), 0.5 * (bid + ask), price)
+        chain['price'] = price
+
+        forward = S * np.exp(chain['r'] * chain['T'])
+        is_call = (chain['optionType'] == 'call').to_numpy()
+        out_of_the_money = np.where(is_call, chain['strike'] >= forward, chain['strike'] < forward)
+        chain = chain[out_of_the_money & (chain['T'] > 0)]
+
+        iv, status = OptionPriceCalculator.implied_volatility_batch(
+            chain['price'].to_numpy(), S, chain['strike'].to_numpy(), chain['T'].to_numpy(), chain['r'].to_numpy(),
+            option_type=(chain['optionType'] == 'call').to_numpy())
+        chain = chain.assign(iv=iv)[status == OptionPriceCalculator.IV_CONVERGED]
+        chain['k'] = np.log(chain['strike'] / (S * np.exp(chain['r'] * chain['T'])))
+        chain['w'] = chain['iv'] ** 2 * chain['T']
+
+        smiles = [(T, group['r'].iloc[0], group.sort_values('k')) for T, group in chain.groupby('T')
+                  if len(group) >= min_points]
+        if not smiles:
+            raise ValueError("No expiry has enough converged implied volatilities to build a surface")
+
+        grid = np.linspace(chain['k'].min(), chain['k'].max(), grid_size)
+        total_variance = np.empty((len(smiles), grid_size))
+        for i, (T, _, smile) in enumerate(smiles):
+            k, w = smile['k'].to_numpy(), smile['w'].to_numpy()
+            params = IVSurface.fit_svi(k, w) if method == 'svi' and len(smile) >= 5 else None
+            if params is None:
+                total_variance[i] = np.interp(grid, k, w)
+            else:
+                total_variance[i] = np.maximum(IVSurface.svi_total_variance(grid, *params), 0)
+
+        # 同一 k 上总方差必须随到期时间单调不减，否则存在日历套利
+        total_variance = np.maximum.accumulate(total_variance, axis=0)
+        expiries = np.array([T for T, _, _ in smiles])
+        rates = np.array([rate for _, rate, _ in smiles])
+        return IVSurface(S, expiries, rates, grid, total_variance)
+
+    def total_variance_at(self, K, T):
+        """
+        返回:
+        np.ndarray: 行权价K、到期时间T处的总方差。在到期时间之间对总方差线性插值（保持无日历套利），
+                    第一个到期日之前和最后一个到期日之后保持对应到期日的隐含波动率不变。
+        """
+        K, T = np.broadcast_arrays(np.asarray(K, dtype=float), np.asarray(T, dtype=float))
+        shape = K.shape
+        K, T = K.ravel(), T.ravel()
+        expiries = self.expiries
+        rate = np.interp(T, expiries, self.rates)
+        k = np.log(K / (self.S * np.exp(rate * T)))
+
+        # 对每个查询点只取相邻的两个到期日
+        grid = self.log_moneyness
+        kk = np.clip(k, grid[0], grid[-1])
+        j = np.clip(np.searchsorted(grid, kk) - 1, 0, len(grid) - 2)
+        weight_k = (kk - grid[j]) / (grid[j + 1] - grid[j])
+        i = np.clip(np.searchsorted(expiries, T) - 1, 0, max(len(expiries) - 2, 0))
+        i_next = np.minimum(i + 1, len(expiries) - 1)
+
+        def smile(row):
+            return self.total_variance[row, j] * (1 - weight_k) + self.total_variance[row, j + 1] * weight_k
+
+        w_low, w_high = smile(i), smile(i_next)
+        span = expiries[i_next] - expiries[i]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight_t = np.where(span > 0, (T - expiries[i]) / span, 0.0)
+        w = w_low + (w_high - w_low) * weight_t
+        w = np.where(T < expiries[0], w_low * T / expiries[0], w)
+        w = np.where(T > expiries[-1], w_high * T / expiries[-1], w)
+        return w.reshape(shape)
+
+    def volatility(self, K, T):
+        # 任意 (K, T) 的隐含波动率，K和T按NumPy规则广播
+        T = np.asarray(T, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt(self.total_variance_at(K, T) / T)
+
+    @staticmethod
+    def cache_path(ticker, valuation_date=None, cache_dir=DEFAULT_CACHE_DIR):
+        valuation_date = pd.Timestamp('now') if valuation_date is None else pd.Timestamp(valuation_date)
+        return os.path.join(cache_dir, f"{ticker}_{valuation_date:%Y-%m-%d}.npz")
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(path, S=self.S, expiries=self.expiries, rates=self.rates, log_moneyness=self.log_moneyness,
+                 total_variance=self.total_variance)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            return IVSurface(data['S'], data['expiries'], data['rates'], data['log_moneyness'],
+                             data['total_variance'])
+
+
+if __name__ == "__main__":
+    import time
+
+    # 用已知的SVI曲面生成一条合成期权链，检验从价格反推出的曲面
+    S, r = 100.0, 0.05
+    valuation_date = pd.Timestamp('2024-06-14')
+    rows = []
+    for days in (7, 30, 60, 91, 182, 365):
+        T = days / 365
+        strikes = np.arange(60, 141, 2.5)
+        k = np.log(strikes / (S * np.exp(r * T)))
+        sigma = np.sqrt(IVSurface.svi_total_variance(k, 0.04 * T, 0.1 * np.sqrt(T), -0.5, 0.0, 0.2) / T)
+        for option_type in ('put', 'call'):
+            prices = OptionPriceCalculator.black_scholes_batch(S, strikes, T, r, sigma, option_type)
+            rows.append(pd.DataFrame({'expiry': (valuation_date + pd.Timedelta(days=days)).strftime('%Y-%m-%d'),
+                                      'strike': strikes, 'optionType': option_type, 'lastPrice': prices,
+                                      'true_iv': sigma}))
+    chain = pd.concat(rows, ignore_index=True)
+
+    start = time.perf_counter()
+    surface = IVSurface.from_chain(chain, S, valuation_date, r=r)
+    print(f"Built surface with {len(surface.expiries)} expiries in {time.perf_counter() - start:.3f}s")
+
+    T = (pd.to_datetime(chain['expiry']) - valuation_date).dt.days.to_numpy() / 365
+    error = np.abs(surface.volatility(chain['strike'].to_numpy(), T) - chain['true_iv'].to_numpy())
+    print(f"Max IV error at quoted points: {np.nanmax(error):.2e}")
+
+    K = np.random.default_rng(0).uniform(70, 130, 1_000_000)
+    T = np.random.default_rng(1).uniform(0.01, 1.5, 1_000_000)
+    start = time.perf_counter()
+    surface.volatility(K, T)
+    print(f"1,000,000 lookups in {time.perf_counter() - start:.3f}s")
+
+    path = IVSurface.cache_path('SYNTH', valuation_date, cache_dir='.')
+    surface.save(path)
+    print(f"Reloaded surface matches: {np.allclose(IVSurface.load(path).volatility(K, T), surface.volatility(K, T))}")
+    os.remove(path)
@@ -0,0 +1,157 @@
+import numpy as np
+
+from OptionPriceCalculator import OptionPriceCalculator
+
+
+class LatticePricer:
+
+    @staticmethod
+    # 二叉树(CRR)/三叉树定价美式期权，整条期权链一次计算
+    def american_price(S, K, T, r, sigma, option_type='put', steps=500, method='crr', american=True,
+                       return_boundary=False):
+        """
+        用向量化的CRR二叉树或Boyle三叉树为一组合约定价，每一行是一个合约，逐层倒推时所有合约同时计算。
+
+        参数:
+        S, K, T, r, sigma (float 或 np.ndarray): 广播为一维的合约数组。
+        option_type (str, np.ndarray): 同OptionPriceCalculator.black_scholes_batch。
+        steps (int): 时间步数。
+        method (str): 'crr' 或 'trinomial'。
+        american (bool): False时按欧式定价（用于和Black-Scholes比较精度）。
+        return_boundary (bool): 是否同时返回提前行权边界。
+
+        注意: 树的转移概率要求 sigma > r*sqrt(T/steps)，否则概率为负。
+
+        返回:
+        np.ndarray: 期权价格；return_boundary为True时返回 (价格, 提前行权边界, 时间点)，
+                    边界和时间点的形状均为 (合约数, steps)，边界表示每个时间点上会立即行权的最高股价（看跌）或最低股价（看涨），
+                    没有提前行权的节点时为NaN。
+        """
+        S, K, T, r, sigma = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=float))
+                                                  for x in (S, K, T, r, sigma)))
+        sign = np.where(np.broadcast_to(OptionPriceCalculator._call_flags(option_type), S.shape), 1.0, -1.0)
+
+        # 树的每一层存为 (节点数, 合约数) 的数组，逐层倒推时相邻节点的切片在内存中连续
+        dt = T / steps
+        disc = np.exp(-r * dt)
+        if method == 'crr':
+            u = np.exp(sigma * np.sqrt(dt))
+            p_up = (np.exp(r * dt) - 1 / u) / (u - 1 / u)
+            weights = (disc * (1 - p_up), disc * p_up)
+        elif method == 'trinomial':
+            u = np.exp(sigma * np.sqrt(2 * dt))
+            a = np.exp(sigma * np.sqrt(dt / 2))
+            b = np.exp(r * dt / 2)
+            p_up = ((b - 1 / a) / (a - 1 / a)) ** 2
+            p_down = ((a - b) / (a - 1 / a)) ** 2
+            weights = (disc * p_down, disc * (1 - p_up - p_down), disc * p_up)
+        else:
+            raise ValueError("method must be either 'crr' or 'trinomial'")
+
+        # 所有层的节点股价都在同一个网格 S*u^m (m = -steps..steps) 上：第step层的节点是其中以steps为中心的一段，
+        # 二叉树每隔一个点取一个。行权收益因此只需在网格上计算一次，倒推时按层切片，不必每层重新计算
+        stride = 2 if method == 'crr' else 1
+        spots = S * u ** np.arange(-steps, steps + 1)[:, None]
+        exercise = spots - K
+        exercise *= sign
+
+        # values和next_values交替保存相邻两层的价值（只用前面的行），倒推过程中不再分配临时数组
+        values = np.maximum(exercise[::stride], 0)
+        next_values = np.empty_like(values)
+        scratch = np.empty_like(values)
+        boundary = np.full((steps, S.shape[0]), np.nan) if return_boundary else None
+
+        for step in range(steps - 1, -1, -1):
+            num_nodes = step + 1 if method == 'crr' else 2 * step + 1
+            continuation = next_values[:num_nodes]
+            np.multiply(values[:num_nodes], weights[0], out=continuation)
+            for offset, weight in enumerate(weights[1:], start=1):
+                np.multiply(values[offset:offset + num_nodes], weight, out=scratch[:num_nodes])
+                continuation += scratch[:num_nodes]
+
+            if american:
+                level = slice(steps - step, steps + step + 1, stride)
+                if return_boundary:
+                    exercised = exercise[level] > continuation
+                    put_boundary = np.where(exercised, spots[level], -np.inf).max(axis=0)
+                    call_boundary = np.where(exercised, spots[level], np.inf).min(axis=0)
+                    step_boundary = np.where(sign < 0, put_boundary, call_boundary)
+                    boundary[step] = np.where(np.isfinite(step_boundary), step_boundary, np.nan)
+                # 继续持有的价值非负，因此直接与(可能为负的)行权收益取最大值即可
+                np.maximum(continuation, exercise[level], out=continuation)
+            values, next_values = next_values, values
+
+        prices = values[0]
+        if return_boundary:
+            return prices, boundary.T, np.outer(dt, np.arange(steps))
+        return prices
+
+    @staticmethod
+    # 美式期权隐含波动率：整条期权链同时二分
+    def american_implied_volatility(option_market_price, S, K, T, r, option_type='put', steps=200, method='crr',
+                                    sigma_min=1e-4, sigma_max=5.0, sigma_tol=1e-6):
+        """
+        对美式期权报价反推隐含波动率。每次二分迭代对所有合约只做一次树定价。
+
+        返回:
+        tuple: (隐含波动率数组, 状态码数组)，状态码含义同OptionPriceCalculator.implied_volatility_batch。
+        """
+        price, S, K, T, r = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=float))
+                                                  for x in (option_market_price, S, K, T, r)))
+        is_call = np.broadcast_to(OptionPriceCalculator._call_flags(option_type), price.shape)
+
+        iv = np.full(price.shape, np.nan)
+        status = np.full(price.shape, OptionPriceCalculator.IV_NOT_CONVERGED, dtype=np.int8)
+        valid = np.isfinite(price) & (price > 0) & (S > 0) & (K > 0) & (T > 0)
+        status[~valid] = OptionPriceCalculator.IV_INVALID_INPUT
+
+        # 美式期权价格不低于立即行权价值
+        intrinsic = np.where(is_call, np.maximum(S - K, 0), np.maximum(K - S, 0))
+        upper_bound = np.where(is_call, S, K)
+        below = valid & (price <= intrinsic)
+        above = valid & (price >= upper_bound)
+        status[below] = OptionPriceCalculator.IV_BELOW_INTRINSIC
+        status[above] = OptionPriceCalculator.IV_ABOVE_UPPER_BOUND
+
+        idx = np.flatnonzero(valid & ~below & ~above)
+        args = (S[idx], K[idx], T[idx], r[idx])
+        # 波动率下限不能低于树的转移概率非负所需的最小值
+        low = np.maximum(sigma_min, 1.01 * np.abs(r[idx]) * np.sqrt(T[idx] / steps))
+        high = np.full(idx.shape, sigma_max)
+        price_low = LatticePricer.american_price(*args, low, is_call[idx], steps, method)
+        price_high = LatticePricer.american_price(*args, high, is_call[idx], steps, method)
+        bracketed = (price_low <= price[idx]) & (price[idx] <= price_high)
+
+        for _ in range(int(np.ceil(np.log2((sigma_max - sigma_min) / sigma_tol)))):
+            mid = 0.5 * (low + high)
+            too_high = LatticePricer.american_price(*args, mid, is_call[idx], steps, method) > price[idx]
+            high = np.where(too_high, mid, high)
+            low = np.where(too_high, low, mid)
+
+        iv[idx[bracketed]] = 0.5 * (low + high)[bracketed]
+        status[idx[bracketed]] = OptionPriceCalculator.IV_CONVERGED
+        return iv, status
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    # AAPL 2024-06-28到期的看跌期权，2024-06-21收盘价约207.49
+    data = pd.read_csv('AAPL_put_option_data_strike_200_to_225_for_2024-06-28.csv')
+    current_stock_price, days_to_expiration = 207.49, 7
+    risk_free_rate = OptionPriceCalculator.get_risk_free_rate(days_to_expiration)
+    implied_vols, iv_status = LatticePricer.american_implied_volatility(
+        data['lastPrice'].values, current_stock_price, data['strike'].values, days_to_expiration / 365,
+        risk_free_rate, option_type='put')
+    american_prices, boundary, times = LatticePricer.american_price(
+        current_stock_price, data['strike'].values, days_to_expiration / 365, risk_free_rate,
+        np.nan_to_num(implied_vols, nan=0.2), option_type='put', steps=1000, return_boundary=True)
+
+    # 到期前一半时间点上的提前行权边界：股价低于该值时应立即行权
+    half_way = boundary.shape[1] // 2
+    for strike, market_price, iv, status, model_price, exercise_boundary in zip(
+            data['strike'], data['lastPrice'], implied_vols, iv_status, american_prices, boundary[:, half_way]):
+        iv_text = f"{iv:.4f}" if status == OptionPriceCalculator.IV_CONVERGED \
+            else OptionPriceCalculator.IV_STATUS_MESSAGES[status]
+        print(f"Strike: {strike}, Market: {market_price}, American IV: {iv_text}, Model: {model_price:.4f}, "
+              f"Exercise boundary after {times[0, half_way] * 365:.1f} days: {exercise_boundary:.2f}")
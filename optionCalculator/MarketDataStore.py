@@ -0,0 +1,149 @@
+import os
+
+import pandas as pd
+
+
+class MarketDataStore:
+    """
+    本地列式行情存储，取代每个ticker/行权价范围/到期日一个CSV的做法。
+
+    目录结构（hive分区的Parquet，需要pyarrow）:
+        root/options/ticker=AAPL/expiry=2024-06-21/data.parquet   期权链快照，按strike排序
+        root/stocks/ticker=AAPL/date=2024-06-18/data.parquet      股票K线（日线或分钟线），按交易日分区
+    """
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'investPortfolio', 'market_data')
+    OPTION_KEY = ['contractSymbol', 'lastTradeDate']
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def append_options(self, ticker, expiry, options):
+        """
+        追加期权链数据，按 contractSymbol + lastTradeDate 去重（保留最新写入的行）。
+
+        参数:
+        ticker (str): 股票代码。
+        expiry (str): 到期日，例如 '2024-06-21'。
+        options (pd.DataFrame): yfinance option_chain 返回的 calls/puts 或其保存的CSV。
+
+        返回:
+        int: 分区中去重后的行数。
+        """
+        options = options.reset_index(drop=True).drop(columns=['Unnamed: 0'], errors='ignore')
+        options['lastTradeDate'] = pd.to_datetime(options['lastTradeDate'], utc=True)
+        if 'optionType' not in options:
+            # 合约代码形如 AAPL240621P00200000，倒数第9位为 C/P
+            options['optionType'] = options['contractSymbol'].str[-9].map({'C': 'call', 'P': 'put'})
+
+        path = self._option_partition(ticker, expiry)
+        if os.path.exists(path):
+            options = pd.concat([pd.read_parquet(path), options], ignore_index=True)
+        options = (options.drop_duplicates(subset=self.OPTION_KEY, keep='last')
+                   .sort_values(['strike', 'optionType', 'lastTradeDate'])
+                   .reset_index(drop=True))
+        self._write(options, path)
+        return len(options)
+
+    def load_options(self, ticker, expiries=None, option_type=None, min_strike=None, max_strike=None, columns=None):
+        """
+        读取期权数据。到期日、期权类型和行权价范围作为过滤条件下推到Parquet读取层，
+        不满足条件的分区和row group不会被读入内存。
+
+        返回:
+        pd.DataFrame: 包含 ticker/expiry 列的期权数据，无数据时为空DataFrame。
+        """
+        filters = [('ticker', '=', ticker)]
+        if expiries is not None:
+            filters.append(('expiry', 'in', [str(expiry) for expiry in expiries]))
+        if option_type is not None:
+            filters.append(('optionType', '=', option_type))
+        if min_strike is not None:
+            filters.append(('strike', '>=', min_strike))
+        if max_strike is not None:
+            filters.append(('strike', '<=', max_strike))
+        return self._read(os.path.join(self.root, 'options'), filters, columns, ['expiry', 'strike'])
+
+    def available_expiries(self, ticker):
+        ticker_dir = os.path.join(self.root, 'options', f'ticker={ticker}')
+        if not os.path.isdir(ticker_dir):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(ticker_dir) if name.startswith('expiry='))
+
+    def append_stock_bars(self, ticker, bars):
+        """
+        追加股票K线（yfinance download/history 的结果，索引为时间），按交易日分区并按时间去重。
+
+        返回:
+        int: 本次写入涉及的分区数。
+        """
+        bars = bars.copy()
+        bars.index = pd.to_datetime(bars.index, utc=True)
+        bars.index.name = 'Datetime'
+        bars = bars.reset_index()
+        dates = bars['Datetime'].dt.strftime('%Y-%m-%d')
+
+        for date, day_bars in bars.groupby(dates):
+            path = self._stock_partition(ticker, date)
+            if os.path.exists(path):
+                day_bars = pd.concat([pd.read_parquet(path), day_bars], ignore_index=True)
+            day_bars = day_bars.drop_duplicates(subset='Datetime', keep='last').sort_values('Datetime')
+            self._write(day_bars.reset_index(drop=True), path)
+        return dates.nunique()
+
+    def load_stock_bars(self, ticker, start=None, end=None, columns=None):
+        # start/end 为交易日字符串（含端点），只读取范围内的分区
+        filters = [('ticker', '=', ticker)]
+        if start is not None:
+            filters.append(('date', '>=', str(start)))
+        if end is not None:
+            filters.append(('date', '<=', str(end)))
+        bars = self._read(os.path.join(self.root, 'stocks'), filters, columns, ['Datetime'])
+        if bars.empty:
+            return bars
+        return bars.drop(columns=['ticker', 'date'], errors='ignore').set_index('Datetime')
+
+    def import_option_csv(self, path, ticker, expiry):
+        # 把 download_option_data_save_to_local 生成的旧CSV导入存储
+        return self.append_options(ticker, expiry, pd.read_csv(path))
+
+    def _option_partition(self, ticker, expiry):
+        return os.path.join(self.root, 'options', f'ticker={ticker}', f'expiry={expiry}', 'data.parquet')
+
+    def _stock_partition(self, ticker, date):
+        return os.path.join(self.root, 'stocks', f'ticker={ticker}', f'date={date}', 'data.parquet')
+
+    @staticmethod
+    def _write(data, path):
+        # 先写临时文件再替换，避免写到一半的分区被读取
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        data.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _read(directory, filters, columns, sort_by):
+        if not os.path.isdir(directory):
+            return pd.DataFrame()
+        if columns is not None:
+            columns = list(dict.fromkeys(list(columns) + sort_by))
+        data = pd.read_parquet(directory, filters=filters, columns=columns)
+        # hive分区列读回来是category类型，转换为普通字符串
+        for column in data.columns:
+            if isinstance(data[column].dtype, pd.CategoricalDtype):
+                data[column] = data[column].astype(str)
+        return data.sort_values(sort_by).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    store = MarketDataStore()
+
+    # 把已有的CSV导入存储，之后的分析直接从存储读取
+    store.import_option_csv('AAPL_put_option_data_strike_200_to_225_for_2024-06-21.csv', 'AAPL', '2024-06-21')
+    store.import_option_csv('AAPL_put_option_data_strike_215_for_2024-06-21.csv', 'AAPL', '2024-06-21')
+    store.import_option_csv('AAPL_put_option_data_strike_200_to_225_for_2024-06-28.csv', 'AAPL', '2024-06-28')
+    store.append_stock_bars('AAPL', pd.read_csv('../tradingBot/test/AAPL_minute_data.csv', index_col='Datetime'))
+
+    print(store.available_expiries('AAPL'))
+    print(store.load_options('AAPL', option_type='put', min_strike=210, max_strike=215,
+                             columns=['contractSymbol', 'strike', 'lastPrice', 'bid', 'ask']))
+    print(store.load_stock_bars('AAPL', start='2024-06-14', end='2024-06-14', columns=['Close']).tail())
@@ -0,0 +1,222 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from OptionPriceCalculator import OptionPriceCalculator
+from PositionProfitCalculator import PositionProfitCalculator
+
+
+class EuropeanPayoff:
+    def __init__(self, K, option_type='put'):
+        self.K = K
+        self.option_type = option_type
+
+    def __call__(self, paths):
+        terminal = paths[:, -1]
+        return np.maximum(terminal - self.K, 0) if self.option_type == 'call' else np.maximum(self.K - terminal, 0)
+
+
+class AsianPayoff:
+    # 算术平均价格期权（不含起点）
+    def __init__(self, K, option_type='put'):
+        self.K = K
+        self.option_type = option_type
+
+    def __call__(self, paths):
+        average = paths[:, 1:].mean(axis=1)
+        return np.maximum(average - self.K, 0) if self.option_type == 'call' else np.maximum(self.K - average, 0)
+
+
+class BarrierPayoff:
+    # 敲出/敲入欧式期权，按离散观察点判断是否触及障碍价
+    def __init__(self, K, barrier, option_type='put', knock='out'):
+        self.K = K
+        self.barrier = barrier
+        self.option_type = option_type
+        self.knock = knock
+
+    def __call__(self, paths):
+        S0 = paths[:, 0]
+        if self.barrier < S0[0]:
+            touched = paths.min(axis=1) <= self.barrier
+        else:
+            touched = paths.max(axis=1) >= self.barrier
+        active = ~touched if self.knock == 'out' else touched
+        return np.where(active, EuropeanPayoff(self.K, self.option_type)(paths), 0.0)
+
+
+def _run_chunk(engine, task, argument, num_paths, seed_sequence):
+    # 进程池中执行的单个分块：生成路径并立即归约，避免把整块路径传回主进程
+    rng = np.random.default_rng(seed_sequence)
+    paths = engine.simulate_paths(num_paths, rng)
+
+    if task == 'pnl':
+        return PositionProfitCalculator.position_profit(argument, paths[:, -1])
+
+    discount = np.exp(-engine.r * engine.T)
+    payoffs = discount * argument(paths)
+    controls = discount * paths[:, -1]
+    if engine.antithetic:
+        # 对偶路径两两平均后才是独立样本
+        half = num_paths // 2
+        payoffs = 0.5 * (payoffs[:half] + payoffs[half:])
+        controls = 0.5 * (controls[:half] + controls[half:])
+    return np.array([payoffs.size, payoffs.sum(), controls.sum(), (payoffs ** 2).sum(), (controls ** 2).sum(),
+                     (payoffs * controls).sum()])
+
+
+class MonteCarloEngine:
+    def __init__(self, S0, r, sigma, T, num_steps=252, jump_intensity=0.0, jump_mean=0.0, jump_std=0.0,
+                 stochastic_vol=False, kappa=2.0, long_run_var=None, vol_of_vol=0.5, correlation=-0.7,
+                 antithetic=True, control_variate=True, chunk_size=20_000, max_workers=1, seed=None):
+        """
+        风险中性测度下的股价路径模拟：GBM，可叠加Merton跳跃和Heston随机波动率。
+
+        参数:
+        S0, r, sigma, T (float): 初始股价、无风险利率、（初始）波动率、模拟期限（年）。
+        num_steps (int): 时间步数。
+        jump_intensity, jump_mean, jump_std (float): 每年跳跃次数，以及对数跳跃幅度的均值和标准差。
+        stochastic_vol (bool): 为True时使用Heston方差过程（初始方差为sigma²）。
+        kappa, long_run_var, vol_of_vol, correlation (float): Heston参数，long_run_var默认为sigma²。
+        antithetic (bool): 使用对偶变量。
+        control_variate (bool): 定价时用贴现的终值股价作为控制变量。
+        chunk_size (int): 每个分块的路径数，内存占用约为 chunk_size * (num_steps + 1) * 8 字节。
+        max_workers (int): 进程池大小，1表示在当前进程中串行执行。
+        seed (int): 随机种子；每个分块的种子由SeedSequence派生，结果与进程数无关、可复现。
+        """
+        self.S0 = S0
+        self.r = r
+        self.sigma = sigma
+        self.T = T
+        self.num_steps = num_steps
+        self.jump_intensity = jump_intensity
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+        self.stochastic_vol = stochastic_vol
+        self.kappa = kappa
+        self.long_run_var = sigma ** 2 if long_run_var is None else long_run_var
+        self.vol_of_vol = vol_of_vol
+        self.correlation = correlation
+        self.antithetic = antithetic
+        self.control_variate = control_variate
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.seed = seed
+
+    def simulate_paths(self, num_paths, rng=None):
+        # 返回形状为 (num_paths, num_steps + 1) 的股价路径；使用对偶变量时后一半路径是前一半的镜像，
+        # num_paths为奇数时多生成一对再截掉最后一条
+        rng = np.random.default_rng(self.seed) if rng is None else rng
+        dt = self.T / self.num_steps
+        half = (num_paths + 1) // 2 if self.antithetic else num_paths
+
+        def normals():
+            z = rng.standard_normal((half, self.num_steps))
+            return np.concatenate((z, -z)) if self.antithetic else z
+
+        z_stock = normals()
+        if self.stochastic_vol:
+            z_var = self.correlation * z_stock + np.sqrt(1 - self.correlation ** 2) * normals()
+            log_increments = np.empty_like(z_stock)
+            variance = np.full(z_stock.shape[0], self.sigma ** 2)
+            for step in range(self.num_steps):
+                # full truncation Euler格式
+                positive_variance = np.maximum(variance, 0)
+                log_increments[:, step] = ((self.r - 0.5 * positive_variance) * dt
+                                           + np.sqrt(positive_variance * dt) * z_stock[:, step])
+                variance = (variance + self.kappa * (self.long_run_var - positive_variance) * dt
+                            + self.vol_of_vol * np.sqrt(positive_variance * dt) * z_var[:, step])
+        else:
+            log_increments = (self.r - 0.5 * self.sigma ** 2) * dt + self.sigma * np.sqrt(dt) * z_stock
+
+        if self.jump_intensity > 0:
+            # 补偿跳跃的漂移，使贴现股价仍为鞅
+            compensator = self.jump_intensity * (np.exp(self.jump_mean + 0.5 * self.jump_std ** 2) - 1)
+            num_jumps = rng.poisson(self.jump_intensity * dt, (half, self.num_steps))
+            jump_normals = normals()
+            if self.antithetic:
+                num_jumps = np.concatenate((num_jumps, num_jumps))
+            log_increments += (num_jumps * self.jump_mean + np.sqrt(num_jumps) * self.jump_std * jump_normals
+                               - compensator * dt)
+
+        paths = np.empty((log_increments.shape[0], self.num_steps + 1))
+        paths[:, 0] = self.S0
+        paths[:, 1:] = self.S0 * np.exp(np.cumsum(log_increments, axis=1))
+        return paths[:num_paths]
+
+    def _run(self, task, argument, num_paths):
+        # 把num_paths拆成固定大小的分块，每块用独立派生的种子，可选地分发到进程池
+        chunk_size = self.chunk_size + self.chunk_size % 2
+        chunk_sizes = [chunk_size] * (num_paths // chunk_size)
+        if num_paths % chunk_size:
+            chunk_sizes.append(num_paths % chunk_size + num_paths % 2)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(chunk_sizes))
+
+        if self.max_workers == 1:
+            return [_run_chunk(self, task, argument, size, seed) for size, seed in zip(chunk_sizes, seeds)]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(_run_chunk, [self] * len(chunk_sizes), [task] * len(chunk_sizes),
+                                     [argument] * len(chunk_sizes), chunk_sizes, seeds))
+
+    def price(self, payoff, num_paths=200_000):
+        """
+        计算任意（可依赖路径的）期权价格。
+
+        参数:
+        payoff (callable): 输入路径数组、返回每条路径收益的可pickle对象，例如EuropeanPayoff/AsianPayoff/BarrierPayoff。
+        num_paths (int): 路径总数。
+
+        返回:
+        dict: {'price': 价格, 'std_error': 标准误}
+        """
+        n, sum_y, sum_x, sum_yy, sum_xx, sum_xy = np.sum(self._run('price', payoff, num_paths), axis=0)
+        mean_y, mean_x = sum_y / n, sum_x / n
+        var_y = sum_yy / n - mean_y ** 2
+        if not self.control_variate:
+            return {'price': float(mean_y), 'std_error': float(np.sqrt(var_y / n))}
+
+        # 贴现终值股价的期望已知为S0
+        var_x = sum_xx / n - mean_x ** 2
+        cov_xy = sum_xy / n - mean_x * mean_y
+        beta = cov_xy / var_x
+        adjusted_var = max(var_y - cov_xy ** 2 / var_x, 0.0)
+        return {'price': float(mean_y - beta * (mean_x - self.S0)), 'std_error': float(np.sqrt(adjusted_var / n))}
+
+    def profit_distribution(self, legs, num_paths=200_000):
+        """
+        模拟期末（T年后）多腿组合的收益分布，期权腿按剩余期限用Black-Scholes重新定价。
+
+        参数:
+        legs (list[dict]): 组合，格式见PositionProfitCalculator.position_value。
+        num_paths (int): 路径总数。
+
+        返回:
+        np.ndarray: 每条路径的组合收益。
+        """
+        horizon_legs = [leg if leg['type'] == 'stock' else {**leg, 'T': leg['T'] - self.T} for leg in legs]
+        # 使用对偶变量时最后一个分块会补成偶数条路径，这里截回num_paths
+        return np.concatenate(self._run('pnl', horizon_legs, num_paths))[:num_paths]
+
+
+if __name__ == "__main__":
+    import time
+
+    S0, K, T, r, sigma = 123.0, 118, 30 / 365, 0.05, 0.4614
+    engine = MonteCarloEngine(S0, r, sigma, T, num_steps=30, seed=42, max_workers=4)
+
+    start = time.perf_counter()
+    european = engine.price(EuropeanPayoff(K, 'put'), num_paths=1_000_000)
+    print(f"European put MC: {european['price']:.4f} ± {european['std_error']:.4f}, "
+          f"Black-Scholes: {OptionPriceCalculator.black_scholes(S0, K, T, r, sigma, 'put'):.4f} "
+          f"({time.perf_counter() - start:.2f}s)")
+    asian = engine.price(AsianPayoff(K, 'put'), num_paths=1_000_000)
+    print(f"Asian put MC: {asian['price']:.4f} ± {asian['std_error']:.4f}")
+
+    jump_engine = MonteCarloEngine(S0, r, sigma, T, num_steps=30, jump_intensity=4, jump_mean=-0.05, jump_std=0.08,
+                                   stochastic_vol=True, seed=42, max_workers=4)
+    legs = [{'type': 'stock', 'quantity': 20, 'entry_price': S0},
+            {'type': 'put', 'quantity': 1, 'strike': K, 'T': 45 / 365, 'r': r, 'sigma': sigma,
+             'entry_price': OptionPriceCalculator.black_scholes(S0, K, 45 / 365, r, sigma, 'put')}]
+    profits = jump_engine.profit_distribution(legs, num_paths=500_000)
+    print(f"Hedged position P&L after {T * 365:.0f} days: mean {profits.mean():.2f}, "
+          f"5% VaR {-np.percentile(profits, 5):.2f}, worst {profits.min():.2f}")
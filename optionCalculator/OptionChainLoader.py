@@ -0,0 +1,171 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import yfinance as yf
+
+
+class YfinanceChainSource:
+    # 通过yfinance获取期权链的网络层
+    name = 'yfinance'
+
+    def expirations(self, ticker):
+        return list(yf.Ticker(ticker).options)
+
+    def fetch(self, ticker, expiry):
+        chain = yf.Ticker(ticker).option_chain(expiry)
+        calls = chain.calls.assign(optionType='call')
+        puts = chain.puts.assign(optionType='put')
+        options = pd.concat([calls, puts], ignore_index=True)
+        underlying = getattr(chain, 'underlying', None) or {}
+        options['underlyingPrice'] = underlying.get('regularMarketPrice')
+        return options
+
+
+class LocalFixtureChainSource:
+    """
+    从本地CSV提供期权链，用于测试和离线分析，不访问网络。
+
+    文件名沿用 download_option_data_save_to_local 的格式:
+        {ticker}_{put|call}_option_data_strike_..._for_{expiry}.csv
+    """
+    FILENAME_PATTERN = re.compile(r'^(?P<ticker>[A-Z.]+)_(?P<type>put|call)_option_data_.*_for_(?P<expiry>[\d-]+)\.csv$')
+
+    def __init__(self, directory='.', latency=0.0):
+        self.directory = directory
+        self.latency = latency  # 模拟网络延迟（秒）
+        # 不同目录的fixture各自缓存，也不会与yfinance的真实期权链混在一起
+        self.name = 'fixture_' + hashlib.md5(os.path.abspath(directory).encode()).hexdigest()[:8]
+
+    def _files(self, ticker, expiry=None):
+        for path in sorted(glob.glob(os.path.join(self.directory, f'{ticker}_*_option_data_*.csv'))):
+            match = self.FILENAME_PATTERN.match(os.path.basename(path))
+            if match and match['ticker'] == ticker and (expiry is None or match['expiry'] == expiry):
+                yield path, match['type'], match['expiry']
+
+    def expirations(self, ticker):
+        time.sleep(self.latency)
+        return sorted({expiry for _, _, expiry in self._files(ticker)})
+
+    def fetch(self, ticker, expiry):
+        time.sleep(self.latency)
+        frames = [pd.read_csv(path, index_col=0).assign(optionType=option_type)
+                  for path, option_type, _ in self._files(ticker, expiry)]
+        if not frames:
+            raise ValueError(f"No fixture option chain for {ticker} {expiry}")
+        return pd.concat(frames, ignore_index=True).drop_duplicates(subset=['contractSymbol', 'lastTradeDate'])
+
+
+class OptionChainLoader:
+    DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'investPortfolio', 'option_chains')
+    # yfinance期权链的列，加上加载器添加的 ticker、expiry、optionType
+    COLUMNS = ['ticker', 'expiry', 'contractSymbol', 'lastTradeDate', 'strike', 'lastPrice', 'bid', 'ask', 'change',
+               'percentChange', 'volume', 'openInterest', 'impliedVolatility', 'inTheMoney', 'contractSize',
+               'currency', 'optionType']
+
+    def __init__(self, source=None, cache_dir=DEFAULT_CACHE_DIR, ttl=15 * 60, max_workers=8):
+        """
+        批量并发加载多个ticker、多个到期日的期权链。结果缓存在磁盘上，有效期内反复运行脚本不会重复下载同一条期权链。
+
+        参数:
+        source: 网络层，需实现 expirations(ticker) 和 fetch(ticker, expiry)；默认为YfinanceChainSource，
+                测试时可换成LocalFixtureChainSource或其他替身。磁盘缓存按source.name（没有时用类名）分目录存放。
+        cache_dir (str): 磁盘缓存目录，None表示不缓存。
+        ttl (float): 缓存有效期（秒）。
+        max_workers (int): 并发请求数上限。
+        """
+        self.source = YfinanceChainSource() if source is None else source
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.errors = {}
+
+    def load(self, tickers, expiries=None):
+        """
+        返回所有请求的期权链合并后的DataFrame，每行带 ticker、expiry、optionType 列。
+
+        参数:
+        tickers (str 或 list[str]): 股票代码。
+        expiries (list[str]): 到期日；None表示每个ticker的全部到期日。
+
+        获取失败的(ticker, expiry)不会中断其他请求，错误信息保存在 self.errors 中；全部请求都失败时抛出RuntimeError，
+        没有任何需要加载的期权链时返回只有列名的空DataFrame。
+        """
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.errors = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if expiries is None:
+                ticker_expiries = dict(zip(tickers, executor.map(self._expirations, tickers)))
+            else:
+                ticker_expiries = {ticker: list(expiries) for ticker in tickers}
+            keys = [(ticker, expiry) for ticker in tickers for expiry in ticker_expiries[ticker]]
+            chains = list(executor.map(lambda key: self._chain(*key), keys))
+
+        frames = [chain for chain in chains if chain is not None]
+        if not frames:
+            if self.errors:
+                details = '; '.join(f"{ticker} {expiry or 'expirations'}: {error}"
+                                    for (ticker, expiry), error in self.errors.items())
+                raise RuntimeError(f"Failed to load any option chain: {details}")
+            return pd.DataFrame(columns=self.COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def _expirations(self, ticker):
+        path = self._cache_path(ticker, 'expirations.json')
+        if self._is_fresh(path):
+            with open(path) as f:
+                return json.load(f)
+        try:
+            expirations = list(self.source.expirations(ticker))
+        except Exception as e:
+            self.errors[(ticker, None)] = e
+            return []
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(expirations, f)
+        return expirations
+
+    def _chain(self, ticker, expiry):
+        path = self._cache_path(ticker, f'{expiry}.parquet')
+        if self._is_fresh(path):
+            return pd.read_parquet(path)
+        try:
+            chain = self.source.fetch(ticker, expiry)
+        except Exception as e:
+            self.errors[(ticker, expiry)] = e
+            print(f"Failed to load option chain for {ticker} {expiry}: {e}")
+            return None
+
+        chain = chain.reset_index(drop=True)
+        chain.insert(0, 'expiry', expiry)
+        chain.insert(0, 'ticker', ticker)
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            chain.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+        return chain
+
+    def _cache_path(self, ticker, filename):
+        if self.cache_dir is None:
+            return None
+        source_name = getattr(self.source, 'name', type(self.source).__name__)
+        return os.path.join(self.cache_dir, source_name, ticker, filename)
+
+    def _is_fresh(self, path):
+        return path is not None and os.path.exists(path) and time.time() - os.path.getmtime(path) < self.ttl
+
+
+if __name__ == "__main__":
+    # 本地fixture模拟100ms的网络延迟，8个请求并发执行
+    loader = OptionChainLoader(source=LocalFixtureChainSource('.', latency=0.1), cache_dir=None)
+    start = time.perf_counter()
+    chains = loader.load(['AAPL', 'NVDA'])
+    print(f"Loaded {len(chains)} contracts in {time.perf_counter() - start:.2f}s, errors: {loader.errors}")
+    print(chains.groupby(['ticker', 'expiry', 'optionType']).size())
@@ -2,11 +2,29 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 from scipy.stats import norm
+from scipy.special import ndtr
 from scipy.optimize import brentq
-import pandas_datareader.data as web
+
+from YieldCurve import YieldCurve
 
 
 class OptionPriceCalculator:
+    # implied_volatility_batch 返回的逐合约状态码
+    IV_CONVERGED = 0
+    IV_NOT_CONVERGED = 1
+    IV_BELOW_INTRINSIC = 2
+    IV_ABOVE_UPPER_BOUND = 3
+    IV_INVALID_INPUT = 4
+    IV_STATUS_MESSAGES = {
+        IV_CONVERGED: 'converged',
+        IV_NOT_CONVERGED: 'did not converge',
+        IV_BELOW_INTRINSIC: 'price at or below intrinsic value (arbitrage)',
+        IV_ABOVE_UPPER_BOUND: 'price at or above no-arbitrage upper bound',
+        IV_INVALID_INPUT: 'missing price or non-positive input',
+    }
+
+    _yield_curve = None
+
     @staticmethod
     # Black-Scholes公式计算期权价格
     def black_scholes(S, K, T, r, sigma, option_type='call'):
@@ -22,6 +40,86 @@ class OptionPriceCalculator:
 
         return price
 
+    @staticmethod
+    def _d1_d2(S, K, T, r, sigma):
+        sigma_sqrt_T = sigma * np.sqrt(T)
+        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / sigma_sqrt_T
+        d2 = d1 - sigma_sqrt_T
+        return d1, d2
+
+    @staticmethod
+    # 标准正态密度；直接用公式计算，避免scipy.stats在小数组上的调用开销
+    def _pdf(x):
+        return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+    @staticmethod
+    def _call_flags(option_type):
+        # 将逐行的期权类型('call'/'put'字符串或布尔数组)转换为"是否为看涨"的布尔数组
+        flags = np.asarray(option_type)
+        if flags.dtype == bool:
+            return flags
+        is_call = flags == 'call'
+        if not np.all(is_call | (flags == 'put')):
+            raise ValueError("option_type must be either 'call' or 'put'")
+        return is_call
+
+    @staticmethod
+    # 批量Black-Scholes定价，适用于整条期权链
+    def black_scholes_batch(S, K, T, r, sigma, option_type='call'):
+        """
+        向量化的Black-Scholes定价，一次调用即可为整条期权链（10^6+个合约）定价。
+
+        参数:
+        S, K, T, r, sigma (float 或 np.ndarray): 按NumPy规则广播。
+        option_type (str, np.ndarray): 'call'/'put'，或逐行的'call'/'put'字符串数组，或布尔数组（True表示看涨）。
+
+        返回:
+        np.ndarray: 广播后形状的期权价格。
+        """
+        S, K, T, r, sigma = (np.asarray(x, dtype=float) for x in (S, K, T, r, sigma))
+        is_call = OptionPriceCalculator._call_flags(option_type)
+        d1, d2 = OptionPriceCalculator._d1_d2(S, K, T, r, sigma)
+
+        # 看涨: S*N(d1) - K*e^(-rT)*N(d2)；看跌: K*e^(-rT)*N(-d2) - S*N(-d1)
+        sign = np.where(is_call, 1.0, -1.0)
+        return sign * (S * ndtr(sign * d1) - K * np.exp(-r * T) * ndtr(sign * d2))
+
+    @staticmethod
+    # 一次计算价格和全部Greeks
+    def greeks(S, K, T, r, sigma, option_type='call'):
+        """
+        融合计算价格及一阶、二阶Greeks：d1/d2、pdf、cdf每个合约只计算一次。
+
+        参数同black_scholes_batch。
+
+        返回:
+        dict: 列式结果，键为 'price', 'delta', 'gamma', 'vega', 'theta', 'rho', 'vanna', 'volga'，值为np.ndarray。
+              vega/rho为波动率/利率每变化1.0（而不是1%）的价格变化，theta为每年的价格变化，
+              vanna = d(delta)/d(sigma)，volga = d(vega)/d(sigma)。
+        """
+        S, K, T, r, sigma = (np.asarray(x, dtype=float) for x in (S, K, T, r, sigma))
+        is_call = OptionPriceCalculator._call_flags(option_type)
+        d1, d2 = OptionPriceCalculator._d1_d2(S, K, T, r, sigma)
+
+        sign = np.where(is_call, 1.0, -1.0)
+        sqrt_T = np.sqrt(T)
+        pdf_d1 = OptionPriceCalculator._pdf(d1)
+        cdf_d1 = ndtr(sign * d1)
+        cdf_d2 = ndtr(sign * d2)
+        discounted_K = K * np.exp(-r * T)
+        vega = S * pdf_d1 * sqrt_T
+
+        return {
+            'price': sign * (S * cdf_d1 - discounted_K * cdf_d2),
+            'delta': sign * cdf_d1,
+            'gamma': pdf_d1 / (S * sigma * sqrt_T),
+            'vega': vega,
+            'theta': -S * pdf_d1 * sigma / (2 * sqrt_T) - sign * r * discounted_K * cdf_d2,
+            'rho': sign * T * discounted_K * cdf_d2,
+            'vanna': -pdf_d1 * d2 / sigma,
+            'volga': vega * d1 * d2 / sigma,
+        }
+
     @staticmethod
     # 隐含波动率计算
     def implied_volatility(option_market_price, S, K, T, r, option_type='call'):
@@ -31,56 +129,122 @@ class OptionPriceCalculator:
         return iv
 
     @staticmethod
-    def get_risk_free_rate(expiration_days=None):
+    # 批量隐含波动率计算：带区间保护的向量化Newton迭代
+    def implied_volatility_batch(option_market_price, S, K, T, r, option_type='call',
+                                 sigma_min=1e-6, sigma_max=5.0, tol=1e-8, sigma_tol=1e-10, max_iter=100):
         """
-        获取无风险利率，默认为最短时间的国债利率。
+        一次求解整条期权链的隐含波动率，不会因个别报价而抛出异常。
+
+        每个合约维护一个[sigma_low, sigma_high]区间，Newton步（利用vega）落在区间外或vega过小时改用二分，
+        只对尚未收敛的合约继续迭代。
 
         参数:
-        expiration_days (int): 期权的到期时间，以天为单位。如果为None，则默认为最短时间的国债利率。
+        option_market_price, S, K, T, r (float 或 np.ndarray): 按NumPy规则广播。
+        option_type (str, np.ndarray): 同black_scholes_batch。
+        sigma_min, sigma_max (float): 波动率搜索区间，与implied_volatility的brentq区间一致。
+        tol (float): 价格误差容忍度。
+        sigma_tol (float): 波动率误差容忍度；深度虚值合约价格对波动率不敏感，需同时满足两者才算收敛。
+        max_iter (int): 最大迭代次数。
 
         返回:
-        float: 无风险利率（年化）。
+        tuple: (隐含波动率数组, 状态码数组)。未收敛或违反无套利边界的合约波动率为NaN，
+               报价不在[sigma_min, sigma_max]对应价格之间时为IV_NOT_CONVERGED，状态码见OptionPriceCalculator.IV_*。
+        """
+        price, S, K, T, r = np.broadcast_arrays(
+            *(np.asarray(x, dtype=float) for x in (option_market_price, S, K, T, r)))
+        is_call = np.broadcast_to(OptionPriceCalculator._call_flags(option_type), price.shape)
+        shape = price.shape
+        price, S, K, T, r, is_call = (x.ravel() for x in (price, S, K, T, r, is_call))
+
+        iv = np.full(price.shape, np.nan)
+        status = np.full(price.shape, OptionPriceCalculator.IV_NOT_CONVERGED, dtype=np.int8)
+
+        # 无套利边界检查
+        valid = np.isfinite(price) & (price > 0) & (S > 0) & (K > 0) & (T > 0)
+        status[~valid] = OptionPriceCalculator.IV_INVALID_INPUT
+        discounted_K = K * np.exp(-r * T)
+        lower_bound = np.where(is_call, np.maximum(S - discounted_K, 0), np.maximum(discounted_K - S, 0))
+        upper_bound = np.where(is_call, S, discounted_K)
+        below = valid & (price <= lower_bound)
+        above = valid & (price >= upper_bound)
+        status[below] = OptionPriceCalculator.IV_BELOW_INTRINSIC
+        status[above] = OptionPriceCalculator.IV_ABOVE_UPPER_BOUND
+
+        # 报价必须落在sigma_min和sigma_max对应的价格之间，否则区间收缩到端点也不是解，保持未收敛状态
+        idx = np.flatnonzero(valid & ~below & ~above)
+        price_low = OptionPriceCalculator.black_scholes_batch(S[idx], K[idx], T[idx], r[idx], sigma_min, is_call[idx])
+        price_high = OptionPriceCalculator.black_scholes_batch(S[idx], K[idx], T[idx], r[idx], sigma_max, is_call[idx])
+        idx = idx[(price_low <= price[idx]) & (price[idx] <= price_high)]
+        p, s, k, t, rr, c = price[idx], S[idx], K[idx], T[idx], r[idx], is_call[idx]
+        low = np.full(idx.shape, sigma_min)
+        high = np.full(idx.shape, sigma_max)
+        # Manaster-Koehler初始值
+        sigma = np.clip(np.sqrt(2 * np.abs(np.log(s / k) + rr * t) / t), 0.05, 1.0)
+
+        for _ in range(max_iter):
+            if idx.size == 0:
+                break
+            d1, _ = OptionPriceCalculator._d1_d2(s, k, t, rr, sigma)
+            diff = OptionPriceCalculator.black_scholes_batch(s, k, t, rr, sigma, c) - p
+            vega = s * OptionPriceCalculator._pdf(d1) * np.sqrt(t)
+
+            done = (np.abs(diff) < tol) & ((np.abs(diff) < sigma_tol * vega) | (high - low < sigma_tol))
+            iv[idx[done]] = sigma[done]
+            status[idx[done]] = OptionPriceCalculator.IV_CONVERGED
+
+            # 价格随波动率单调递增，据此收缩区间
+            high = np.where(diff > 0, sigma, high)
+            low = np.where(diff < 0, sigma, low)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                newton = sigma - diff / vega
+            use_newton = (vega > 1e-12) & (newton > low) & (newton < high)
+            sigma = np.where(use_newton, newton, 0.5 * (low + high))
+
+            keep = ~done
+            idx, p, s, k, t, rr, c = idx[keep], p[keep], s[keep], k[keep], t[keep], rr[keep], c[keep]
+            low, high, sigma = low[keep], high[keep], sigma[keep]
+
+        return iv.reshape(shape), status.reshape(shape)
+
+    @staticmethod
+    def get_yield_curve():
+        # 收益率曲线只加载一次（本地缓存有效时不访问网络），之后所有定价调用共用
+        if OptionPriceCalculator._yield_curve is None:
+            OptionPriceCalculator._yield_curve = YieldCurve().load()
+        return OptionPriceCalculator._yield_curve
+
+    @staticmethod
+    def set_yield_curve(yield_curve):
+        # 可替换为离线或自定义的YieldCurve，例如 YieldCurve(offline=True, fixture_path=...)
+        OptionPriceCalculator._yield_curve = yield_curve.load()
+
+    @staticmethod
+    def get_risk_free_rate(expiration_days=None):
         """
-        # 获取不同期限的美国国债收益率
-        three_month_rate = web.DataReader('TB3MS', 'fred')  # 3个月国债收益率
-        six_month_rate = web.DataReader('TB6MS', 'fred')  # 6个月国债收益率
-        one_year_rate = web.DataReader('GS1', 'fred')  # 1年期国债收益率
-        five_year_rate = web.DataReader('GS5', 'fred')  # 5年期国债收益率
-        ten_year_rate = web.DataReader('GS10', 'fred')  # 10年期国债收益率
+        获取无风险利率，默认为最短时间的国债利率。
 
-        # 合并数据
-        rates = pd.concat([three_month_rate, six_month_rate, one_year_rate, five_year_rate, ten_year_rate], axis=1)
-        rates.columns = ['3-Month', '6-Month', '1-Year', '5-Year', '10-Year']
+        参数:
+        expiration_days (int 或 np.ndarray): 期权的到期时间，以天为单位。如果为None，则默认为最短时间的国债利率。
 
-        # 获取最新的国债收益率
-        latest_rates = rates.iloc[-1]
+        返回:
+        float 或 np.ndarray: 按期限在国债收益率曲线上插值得到的连续复利无风险利率（年化）。
+        """
+        yield_curve = OptionPriceCalculator.get_yield_curve()
 
         # 如果未指定到期时间，则返回最短时间的国债利率
         if expiration_days is None:
-            return latest_rates['3-Month'] / 100
-
-        # 根据到期时间选择相应的无风险利率
-        T = expiration_days / 365  # 将天数转换为年
-        if T <= 0.25:
-            risk_free_rate = latest_rates['3-Month'] / 100
-        elif T <= 0.5:
-            risk_free_rate = latest_rates['6-Month'] / 100
-        elif T <= 1:
-            risk_free_rate = latest_rates['1-Year'] / 100
-        elif T <= 5:
-            risk_free_rate = latest_rates['5-Year'] / 100
-        else:
-            risk_free_rate = latest_rates['10-Year'] / 100
+            return yield_curve.rate(yield_curve.tenors[0])
 
-        return risk_free_rate
+        rates = yield_curve.rates(np.asarray(expiration_days, dtype=float) / 365)  # 将天数转换为年
+        return float(rates) if rates.ndim == 0 else rates
 
     @staticmethod
     def get_delta(S, K, T, r, sigma, option_type='call'):
         d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
         if option_type == 'call':
-            delta = norm.cdf(d1)
+            delta = ndtr(d1)
         elif option_type == 'put':
-            delta = norm.cdf(d1) - 1
+            delta = ndtr(d1) - 1
         else:
             raise ValueError("option_type must be either 'call' or 'put'")
         return delta
@@ -88,59 +252,67 @@ class OptionPriceCalculator:
     @staticmethod
     def get_gamma(S, K, T, r, sigma):
         d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        gamma = norm.pdf(d1) / (S * sigma * np.sqrt(T))
+        gamma = OptionPriceCalculator._pdf(d1) / (S * sigma * np.sqrt(T))
         return gamma
 
     @staticmethod
-    def integrate_delta(initial_stock_price, final_stock_price, K, T, r, sigma, option_type='call'):
-        stock_prices = np.linspace(initial_stock_price, final_stock_price, 100)
-        option_prices = [OptionPriceCalculator.black_scholes(S, K, T, r, sigma, option_type) for S in stock_prices]
-        deltas = [OptionPriceCalculator.get_delta(S, K, T, r, sigma, option_type) for S in stock_prices]
-
-        integrated_prices = [option_prices[0]]
-        for i in range(1, len(stock_prices)):
-            ds = stock_prices[i] - stock_prices[i - 1]
-            integrated_price = integrated_prices[-1] + deltas[i - 1] * ds
-            integrated_prices.append(integrated_price)
-
-        return stock_prices, integrated_prices
+    def _cumulative_integral(values, grid, initial_value, method='left'):
+        # 沿网格累积积分：'left'为左端点求和（与原逐点循环结果一致），'trapezoid'为梯形积分（误差更小）
+        ds = np.diff(grid)
+        if method == 'left':
+            increments = values[:-1] * ds
+        elif method == 'trapezoid':
+            increments = 0.5 * (values[:-1] + values[1:]) * ds
+        else:
+            raise ValueError("method must be either 'left' or 'trapezoid'")
+        return initial_value + np.concatenate(([0.0], np.cumsum(increments)))
 
     @staticmethod
-    def integrate_delta_stress(initial_stock_price, final_stock_price, K, T, r, sigma, option_type='call', stress_val=0):
-        stock_prices = np.linspace(initial_stock_price, final_stock_price, 100)
-        option_prices = [OptionPriceCalculator.black_scholes(S, K, T, r, sigma, option_type) for S in stock_prices]
-        deltas = [OptionPriceCalculator.get_delta(S, K, T, r, sigma, option_type) for S in stock_prices]
+    def integrate_delta(initial_stock_price, final_stock_price, K, T, r, sigma, option_type='call',
+                        num_points=100, method='left'):
+        """
+        从initial_stock_price出发沿股价网格积分Delta，得到期权价格曲线。
 
-        integrated_prices = [option_prices[0]]
-        for i in range(1, len(stock_prices)):
-            ds = stock_prices[i] - stock_prices[i - 1]
-            integrated_price = integrated_prices[-1] + (deltas[i - 1]-stress_val) * ds
-            integrated_prices.append(integrated_price)
+        所有网格点的Delta一次向量化计算，再用累积和积分，百万级网格点也可即时完成。
+        默认参数（100个点、左端点求和）与原逐点循环实现的结果相对误差在1e-12以内；
+        method='trapezoid'的离散误差为O(ds^2)，更接近Black-Scholes价格。
 
+        返回:
+        tuple: (股价网格 np.ndarray, 积分得到的期权价格 np.ndarray)
+        """
+        stock_prices = np.linspace(initial_stock_price, final_stock_price, num_points)
+        deltas = OptionPriceCalculator.get_delta(stock_prices, K, T, r, sigma, option_type)
+        initial_price = OptionPriceCalculator.black_scholes(initial_stock_price, K, T, r, sigma, option_type)
+        integrated_prices = OptionPriceCalculator._cumulative_integral(deltas, stock_prices, initial_price, method)
         return stock_prices, integrated_prices
 
     @staticmethod
-    def integrate_gamma(initial_stock_price, final_stock_price, K, T, r, sigma, option_type='call'):
-        stock_prices = np.linspace(initial_stock_price, final_stock_price, 100)
-        deltas = [OptionPriceCalculator.get_delta(S, K, T, r, sigma, option_type) for S in stock_prices]
-        gammas = [OptionPriceCalculator.get_gamma(S, K, T, r, sigma) for S in stock_prices]
-
-        integrated_deltas = [deltas[0]]
-        for i in range(1, len(stock_prices)):
-            ds = stock_prices[i] - stock_prices[i - 1]
-            integrated_delta = integrated_deltas[-1] + gammas[i - 1] * ds
-            integrated_deltas.append(integrated_delta)
-
-        integrated_prices = [OptionPriceCalculator.black_scholes(initial_stock_price, K, T, r, sigma, option_type)]
-        for i in range(1, len(stock_prices)):
-            ds = stock_prices[i] - stock_prices[i - 1]
-            integrated_price = integrated_prices[-1] + integrated_deltas[i - 1] * ds
-            integrated_prices.append(integrated_price)
+    def integrate_delta_stress(initial_stock_price, final_stock_price, K, T, r, sigma, option_type='call', stress_val=0,
+                               num_points=100, method='left'):
+        # 与integrate_delta相同，但每个网格点的Delta都减去stress_val
+        stock_prices = np.linspace(initial_stock_price, final_stock_price, num_points)
+        deltas = OptionPriceCalculator.get_delta(stock_prices, K, T, r, sigma, option_type) - stress_val
+        initial_price = OptionPriceCalculator.black_scholes(initial_stock_price, K, T, r, sigma, option_type)
+        integrated_prices = OptionPriceCalculator._cumulative_integral(deltas, stock_prices, initial_price, method)
+        return stock_prices, integrated_prices
 
+    @staticmethod
+    def integrate_gamma(initial_stock_price, final_stock_price, K, T, r, sigma, option_type='call',
+                        num_points=100, method='left'):
+        # 先积分Gamma得到Delta，再积分Delta得到期权价格，精度约定同integrate_delta
+        stock_prices = np.linspace(initial_stock_price, final_stock_price, num_points)
+        gammas = OptionPriceCalculator.get_gamma(stock_prices, K, T, r, sigma)
+        initial_delta = OptionPriceCalculator.get_delta(initial_stock_price, K, T, r, sigma, option_type)
+        integrated_deltas = OptionPriceCalculator._cumulative_integral(gammas, stock_prices, initial_delta, method)
+
+        initial_price = OptionPriceCalculator.black_scholes(initial_stock_price, K, T, r, sigma, option_type)
+        integrated_prices = OptionPriceCalculator._cumulative_integral(integrated_deltas, stock_prices, initial_price,
+                                                                      method)
         return stock_prices, integrated_prices
 
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
+    from OptionChainLoader import OptionChainLoader
 
     # calc = OptionPriceCalculator()
     # risk_free_rate_default = calc.get_risk_free_rate()
@@ -161,8 +333,8 @@ if __name__ == "__main__":
 
     # 获取期权链
     expiration = '2024-07-19'
-    options = stock.option_chain(expiration)
-    puts = options.puts
+    chains = OptionChainLoader().load([ticker], [expiration])
+    puts = chains[chains['optionType'] == 'put']
 
     #--------------------------------------------------------------------------------------------------------------------
     # # 获取行权价为125的看跌期权市场价格
@@ -187,8 +359,6 @@ if __name__ == "__main__":
     #-------------------------------------------------------------------------------------------------------------------
     # 获取行权价格在100到130之间的看跌期权市场价格
     strike_prices = np.arange(100, 130, 1)
-    put_prices = []
-    implied_vols = []
 
     expiration_date = pd.to_datetime(expiration)
     current_date = pd.Timestamp('now')
@@ -197,18 +367,19 @@ if __name__ == "__main__":
     calc = OptionPriceCalculator()
     risk_free_rate = calc.get_risk_free_rate(days_to_expiration)
 
-    for strike_price in strike_prices:
-        try:
-            put_option_market_price = puts[puts['strike'] == strike_price]['lastPrice'].values[0]
-            put_prices.append(put_option_market_price)
-            implied_vol = calc.implied_volatility(put_option_market_price, current_stock_price, strike_price,
-                                                  days_to_expiration / 365, risk_free_rate, option_type='put')
-            implied_vols.append(implied_vol)
-            print(f"Strike Price: {strike_price}, Impl Vol: {implied_vol:.4f}")
-        except IndexError:
+    # 一次求解所有行权价的隐含波动率，缺失报价为NaN
+    put_prices = puts.drop_duplicates('strike').set_index('strike')['lastPrice'].reindex(strike_prices).values
+    implied_vols, iv_status = calc.implied_volatility_batch(put_prices, current_stock_price, strike_prices,
+                                                            days_to_expiration / 365, risk_free_rate,
+                                                            option_type='put')
+
+    for strike_price, put_price, implied_vol, status in zip(strike_prices, put_prices, implied_vols, iv_status):
+        if np.isnan(put_price):
             print(f"No market price available for strike price {strike_price}")
-            put_prices.append(None)
-            implied_vols.append(None)
+        elif status != calc.IV_CONVERGED:
+            print(f"Strike Price: {strike_price}, Impl Vol: N/A ({calc.IV_STATUS_MESSAGES[status]})")
+        else:
+            print(f"Strike Price: {strike_price}, Impl Vol: {implied_vol:.4f}")
 
     # 绘制隐含波动率图
     plt.figure(figsize=(10, 6))
@@ -0,0 +1,338 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from OptionPriceCalculator import OptionPriceCalculator
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+# 每条期权腿保存的持仓级别数值（已乘以数量和合约乘数）
+LEG_FIELDS = ('value', 'delta', 'gamma', 'vega', 'theta')
+
+
+class ReplayFeed:
+
+    def __init__(self, timestamps, tickers, prices, speed=None):
+        """
+        按时间顺序回放的行情，每个事件为 (时间戳秒数, ticker或期权合约代码, 价格)。
+
+        参数:
+        timestamps (array-like): Unix时间戳（秒）。
+        tickers (array-like): 每个事件对应的股票ticker或期权腿的'symbol'。
+        prices (array-like): 成交价或报价中间价。
+        speed (float): None表示尽快回放；1.0表示按真实时间间隔回放，60表示60倍速。
+        """
+        timestamps = np.asarray(timestamps, dtype=float)
+        order = np.argsort(timestamps, kind='stable')
+        self.timestamps = timestamps[order]
+        self.tickers = np.asarray(tickers, dtype=object)[order]
+        self.prices = np.asarray(prices, dtype=float)[order]
+        self.speed = speed
+
+    @staticmethod
+    def from_minute_data(tickers, directory='.', column='Close', speed=None):
+        # 读取MockMinuteDataProvider使用的 {ticker}_minute_data.csv，多只股票按时间合并成一条事件流
+        timestamps, names, prices = [], [], []
+        for ticker in tickers:
+            data = pd.read_csv(os.path.join(directory, f"{ticker}_minute_data.csv"), usecols=['Datetime', column])
+            times = pd.to_datetime(data['Datetime'], utc=True)
+            timestamps.append((times - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy())
+            names.append(np.full(len(data), ticker, dtype=object))
+            prices.append(data[column].to_numpy(dtype=float))
+        return ReplayFeed(np.concatenate(timestamps), np.concatenate(names), np.concatenate(prices), speed)
+
+    @staticmethod
+    def merge(feeds, speed=None):
+        # 合并多条事件流（例如股票分钟K线和期权报价），时间戳相同时保持原有顺序
+        return ReplayFeed(np.concatenate([feed.timestamps for feed in feeds]),
+                          np.concatenate([feed.tickers for feed in feeds]),
+                          np.concatenate([feed.prices for feed in feeds]), speed)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        events = zip(self.timestamps.tolist(), self.tickers.tolist(), self.prices.tolist())
+        if self.speed is None:
+            yield from events
+            return
+        wall_start, replay_start = time.perf_counter(), None
+        for event in events:
+            replay_start = event[0] if replay_start is None else replay_start
+            delay = (event[0] - replay_start) / self.speed - (time.perf_counter() - wall_start)
+            if delay > 0:
+                time.sleep(delay)
+            yield event
+
+
+class PollingFeed:
+
+    def __init__(self, quote_function, tickers, interval=60, max_polls=None):
+        """
+        实盘行情：每隔interval秒用一次批量请求获取所有ticker的最新价格。
+
+        参数:
+        quote_function (callable): 接受ticker列表、返回对应价格列表的函数，例如 robin_stocks 的
+                                   r.get_latest_price 或 Portfolio.latest_prices；获取失败的ticker返回None。
+        tickers (list[str]): 要订阅的ticker。
+        interval (float): 轮询间隔（秒）。
+        max_polls (int): 最多轮询次数，None表示一直运行。
+        """
+        self.quote_function = quote_function
+        self.tickers = list(tickers)
+        self.interval = interval
+        self.max_polls = max_polls
+
+    def __iter__(self):
+        polls = 0
+        while self.max_polls is None or polls < self.max_polls:
+            timestamp = time.time()
+            for ticker, price in zip(self.tickers, self.quote_function(self.tickers)):
+                if price is not None:
+                    yield timestamp, ticker, float(price)
+            polls += 1
+            time.sleep(self.interval)
+
+
+class PositionMonitor:
+
+    def __init__(self, legs, underlying=None, start_time=None, implied_volatility_from_quotes=True,
+                 latency_window=10_000):
+        """
+        常驻的持仓监控：订阅股票和期权的价格更新，每个tick只重新计算受影响的腿，增量维护组合市值、收益、Greeks
+        和对冲覆盖率，并记录每个tick的处理延迟。
+
+        股票tick重新计算该标的的所有期权腿（股价和剩余期限变化）；期权报价tick只更新该合约：用报价反推隐含波动率，
+        之后该腿按新的波动率定价。
+
+        参数:
+        legs (list[dict]): 组合，格式见PositionProfitCalculator.position_value，另外可以包含
+                           'underlying'（标的ticker，缺省时用underlying参数）和期权腿的'symbol'（接收期权报价的代码）。
+                           T为start_time时刻的剩余期限（年）。
+        underlying (str): 没有'underlying'键的腿所属的标的。
+        start_time (float): T对应的Unix时间戳（秒），默认为收到的第一个tick的时间。
+        implied_volatility_from_quotes (bool): 期权报价tick是否更新该腿的隐含波动率；False时忽略期权报价。
+        latency_window (int): 延迟统计保留的最近tick数。
+        """
+        self.start_time = start_time
+        self.implied_volatility_from_quotes = implied_volatility_from_quotes
+        self.stock_shares = {}
+        self.stock_cost = {}
+        self.spot = {}
+        self.quotes = {}
+
+        options = []
+        for leg in legs:
+            name = leg.get('underlying', underlying)
+            if name is None:
+                raise ValueError("Every leg needs an 'underlying' when no default underlying is given")
+            self.stock_shares.setdefault(name, 0.0)
+            self.stock_cost.setdefault(name, 0.0)
+            if leg['type'] == 'stock':
+                self.stock_shares[name] += leg['quantity']
+                self.stock_cost[name] += leg['quantity'] * leg['entry_price']
+            else:
+                options.append((name, leg))
+
+        self.underlyings = {name: np.array([i for i, (leg_underlying, _) in enumerate(options)
+                                            if leg_underlying == name], dtype=int) for name in self.stock_shares}
+        self.leg_underlying = [name for name, _ in options]
+        self.symbols = {leg['symbol']: i for i, (_, leg) in enumerate(options) if 'symbol' in leg}
+        self.K = np.array([leg['strike'] for _, leg in options], dtype=float)
+        self.T = np.array([leg['T'] for _, leg in options], dtype=float)
+        self.r = np.array([leg['r'] for _, leg in options], dtype=float)
+        self.sigma = np.array([leg['sigma'] for _, leg in options], dtype=float)
+        self.is_call = np.array([leg['type'] == 'call' for _, leg in options], dtype=bool)
+        self.weights = np.array([leg['quantity'] * leg.get('multiplier', 100) * leg.get('markup', 1.0)
+                                 for _, leg in options], dtype=float)
+        self.option_cost = {name: sum(leg['quantity'] * leg['entry_price'] * leg.get('multiplier', 100)
+                                      for leg_underlying, leg in options if leg_underlying == name)
+                            for name in self.stock_shares}
+
+        # 每条腿的最新结果，以及每个标的期权部分的合计（尚未收到股价的标的为NaN）
+        self.leg_values = np.full((len(options), len(LEG_FIELDS)), np.nan)
+        self.option_totals = {name: np.full(len(LEG_FIELDS), np.nan) for name in self.stock_shares}
+
+        self._latencies = np.zeros(latency_window)
+        self.tick_count = 0
+        self.recomputed_legs = 0
+        self.ignored_ticks = 0
+
+    @staticmethod
+    # 把tradingBot中的Stock持仓转换成一条股票腿
+    def stock_leg(stock):
+        return {'type': 'stock', 'underlying': stock.ticker, 'quantity': stock.get_shares(),
+                'entry_price': stock.get_average_cost()}
+
+    def _revalue(self, legs, spot, timestamp):
+        # 计算若干条腿在当前股价和剩余期限下的持仓级别数值，形状 (腿数, len(LEG_FIELDS))
+        T = self.T[legs] - (timestamp - self.start_time) / SECONDS_PER_YEAR
+        live = T > 0
+        greeks = OptionPriceCalculator.greeks(spot, self.K[legs], np.where(live, T, 1.0), self.r[legs],
+                                              self.sigma[legs], self.is_call[legs])
+        # 已到期的腿按内在价值计算，Delta为0或±1，其余Greeks为0
+        sign = np.where(self.is_call[legs], 1.0, -1.0)
+        in_the_money = sign * (spot - self.K[legs]) > 0
+        values = np.column_stack([
+            np.where(live, greeks['price'], np.maximum(sign * (spot - self.K[legs]), 0)),
+            np.where(live, greeks['delta'], sign * in_the_money),
+            np.where(live, greeks['gamma'], 0.0),
+            np.where(live, greeks['vega'], 0.0),
+            np.where(live, greeks['theta'], 0.0),
+        ])
+        return values * self.weights[legs, None]
+
+    def on_tick(self, timestamp, ticker, price):
+        """
+        处理一个价格更新。
+
+        参数:
+        timestamp (float): Unix时间戳（秒）。
+        ticker (str): 标的ticker或期权腿的'symbol'；不在组合中的代码被忽略。
+        price (float): 股价或期权每股报价。
+
+        返回:
+        int: 本次重新计算的期权腿数。
+        """
+        start = time.perf_counter_ns()
+        if self.start_time is None:
+            self.start_time = timestamp
+        recomputed = 0
+
+        if ticker in self.underlyings:
+            self.spot[ticker] = price
+            legs = self.underlyings[ticker]
+            if len(legs):
+                self.leg_values[legs] = self._revalue(legs, price, timestamp)
+                recomputed = len(legs)
+            self.option_totals[ticker] = self.leg_values[legs].sum(axis=0)
+        elif ticker in self.symbols and self.implied_volatility_from_quotes:
+            self.quotes[ticker] = price
+            leg = self.symbols[ticker]
+            name = self.leg_underlying[leg]
+            spot = self.spot.get(name)
+            T = self.T[leg] - (timestamp - self.start_time) / SECONDS_PER_YEAR
+            if spot is not None and T > 0:
+                iv, status = OptionPriceCalculator.implied_volatility_batch(price, spot, self.K[leg], T, self.r[leg],
+                                                                            option_type=self.is_call[leg])
+                # 报价低于内在价值等无法反推的情况保留原波动率
+                if status == OptionPriceCalculator.IV_CONVERGED:
+                    self.sigma[leg] = float(iv)
+                old = self.leg_values[leg].copy()
+                self.leg_values[leg] = self._revalue(np.array([leg]), spot, timestamp)[0]
+                self.option_totals[name] += self.leg_values[leg] - old
+                recomputed = 1
+        else:
+            self.ignored_ticks += 1
+
+        self.recomputed_legs += recomputed
+        self._latencies[self.tick_count % len(self._latencies)] = time.perf_counter_ns() - start
+        self.tick_count += 1
+        return recomputed
+
+    def run(self, feed, callback=None):
+        """
+        消费一条行情（ReplayFeed、PollingFeed或任何产生 (时间戳, ticker, 价格) 的可迭代对象）直到结束。
+
+        参数:
+        callback (callable): 每个tick处理后调用 callback(monitor, timestamp, ticker)，例如用于告警或刷新界面。
+
+        返回:
+        dict: 结束时的snapshot()。
+        """
+        for timestamp, ticker, price in feed:
+            self.on_tick(timestamp, ticker, price)
+            if callback is not None:
+                callback(self, timestamp, ticker)
+        return self.snapshot()
+
+    def snapshot(self):
+        """
+        返回:
+        dict: 组合合计 'value'、'pnl'、'delta'（等价股数）、'gamma'、'vega'、'theta'（每年），以及 'by_underlying'：
+              每个标的的 'spot'、'stock_shares'、'option_delta'、'net_delta' 和 'hedge_coverage'
+              （期权Delta抵消股票Delta的比例，1表示完全对冲，没有股票持仓时为NaN）。
+              尚未收到股价的标的不计入合计。
+        """
+        totals = dict.fromkeys(('value', 'pnl', 'delta', 'gamma', 'vega', 'theta'), 0.0)
+        by_underlying = {}
+        for name, shares in self.stock_shares.items():
+            spot = self.spot.get(name)
+            option = dict(zip(LEG_FIELDS, self.option_totals[name].tolist()))
+            summary = {'spot': spot, 'stock_shares': shares, 'option_delta': option['delta'],
+                       'net_delta': shares + option['delta'],
+                       'hedge_coverage': -option['delta'] / shares if shares else float('nan')}
+            by_underlying[name] = summary
+            if spot is None:
+                continue
+            value = shares * spot + option['value']
+            totals['value'] += value
+            totals['pnl'] += value - self.stock_cost[name] - self.option_cost[name]
+            totals['delta'] += summary['net_delta']
+            for field in ('gamma', 'vega', 'theta'):
+                totals[field] += option[field]
+        totals['by_underlying'] = by_underlying
+        return totals
+
+    def legs(self):
+        # 每条期权腿的最新结果（持仓级别），便于查看哪条腿贡献了风险
+        frame = pd.DataFrame(self.leg_values, columns=list(LEG_FIELDS))
+        frame.insert(0, 'underlying', self.leg_underlying)
+        frame.insert(1, 'symbol', pd.Series({i: symbol for symbol, i in self.symbols.items()}, dtype=object)
+                     .reindex(range(len(frame))).to_numpy())
+        frame.insert(2, 'strike', self.K)
+        frame.insert(3, 'sigma', self.sigma)
+        return frame
+
+    def latency_stats(self):
+        # 最近latency_window个tick的处理延迟（微秒）
+        count = min(self.tick_count, len(self._latencies))
+        if count == 0:
+            return {'ticks': 0, 'mean_us': 0.0, 'p50_us': 0.0, 'p99_us': 0.0, 'max_us': 0.0}
+        latencies = self._latencies[:count] / 1000
+        p50, p99 = np.percentile(latencies, [50, 99])
+        return {'ticks': self.tick_count, 'mean_us': float(latencies.mean()), 'p50_us': float(p50),
+                'p99_us': float(p99), 'max_us': float(latencies.max())}
+
+
+if __name__ == "__main__":
+    # 回放AAPL分钟K线：持有200股，买入2张210看跌、卖出1张225看涨；看跌期权每15分钟收到一次报价，
+    # 报价按逐渐升高的波动率生成，模拟市场隐含波动率上升
+    feed = ReplayFeed.from_minute_data(['AAPL'], '../tradingBot/test')
+    start_time, r = feed.timestamps[0], 0.05
+    legs = [{'type': 'stock', 'quantity': 200, 'entry_price': 212.0},
+            {'type': 'put', 'symbol': 'AAPL 210P', 'quantity': 2, 'strike': 210, 'T': 21 / 365, 'r': r,
+             'sigma': 0.22, 'entry_price': 2.1},
+            {'type': 'call', 'symbol': 'AAPL 225C', 'quantity': -1, 'strike': 225, 'T': 21 / 365, 'r': r,
+             'sigma': 0.2, 'entry_price': 1.4}]
+
+    quote_index = np.arange(0, len(feed), 15)
+    quote_times = feed.timestamps[quote_index]
+    quote_vols = np.linspace(0.22, 0.3, len(quote_index))
+    quote_T = 21 / 365 - (quote_times - start_time) / SECONDS_PER_YEAR
+    quotes = OptionPriceCalculator.black_scholes_batch(feed.prices[quote_index], 210, quote_T, r, quote_vols, 'put')
+    # 报价紧跟在同一分钟的股价之后
+    option_feed = ReplayFeed(quote_times + 1, np.full(len(quote_index), 'AAPL 210P', dtype=object), quotes)
+    combined = ReplayFeed.merge([feed, option_feed])
+
+    monitor = PositionMonitor(legs, underlying='AAPL', start_time=start_time)
+    alerts = []
+    start = time.perf_counter()
+    snapshot = monitor.run(combined, callback=lambda m, timestamp, ticker: alerts.append(timestamp)
+                           if m.option_totals['AAPL'][1] < -300 else None)
+    elapsed = time.perf_counter() - start
+    print(f"Processed {monitor.tick_count:,} ticks in {elapsed:.3f}s ({monitor.tick_count / elapsed:,.0f} ticks/s), "
+          f"{monitor.recomputed_legs:,} leg revaluations")
+    print(f"Latency: {monitor.latency_stats()}")
+    print(f"Ticks with option delta below -300 shares: {len(alerts)}")
+    print({key: value for key, value in snapshot.items() if key != 'by_underlying'})
+    print(snapshot['by_underlying'])
+    print(monitor.legs().to_string(index=False))
+
+    # 与按最终状态整体重新计算的结果对比
+    final_T = monitor.T - (combined.timestamps[-1] - start_time) / SECONDS_PER_YEAR
+    full = OptionPriceCalculator.greeks(monitor.spot['AAPL'], monitor.K, final_T, monitor.r, monitor.sigma,
+                                        monitor.is_call)
+    print(f"Max delta difference vs full revaluation: "
+          f"{abs((full['delta'] * monitor.weights).sum() - monitor.option_totals['AAPL'][1]):.2e}")
@@ -0,0 +1,146 @@
+import numpy as np
+from scipy.optimize import brentq
+
+from OptionPriceCalculator import OptionPriceCalculator
+
+
+class PositionProfitCalculator:
+
+    @staticmethod
+    def option_price_curve(stock_prices, current_stock_price, K, T, r, sigma, option_type='put', stress_val=0):
+        """
+        在一个共享的股价网格上积分Delta，一次得到所有股价对应的期权价格。
+
+        把当前股价插入网格作为积分起点，用梯形积分从起点分别向两侧累积，
+        取代对每个股价单独调用integrate_delta（每次都重建100点网格）的O(N²)做法。
+
+        参数:
+        stock_prices (np.ndarray): 升序排列的模拟股价。
+        stress_val (float): 每个网格点的Delta减去的压力值，与integrate_delta_stress一致。
+
+        返回:
+        np.ndarray: 与stock_prices对应的期权价格。
+        """
+        stock_prices = np.asarray(stock_prices, dtype=float)
+        anchor = np.searchsorted(stock_prices, current_stock_price)
+        grid = np.insert(stock_prices, anchor, current_stock_price)
+
+        deltas = OptionPriceCalculator.get_delta(grid, K, T, r, sigma, option_type) - stress_val
+        cumulative = OptionPriceCalculator._cumulative_integral(deltas, grid, 0.0, method='trapezoid')
+        initial_price = OptionPriceCalculator.black_scholes(current_stock_price, K, T, r, sigma, option_type)
+        option_prices = initial_price + cumulative - cumulative[anchor]
+        return np.delete(option_prices, anchor)
+
+    @staticmethod
+    def hedged_profit_curve(current_stock_price, option_market_price, K, T, r, sigma, option_type='put',
+                            price_range=15, step=0.01, num_shares=20, num_contracts=1, contract_multiplier=100,
+                            markup=1.05, stress_val=0):
+        """
+        计算"持有股票 + 买入期权"组合的总收益曲线。
+
+        参数:
+        current_stock_price (float): 当前股价，也是股票的建仓价格。
+        option_market_price (float): 期权的买入价格（每股）。
+        price_range, step (float): 模拟股价范围为 [current_stock_price - price_range, current_stock_price + price_range)，步长step。
+        num_shares (float): 持有股数。
+        num_contracts (float): 期权合约数。
+        contract_multiplier (float): 每个合约对应的股数。
+        markup (float): 期权理论价格的调整系数（原脚本中的1.05）。
+        stress_val (float): Delta压力值，见option_price_curve。
+
+        返回:
+        tuple: (模拟股价 np.ndarray, 总收益 np.ndarray, 盈亏平衡股价 np.ndarray)
+        """
+        stock_prices = np.arange(current_stock_price - price_range, current_stock_price + price_range, step)
+        option_prices = PositionProfitCalculator.option_price_curve(stock_prices, current_stock_price, K, T, r, sigma,
+                                                                    option_type, stress_val)
+
+        stock_profits = (stock_prices - current_stock_price) * num_shares
+        option_profits = (option_prices * markup - option_market_price) * num_contracts * contract_multiplier
+        total_profits = stock_profits + option_profits
+
+        # 盈亏平衡点用根求解得到精确值，不受网格步长限制
+        def profit_function(prices):
+            option_values = (OptionPriceCalculator.black_scholes(prices, K, T, r, sigma, option_type)
+                             - stress_val * (prices - current_stock_price))
+            return ((prices - current_stock_price) * num_shares
+                    + (option_values * markup - option_market_price) * num_contracts * contract_multiplier)
+
+        break_even_points = PositionProfitCalculator.find_break_even_points(profit_function, stock_prices[0],
+                                                                            stock_prices[-1])
+        return stock_prices, total_profits, break_even_points
+
+    @staticmethod
+    def position_value(legs, stock_prices):
+        """
+        计算多腿股票/期权组合在各个股价下的市值（向量化）。
+
+        参数:
+        legs (list[dict]): 每条腿是一个dict:
+            股票: {'type': 'stock', 'quantity': 20, 'entry_price': 123.0}
+            期权: {'type': 'put' 或 'call', 'quantity': 1, 'strike': 118, 'T': 0.03, 'r': 0.05, 'sigma': 0.46,
+                   'entry_price': 1.3, 'multiplier': 100, 'markup': 1.0}
+            quantity为负表示卖出；期权的T<=0时按到期内在价值计算；multiplier默认100，markup默认1。
+        stock_prices (float 或 np.ndarray): 标的股价。
+
+        返回:
+        np.ndarray: 与stock_prices同形状的组合市值。
+        """
+        stock_prices = np.asarray(stock_prices, dtype=float)
+        value = np.zeros_like(stock_prices)
+        for leg in legs:
+            if leg['type'] == 'stock':
+                value = value + leg['quantity'] * stock_prices
+            else:
+                option_prices = PositionProfitCalculator.option_value(stock_prices, leg['strike'], leg['T'], leg['r'],
+                                                                      leg['sigma'], leg['type'])
+                value = value + (leg['quantity'] * leg.get('multiplier', 100) * leg.get('markup', 1.0)
+                                 * option_prices)
+        return value
+
+    @staticmethod
+    def position_profit(legs, stock_prices):
+        # 组合收益 = 当前市值 - 建仓成本
+        cost = sum(leg['quantity'] * leg['entry_price'] * (1 if leg['type'] == 'stock' else leg.get('multiplier', 100))
+                   for leg in legs)
+        return PositionProfitCalculator.position_value(legs, stock_prices) - cost
+
+    @staticmethod
+    def option_value(S, K, T, r, sigma, option_type='put'):
+        # Black-Scholes价格；T<=0（已到期）时返回内在价值
+        S = np.asarray(S, dtype=float)
+        if T <= 0:
+            return np.maximum(S - K, 0) if option_type == 'call' else np.maximum(K - S, 0)
+        return OptionPriceCalculator.black_scholes_batch(S, K, T, r, sigma, option_type)
+
+    @staticmethod
+    def find_break_even_points(profit_function, lower, upper, num_points=1000, xtol=1e-12):
+        """
+        找出收益函数在[lower, upper]内的所有零点。
+
+        先在num_points个点的粗网格上一次向量化求值，找出所有变号区间，
+        再对每个区间用brentq求根到机器精度；相邻网格点间有多个零点时需加密网格。
+
+        参数:
+        profit_function (callable): 接受股价数组、返回收益数组的向量化函数。
+        lower, upper (float): 搜索区间。
+        num_points (int): 粗网格点数。
+        xtol (float): brentq的绝对精度。
+
+        返回:
+        np.ndarray: 升序排列的盈亏平衡股价。
+        """
+        grid = np.linspace(lower, upper, num_points)
+        profits = np.asarray(profit_function(grid), dtype=float)
+        roots = list(grid[profits == 0])
+
+        scalar_function = lambda x: float(np.asarray(profit_function(np.atleast_1d(x)), dtype=float).ravel()[0])
+        for i in np.flatnonzero(profits[:-1] * profits[1:] < 0):
+            roots.append(brentq(scalar_function, grid[i], grid[i + 1], xtol=xtol))
+        return np.sort(np.array(roots))
+
+    @staticmethod
+    def position_break_even_points(legs, lower, upper, num_points=1000):
+        # 多腿组合的所有盈亏平衡股价
+        return PositionProfitCalculator.find_break_even_points(
+            lambda prices: PositionProfitCalculator.position_profit(legs, prices), lower, upper, num_points)
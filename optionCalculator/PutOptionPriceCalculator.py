@@ -6,6 +6,8 @@ if __name__ == "__main__":
     import pandas as pd
     import matplotlib.pyplot as plt
     from OptionPriceCalculator import OptionPriceCalculator
+    from OptionChainLoader import OptionChainLoader
+    from PositionProfitCalculator import PositionProfitCalculator
 
     # 示例用法
     ticker = 'NVDA'
@@ -18,8 +20,8 @@ if __name__ == "__main__":
 
     # 获取期权链
     expiration = '2024-07-05'
-    options = stock.option_chain(expiration)
-    puts = options.puts
+    chains = OptionChainLoader().load([ticker], [expiration])
+    puts = chains[chains['optionType'] == 'put']
 
     # 获取行权价为125的看跌期权市场价格
     strike_price = 118
@@ -39,37 +41,19 @@ if __name__ == "__main__":
     implied_vol = 0.4614
     print(f"Implied Volatility: {implied_vol:.2%}")
 
-    # 模拟股票价格变化
-    stock_prices = np.arange(current_stock_price - 15, current_stock_price + 15, 0.01)
-    put_option_prices = []
-
     print(calc.get_delta(current_stock_price, strike_price, days_to_expiration / 365, risk_free_rate,
                          implied_vol,option_type='put'))
-    for stock_price in stock_prices:
-        # delta = calc.get_delta(stock_price, strike_price, days_to_expiration / 365, risk_free_rate, implied_vol,
-        #                        option_type='put')
-        # put_option_price = put_option_market_price + delta * (stock_price - current_stock_price)
-        # put_option_prices.append(put_option_price)
-        _, integrated_prices = calc.integrate_delta(current_stock_price, stock_price, strike_price, days_to_expiration / 365,
-                                               risk_free_rate, implied_vol, option_type='put')
-
-        # _, integrated_prices = calc.integrate_delta_stress(current_stock_price, stock_price, strike_price,
-        #                                             days_to_expiration / 365, risk_free_rate, implied_vol,
-        #                                                    option_type='put', stress_val=0.17)
-        put_option_prices.append(integrated_prices[-1])
-
 
     # 计算总收益
     num_shares = 20
     num_options = 1  # 一个期权合约代表100股
 
-    total_profits = []
-
-    for stock_price, option_price in zip(stock_prices, put_option_prices):
-        stock_profit = (stock_price - current_stock_price) * num_shares
-        option_profit = (option_price*1.05 - put_option_market_price) * num_options * 100
-        total_profit = stock_profit + option_profit
-        total_profits.append(total_profit)
+    # 在一个共享网格上一次算出股票+看跌期权的总收益曲线和盈亏平衡点
+    # 压力测试时传入 stress_val=0.17（对应原来的integrate_delta_stress）
+    stock_prices, total_profits, break_even_points = PositionProfitCalculator.hedged_profit_curve(
+        current_stock_price, put_option_market_price, strike_price, days_to_expiration / 365, risk_free_rate,
+        implied_vol, option_type='put', price_range=15, step=0.01, num_shares=num_shares,
+        num_contracts=num_options, contract_multiplier=100, markup=1.05)
 
     # --------------------------------------------------------------------------------------------------------------
     # # 绘制总收益随股票价格变化的图
@@ -83,22 +67,9 @@ if __name__ == "__main__":
 
     # --------------------------------------------------------------------------------------------------------------
 
-    # 查找总收益为0的点
-    zero_crossing_points = []
-    for i in range(1, len(total_profits)):
-        if total_profits[i - 1] >= 0 and total_profits[i] <= 0:
-            zero_crossing_points.append((stock_prices[i-1], total_profits[i-1]))
-        elif total_profits[i - 1] <= 0 and total_profits[i] >= 0:
-            zero_crossing_points.append((stock_prices[i], total_profits[i]))
-        if len(zero_crossing_points) >= 2:
-            break
-
-    zero_crossing_points = sorted(zero_crossing_points, key=lambda x: x[0])
-
     # 打印收益为正的区间
-    if len(zero_crossing_points) == 2:
-        lower_bound = zero_crossing_points[0][0]
-        upper_bound = zero_crossing_points[1][0]
+    if len(break_even_points) == 2:
+        lower_bound, upper_bound = break_even_points
         print(f"When the stock price is less than {lower_bound:.2f}, the total profit is positive.")
         print(f"When the stock price is greater than {upper_bound:.2f}, the total profit is positive.")
     else:
@@ -115,7 +86,8 @@ if __name__ == "__main__":
     plt.grid(True)
 
     # 标注总收益从负数变为正数的点
-    for i, point in enumerate(zero_crossing_points):
+    for i, break_even_point in enumerate(break_even_points):
+        point = (break_even_point, 0)
         xytext = (-60, -10) if i == 0 else (10, -10)  # 确保第一个点在左边，第二个点在右边
         plt.plot(point[0], point[1], 'ro')  # 红色圆点标记
         plt.annotate(f'{point[0]:.2f}', xy=point, textcoords='offset points', xytext=xytext,
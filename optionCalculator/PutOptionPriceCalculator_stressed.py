@@ -5,6 +5,8 @@ if __name__ == "__main__":
     import pandas as pd
     import matplotlib.pyplot as plt
     from OptionPriceCalculator import OptionPriceCalculator
+    from OptionChainLoader import OptionChainLoader
+    from PositionProfitCalculator import PositionProfitCalculator
     import random
 
     # 示例用法
@@ -18,8 +20,8 @@ if __name__ == "__main__":
 
     # 获取期权链
     expiration = '2024-06-28'
-    options = stock.option_chain(expiration)
-    puts = options.puts
+    chains = OptionChainLoader().load([ticker], [expiration])
+    puts = chains[chains['optionType'] == 'put']
 
     # 获取行权价为125的看跌期权市场价格
     strike_price = 117
@@ -40,50 +42,37 @@ if __name__ == "__main__":
 
     # 模拟股票价格变化
     stock_prices = np.arange(current_stock_price - 15, current_stock_price + 15, 0.01)
-    put_option_prices = []
-
-    for stock_price in stock_prices:
-        delta = calc.get_delta(stock_price, strike_price, days_to_expiration / 365, risk_free_rate, implied_vol,
-                               option_type='put')
-        #adjusted_delta = delta - random.uniform(0.1, 0.18)
-        adjusted_delta = delta - 0.17
-        #adjusted_delta = -0.1116
-        put_option_price = put_option_market_price + adjusted_delta * (stock_price - current_stock_price)
-        put_option_prices.append(put_option_price)
-        #print(stock_price)
-        if abs(stock_price - int(stock_price)) < 0.015:
-            print(f"Stock Price: {stock_price}, Strike Price: {strike_price}, Original Delta: {delta:.4f}, Adjusted Delta: {adjusted_delta:.4f}")
-
-
 
     # 计算总收益
     num_shares = 20
     num_options = 1  # 一个期权合约代表100股
 
-    total_profits = []
+    def stressed_put_option_prices(prices):
+        deltas = calc.get_delta(prices, strike_price, days_to_expiration / 365, risk_free_rate, implied_vol,
+                                option_type='put')
+        #adjusted_deltas = deltas - random.uniform(0.1, 0.18)
+        adjusted_deltas = deltas - 0.17
+        return put_option_market_price + adjusted_deltas * (prices - current_stock_price)
+
+    def total_profit_function(prices):
+        stock_profit = (prices - current_stock_price) * num_shares
+        option_profit = (stressed_put_option_prices(prices) - put_option_market_price) * num_options * 100
+        return stock_profit + option_profit
 
-    for stock_price, option_price in zip(stock_prices, put_option_prices):
-        stock_profit = (stock_price - current_stock_price) * num_shares
-        option_profit = (option_price - put_option_market_price) * num_options * 100
-        total_profit = stock_profit + option_profit
-        total_profits.append(total_profit)
+    for stock_price in np.arange(np.ceil(stock_prices[0]), stock_prices[-1]):
+        delta = calc.get_delta(stock_price, strike_price, days_to_expiration / 365, risk_free_rate, implied_vol,
+                               option_type='put')
+        print(f"Stock Price: {stock_price}, Strike Price: {strike_price}, Original Delta: {delta:.4f}, Adjusted Delta: {delta - 0.17:.4f}")
 
-    # 查找总收益为0的点
-    zero_crossing_points = []
-    for i in range(1, len(total_profits)):
-        if total_profits[i - 1] >= 0 and total_profits[i] <= 0:
-            zero_crossing_points.append((stock_prices[i-1], total_profits[i-1]))
-        elif total_profits[i - 1] <= 0 and total_profits[i] >= 0:
-            zero_crossing_points.append((stock_prices[i], total_profits[i]))
-        if len(zero_crossing_points) >= 2:
-            break
+    total_profits = total_profit_function(stock_prices)
 
-    zero_crossing_points = sorted(zero_crossing_points, key=lambda x: x[0])
+    # 查找总收益为0的点（粗网格找变号区间，再用根求解精确定位）
+    break_even_points = PositionProfitCalculator.find_break_even_points(total_profit_function, stock_prices[0],
+                                                                        stock_prices[-1])
 
     # 打印收益为正的区间
-    if len(zero_crossing_points) == 2:
-        lower_bound = zero_crossing_points[0][0]
-        upper_bound = zero_crossing_points[1][0]
+    if len(break_even_points) == 2:
+        lower_bound, upper_bound = break_even_points
         print(f"When the stock price is less than {lower_bound:.2f}, the total profit is positive.")
         print(f"When the stock price is greater than {upper_bound:.2f}, the total profit is positive.")
     else:
@@ -100,7 +89,8 @@ if __name__ == "__main__":
     plt.grid(True)
 
     # 标注总收益从负数变为正数的点
-    for i, point in enumerate(zero_crossing_points):
+    for i, break_even_point in enumerate(break_even_points):
+        point = (break_even_point, 0)
         xytext = (-60, -10) if i == 0 else (10, -10)  # 确保第一个点在左边，第二个点在右边
         plt.plot(point[0], point[1], 'ro')  # 红色圆点标记
         plt.annotate(f'{point[0]:.2f}', xy=point, textcoords='offset points', xytext=xytext,
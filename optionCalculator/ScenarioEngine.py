@@ -0,0 +1,173 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.special import erf
+
+
+class ScenarioEngine:
+
+    def __init__(self, legs, S0, max_chunk_elements=32_000, max_workers=None):
+        """
+        对股票+期权组合做情景分析：在 股价 × 波动率 × 利率 × 时间流逝 的冲击立方体上一次性重新定价所有腿。
+
+        参数:
+        legs (list[dict]): 组合，格式见PositionProfitCalculator.position_value，所有腿的标的相同。
+        S0 (float): 当前标的股价。
+        max_chunk_elements (int): 每批计算的 (波动率 × 利率 × 时间 × 合约数) 上限，批内的缓冲区应能放进CPU缓存。
+        max_workers (int): 并行计算各批合约的线程数，默认为CPU核数（NumPy/SciPy的数组运算会释放GIL）。
+        """
+        self.S0 = float(S0)
+        self.max_chunk_elements = max_chunk_elements
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.stock_quantity = sum(leg['quantity'] for leg in legs if leg['type'] == 'stock')
+        self.cost = sum(leg['quantity'] * leg['entry_price']
+                        * (1 if leg['type'] == 'stock' else leg.get('multiplier', 100)) for leg in legs)
+
+        # 参数完全相同的期权腿合并成一个合约，数量相加
+        options = [leg for leg in legs if leg['type'] != 'stock']
+        if options:
+            contracts = np.array([[leg['strike'], leg['T'], leg['r'], leg['sigma'], leg['type'] == 'call']
+                                  for leg in options], dtype=float)
+            weights = np.array([leg['quantity'] * leg.get('multiplier', 100) * leg.get('markup', 1.0)
+                                for leg in options])
+            contracts, inverse = np.unique(contracts, axis=0, return_inverse=True)
+            self.weights = np.bincount(inverse.ravel(), weights=weights)
+        else:
+            contracts = np.empty((0, 5))
+            self.weights = np.empty(0)
+        self.K, self.T, self.r, self.sigma = contracts[:, :4].T
+        self.sign = np.where(contracts[:, 4] > 0, 1.0, -1.0)
+
+    def _option_value(self, S, vol_shocks, rate_shocks, time_shocks, start, stop):
+        # 一批合约在全部情景下的加权市值之和，形状 (股价, 波动率, 利率, 时间)
+        K, sign, quantities = self.K[start:stop], self.sign[start:stop], self.weights[start:stop]
+        weights = quantities * sign
+        sigma = np.maximum(self.sigma[start:stop] + vol_shocks[:, None, None, None], 1e-4)
+        r = self.r[start:stop] + rate_shocks[None, :, None, None]
+        T = self.T[start:stop] - time_shocks[None, None, :, None]
+
+        # 已到期的合约按内在价值计算，只与股价和时间有关
+        expired = T <= 0
+        intrinsic = np.maximum(sign * (S[:, None] - K), 0) @ (quantities * expired[0, 0]).T
+
+        # 与股价无关的部分只在 (波动率, 利率, 时间, 合约) 上计算一次：sign*d1/√2 = ln(S) * a + b
+        # N(x) = (1 + erf(x/√2)) / 2，1/√2并入a、b，1/2并入权重；erf在|x|<√2时不走较慢的erfc分支，比ndtr快约20%
+        T = np.maximum(T, 1e-12)
+        volatility = sigma * np.sqrt(T)
+        a = np.broadcast_to(sign / (volatility * np.sqrt(2)), np.broadcast_shapes(volatility.shape, r.shape))
+        b = sign * (np.log(1 / K) + (r + 0.5 * sigma ** 2) * T) / (volatility * np.sqrt(2))
+        shift = np.broadcast_to(sign * volatility / np.sqrt(2), b.shape)
+        live = weights * ~expired
+        stock_weights = np.broadcast_to(0.5 * live, b.shape)
+        strike_weights = np.broadcast_to(0.5 * live * K * np.exp(-r * T), b.shape)
+        stock_total = stock_weights.sum(axis=-1)
+        strike_total = strike_weights.sum(axis=-1)
+
+        # 逐个股价计算，(波动率, 利率, 时间, 合约) 大小的缓冲区反复使用并留在CPU缓存中，不生成五维大数组
+        erf_d1 = np.empty(b.shape)
+        erf_d2 = np.empty(b.shape)
+        value = np.empty((len(S),) + b.shape[:-1])
+        for i, log_spot in enumerate(np.log(S)):
+            np.multiply(a, log_spot, out=erf_d1)
+            erf_d1 += b
+            np.subtract(erf_d1, shift, out=erf_d2)
+            erf(erf_d1, out=erf_d1)
+            erf(erf_d2, out=erf_d2)
+            np.einsum('vrtc,vrtc->vrt', erf_d1, stock_weights, out=value[i])
+            value[i] += stock_total
+            value[i] *= S[i]
+            value[i] -= strike_total
+            value[i] -= np.einsum('vrtc,vrtc->vrt', erf_d2, strike_weights)
+        return value + intrinsic[:, None, None, :]
+
+    def revalue(self, spot_shocks, vol_shocks=(0.0,), rate_shocks=(0.0,), days_elapsed=(0,), relative_spot=True):
+        """
+        参数:
+        spot_shocks (array-like): 股价冲击；relative_spot为True时为相对变化（-0.1表示下跌10%），否则为股价本身。
+        vol_shocks (array-like): 波动率的绝对变化，例如 0.05 表示每条腿的隐含波动率加5个百分点。
+        rate_shocks (array-like): 无风险利率的绝对变化。
+        days_elapsed (array-like): 经过的天数，期权剩余期限相应缩短，到期后按内在价值计算。
+
+        返回:
+        dict: 'spot'（情景股价）、'vol_shock'、'rate_shock'、'days_elapsed' 四个坐标轴，以及形状为
+              (股价, 波动率, 利率, 时间) 的张量 'value'（组合市值）、'pnl'（相对建仓成本的收益，
+              与PositionProfitCalculator.position_profit一致）、'change'（相对当前未冲击市值的变化）。
+        """
+        spot_shocks = np.atleast_1d(np.asarray(spot_shocks, dtype=float))
+        vol_shocks = np.atleast_1d(np.asarray(vol_shocks, dtype=float))
+        rate_shocks = np.atleast_1d(np.asarray(rate_shocks, dtype=float))
+        days_elapsed = np.atleast_1d(np.asarray(days_elapsed, dtype=float))
+        S = self.S0 * (1 + spot_shocks) if relative_spot else spot_shocks
+        shape = (len(S), len(vol_shocks), len(rate_shocks), len(days_elapsed))
+
+        value = np.broadcast_to(self.stock_quantity * S[:, None, None, None], shape).copy()
+        num_contracts = len(self.K)
+        chunk = max(1, min(self.max_chunk_elements // int(np.prod(shape[1:])),
+                           -(-num_contracts // self.max_workers)))
+        starts = range(0, num_contracts, chunk)
+        revalue_chunk = lambda start: self._option_value(S, vol_shocks, rate_shocks, days_elapsed / 365, start,
+                                                         start + chunk)
+        if self.max_workers == 1 or len(starts) <= 1:
+            chunks = map(revalue_chunk, starts)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                chunks = list(executor.map(revalue_chunk, starts))
+        for chunk_value in chunks:
+            value += chunk_value
+
+        return {
+            'spot': S,
+            'vol_shock': vol_shocks,
+            'rate_shock': rate_shocks,
+            'days_elapsed': days_elapsed,
+            'value': value,
+            'pnl': value - self.cost,
+            'change': value - self.current_value(),
+        }
+
+    def current_value(self):
+        # 未冲击情景下的组合市值
+        base = self.stock_quantity * self.S0
+        if len(self.K):
+            base += self._option_value(np.array([self.S0]), np.zeros(1), np.zeros(1), np.zeros(1), 0,
+                                       len(self.K)).item()
+        return base
+
+
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+    from OptionPriceCalculator import OptionPriceCalculator
+    from PositionProfitCalculator import PositionProfitCalculator
+
+    # 与PutOptionPriceCalculator_stressed.py相同的20股+1张看跌期权
+    S0, K, T, r, sigma = 123.0, 118, 30 / 365, 0.05, 0.4614
+    put_price = OptionPriceCalculator.black_scholes(S0, K, T, r, sigma, 'put')
+    legs = [{'type': 'stock', 'quantity': 20, 'entry_price': S0},
+            {'type': 'put', 'quantity': 1, 'strike': K, 'T': T, 'r': r, 'sigma': sigma, 'entry_price': put_price}]
+    engine = ScenarioEngine(legs, S0)
+    scenarios = engine.revalue(np.linspace(-0.2, 0.2, 201), days_elapsed=[0])
+    expected = PositionProfitCalculator.position_profit(legs, scenarios['spot'])
+    print(f"Max difference vs position_profit: {np.abs(scenarios['pnl'][:, 0, 0, 0] - expected).max():.2e}")
+
+    # 300条随机期权腿，200 × 50 × 10 的情景立方体
+    rng = np.random.default_rng(0)
+    book = [{'type': rng.choice(['put', 'call']), 'quantity': int(rng.integers(-10, 11)),
+             'strike': float(rng.choice(np.arange(90, 160, 2.5))), 'T': float(rng.uniform(7, 365)) / 365, 'r': r,
+             'sigma': float(rng.uniform(0.2, 0.6)), 'entry_price': 5.0} for _ in range(300)]
+    book.append({'type': 'stock', 'quantity': 500, 'entry_price': S0})
+    engine = ScenarioEngine(book, S0)
+    start = time.perf_counter()
+    cube = engine.revalue(np.linspace(-0.3, 0.3, 200), np.linspace(-0.15, 0.15, 50), np.linspace(-0.01, 0.01, 10))
+    print(f"Revalued {len(book)} legs under {cube['pnl'].size:,} scenarios in {time.perf_counter() - start:.3f}s")
+
+    # 股价 × 波动率 的收益热力图（利率不变、当天）
+    plt.figure(figsize=(10, 6))
+    plt.imshow(cube['change'][:, :, 5, 0].T, origin='lower', aspect='auto', cmap='RdYlGn',
+               extent=[cube['spot'][0], cube['spot'][-1], cube['vol_shock'][0], cube['vol_shock'][-1]])
+    plt.colorbar(label='P&L Change')
+    plt.xlabel('Stock Price')
+    plt.ylabel('Volatility Shock')
+    plt.title('Portfolio P&L Change by Spot and Volatility Shock')
+    plt.show()
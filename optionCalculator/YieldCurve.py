@@ -0,0 +1,101 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pandas_datareader.data as web
+
+
+class YieldCurve:
+    # FRED国债收益率序列及其期限（年）
+    FRED_SERIES = {'TB3MS': 0.25, 'TB6MS': 0.5, 'GS1': 1.0, 'GS5': 5.0, 'GS10': 10.0}
+    DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'investPortfolio', 'treasury_yields.csv')
+    # 随仓库提供的2024年5月FRED月度收益率，保证无网络、无缓存时也能定价
+    DEFAULT_FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'treasury_yields_fixture.csv')
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, ttl=24 * 3600, fixture_path=DEFAULT_FIXTURE_PATH,
+                 offline=False):
+        """
+        参数:
+        cache_path (str): 本地缓存文件路径，格式为 series,tenor,yield 三列的CSV（yield为百分比）。
+        ttl (float): 缓存有效期（秒），过期后才会重新请求FRED。
+        fixture_path (str): 同格式的本地文件，在无网络且无缓存时使用，默认为仓库自带的treasury_yields_fixture.csv。
+        offline (bool): 为True时从不访问网络，只使用缓存（即使已过期）或fixture文件。
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.fixture_path = fixture_path
+        self.offline = offline
+        self.tenors = None
+        self.yields = None
+
+    def load(self):
+        # 只加载一次，之后的查询都走内存
+        if self.tenors is not None:
+            return self
+
+        if self._cache_is_fresh():
+            return self._load_file(self.cache_path)
+
+        if not self.offline:
+            try:
+                rates = self._fetch_from_fred()
+            except Exception as e:
+                print(f"Failed to fetch treasury yields from FRED ({e}), falling back to local data.")
+            else:
+                self._save_cache(rates)
+                return self._set_rates(rates)
+
+        for path in (self.cache_path, self.fixture_path):
+            if path and os.path.exists(path):
+                return self._load_file(path)
+        raise RuntimeError("No treasury yield data available: FRED is unreachable and no cache or fixture file exists.")
+
+    def rates(self, maturities):
+        """
+        按期限线性插值得到连续复利无风险利率，超出已知期限范围时取端点值。
+
+        参数:
+        maturities (float 或 np.ndarray): 期限（年）。
+
+        返回:
+        np.ndarray: 与maturities同形状的连续复利年化利率。
+        """
+        self.load()
+        # FRED给出的是年化收益率（百分比），转换为连续复利
+        continuous_rates = np.log1p(self.yields / 100)
+        return np.interp(np.asarray(maturities, dtype=float), self.tenors, continuous_rates)
+
+    def rate(self, maturity):
+        return float(self.rates(maturity))
+
+    def _cache_is_fresh(self):
+        return os.path.exists(self.cache_path) and time.time() - os.path.getmtime(self.cache_path) < self.ttl
+
+    def _fetch_from_fred(self):
+        # 一次请求取回所有期限，取每个序列最新的有效值
+        data = web.DataReader(list(self.FRED_SERIES), 'fred')
+        latest = data.ffill().iloc[-1]
+        return pd.DataFrame({'series': list(self.FRED_SERIES),
+                             'tenor': list(self.FRED_SERIES.values()),
+                             'yield': [latest[series] for series in self.FRED_SERIES]})
+
+    def _save_cache(self, rates):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        rates.to_csv(self.cache_path, index=False)
+
+    def _load_file(self, path):
+        return self._set_rates(pd.read_csv(path))
+
+    def _set_rates(self, rates):
+        rates = rates.dropna(subset=['yield']).sort_values('tenor')
+        self.tenors = rates['tenor'].to_numpy(dtype=float)
+        self.yields = rates['yield'].to_numpy(dtype=float)
+        return self
+
+
+if __name__ == "__main__":
+    curve = YieldCurve().load()
+    maturities = np.array([1 / 365, 30 / 365, 0.25, 0.75, 2, 7, 30])
+    for maturity, rate in zip(maturities, curve.rates(maturities)):
+        print(f"Maturity: {maturity:.4f} years, Risk-Free Rate: {rate:.4%}")
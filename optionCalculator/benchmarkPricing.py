@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+
+from LatticePricer import LatticePricer
+from OptionPriceCalculator import OptionPriceCalculator
+
+
+def random_chain(num_contracts, seed=0):
+    # 随机生成一条期权链，参数范围与NVDA/AAPL的实际数据相近
+    rng = np.random.default_rng(seed)
+    S = rng.uniform(100, 230, num_contracts)
+    K = S * rng.uniform(0.8, 1.2, num_contracts)
+    T = rng.uniform(1 / 365, 1, num_contracts)
+    r = rng.uniform(0.04, 0.055, num_contracts)
+    sigma = rng.uniform(0.1, 0.8, num_contracts)
+    option_type = np.where(rng.random(num_contracts) < 0.5, 'call', 'put')
+    return S, K, T, r, sigma, option_type
+
+
+def benchmark_black_scholes(num_contracts=1_000_000, num_scalar=20_000):
+    S, K, T, r, sigma, option_type = random_chain(num_contracts)
+
+    start = time.perf_counter()
+    batch_prices = OptionPriceCalculator.black_scholes_batch(S, K, T, r, sigma, option_type)
+    batch_seconds = time.perf_counter() - start
+
+    # 逐个合约调用的旧路径太慢，只跑前num_scalar个合约再换算吞吐量
+    start = time.perf_counter()
+    scalar_prices = [OptionPriceCalculator.black_scholes(S[i], K[i], T[i], r[i], sigma[i], option_type[i])
+                     for i in range(num_scalar)]
+    scalar_seconds = time.perf_counter() - start
+
+    max_error = np.max(np.abs(batch_prices[:num_scalar] - np.array(scalar_prices)))
+    batch_rate = num_contracts / batch_seconds
+    scalar_rate = num_scalar / scalar_seconds
+    print(f"black_scholes        : {scalar_rate:>14,.0f} contracts/s ({num_scalar:,} contracts)")
+    print(f"black_scholes_batch  : {batch_rate:>14,.0f} contracts/s ({num_contracts:,} contracts)")
+    print(f"Speedup: {batch_rate / scalar_rate:.0f}x, max abs difference: {max_error:.2e}")
+
+
+def benchmark_implied_volatility(num_contracts=1_000_000, num_scalar=2_000):
+    S, K, T, r, sigma, option_type = random_chain(num_contracts)
+    prices = OptionPriceCalculator.black_scholes_batch(S, K, T, r, sigma, option_type)
+
+    start = time.perf_counter()
+    batch_ivs, status = OptionPriceCalculator.implied_volatility_batch(prices, S, K, T, r, option_type)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(num_scalar):
+        try:
+            OptionPriceCalculator.implied_volatility(prices[i], S[i], K[i], T[i], r[i], option_type[i])
+        except ValueError:
+            pass
+    scalar_seconds = time.perf_counter() - start
+
+    converged = status == OptionPriceCalculator.IV_CONVERGED
+    batch_rate = num_contracts / batch_seconds
+    scalar_rate = num_scalar / scalar_seconds
+    print(f"implied_volatility       : {scalar_rate:>14,.0f} contracts/s ({num_scalar:,} contracts)")
+    print(f"implied_volatility_batch : {batch_rate:>14,.0f} contracts/s ({num_contracts:,} contracts)")
+    print(f"Speedup: {batch_rate / scalar_rate:.0f}x, converged: {converged.mean():.2%}, "
+          f"median abs IV error: {np.median(np.abs(batch_ivs[converged] - sigma[converged])):.2e}")
+
+    # 高于sigma_max（默认5.0）对应价格的报价无解，不能因区间收缩到端点而报告为收敛
+    out_of_range_ivs, out_of_range_status = OptionPriceCalculator.implied_volatility_batch(
+        [50, 60, 100], 123, 118, 0.05, 0.05, 'put')
+    assert np.all(out_of_range_status == OptionPriceCalculator.IV_NOT_CONVERGED), out_of_range_status
+    assert np.all(np.isnan(out_of_range_ivs)), out_of_range_ivs
+
+
+def benchmark_greeks(num_contracts=1_000_000):
+    S, K, T, r, sigma, option_type = random_chain(num_contracts)
+
+    # 旧路径：每个Greek各自重新计算d1
+    start = time.perf_counter()
+    for contract_type in ('call', 'put'):
+        rows = option_type == contract_type
+        OptionPriceCalculator.black_scholes(S[rows], K[rows], T[rows], r[rows], sigma[rows], contract_type)
+        OptionPriceCalculator.get_delta(S[rows], K[rows], T[rows], r[rows], sigma[rows], contract_type)
+        OptionPriceCalculator.get_gamma(S[rows], K[rows], T[rows], r[rows], sigma[rows])
+    separate_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    OptionPriceCalculator.greeks(S, K, T, r, sigma, option_type)
+    fused_seconds = time.perf_counter() - start
+
+    print(f"black_scholes + get_delta + get_gamma : {separate_seconds:.3f}s ({num_contracts:,} contracts)")
+    print(f"greeks (price + 7 Greeks)            : {fused_seconds:.3f}s ({num_contracts:,} contracts)")
+
+
+def benchmark_lattice(num_strikes=300, step_counts=(50, 100, 200, 500, 1000, 2000)):
+    # 美式看跌期权：树的步数 vs 精度 vs 耗时，300个行权价约为一条完整期权链的规模；
+    # 参考值为5000/5001步CRR的平均（抵消奇偶振荡）
+    S, T, r, sigma = 100.0, 0.5, 0.05, 0.3
+    K = np.linspace(80, 120, num_strikes)
+    reference = 0.5 * (LatticePricer.american_price(S, K, T, r, sigma, 'put', steps=5000)
+                       + LatticePricer.american_price(S, K, T, r, sigma, 'put', steps=5001))
+
+    for method in ('crr', 'trinomial'):
+        for steps in step_counts:
+            start = time.perf_counter()
+            prices = LatticePricer.american_price(S, K, T, r, sigma, 'put', steps=steps, method=method)
+            seconds = time.perf_counter() - start
+            print(f"{method:>9} {steps:>5} steps: max abs error {np.max(np.abs(prices - reference)):.2e}, "
+                  f"{seconds * 1000:8.1f} ms for {num_strikes} strikes")
+
+
+if __name__ == "__main__":
+    benchmark_black_scholes()
+    benchmark_implied_volatility()
+    benchmark_greeks()
+    benchmark_lattice()
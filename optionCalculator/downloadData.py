@@ -1,6 +1,8 @@
 import yfinance as yf
 import pandas as pd
 
+from MarketDataStore import MarketDataStore
+
 class DownloadFromYfinance:
 
     @staticmethod
@@ -46,9 +48,29 @@ class DownloadFromYfinance:
         else:
             print("No data found for the specified range and type.")
 
+    @staticmethod
+    def download_stock_data_save_to_store(ticker, start_date, end_date, store=None):
+        # 下载股票数据并追加到本地列式存储（按交易日分区、自动去重）
+        store = MarketDataStore() if store is None else store
+        stock_data = DownloadFromYfinance.download_stock_data(ticker, start_date, end_date)
+        if isinstance(stock_data.columns, pd.MultiIndex):
+            stock_data.columns = stock_data.columns.get_level_values(0)
+        num_partitions = store.append_stock_bars(ticker, stock_data)
+        print(f'Saved {len(stock_data)} rows of {ticker} stock data to {num_partitions} partitions in {store.root}')
+
+    @staticmethod
+    def download_option_data_save_to_store(ticker, maturity_date, store=None):
+        # 下载某个到期日的完整期权链（calls和puts）并追加到本地列式存储，行权价范围在读取时过滤
+        store = MarketDataStore() if store is None else store
+        opts = yf.Ticker(ticker).option_chain(maturity_date)
+        num_rows = store.append_options(ticker, maturity_date, pd.concat([opts.calls, opts.puts], ignore_index=True))
+        print(f'Stored {num_rows} {ticker} option contracts for {maturity_date} in {store.root}')
+
 if __name__ == "__main__":
     #DownloadFromYfinance.download_stock_data_save_to_local('AAPL', '2024-06-18', '2024-06-21')
     #DownloadFromYfinance.download_option_data_save_to_local('AAPL', 'put', 200, 225, '2024-06-21')
+    #DownloadFromYfinance.download_option_data_save_to_store('AAPL', '2024-06-21')
+    #puts = MarketDataStore().load_options('AAPL', ['2024-06-21'], option_type='put', min_strike=200, max_strike=225)
 
     import pandas as pd
     import matplotlib.pyplot as plt
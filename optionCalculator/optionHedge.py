@@ -1,24 +1,163 @@
-class OptionStockStrategy:
+import numpy as np
+import pandas as pd
+
+from OptionPriceCalculator import OptionPriceCalculator
+from PositionProfitCalculator import PositionProfitCalculator
+
 
+class OptionStockStrategy:
 
     def f(self, stock_start_price, stock_end_price, stock_amount, option_start_price, option_end_price, option_amount):
-        pass
+        # 股票+期权组合的总收益，期权价格按每张合约计；所有参数均可为数组（按NumPy规则广播）
+        stock_profit = (np.asarray(stock_end_price) - stock_start_price) * stock_amount
+        option_profit = (np.asarray(option_end_price) - option_start_price) * option_amount
+        return stock_profit + option_profit
+
+    def required_option_amount(self, stock_start_price, stock_end_price, stock_amount, option_start_price,
+                               option_end_price):
+        # 让 f(...) = 0 所需的期权合约数，即期权收益刚好抵消股票亏损
+        stock_profit = (np.asarray(stock_end_price) - stock_start_price) * stock_amount
+        return -stock_profit / (np.asarray(option_end_price) - option_start_price)
+
+    @staticmethod
+    def scenario_grid(S0, T, r, sigma, num_scenarios=201, num_std=4.0):
+        """
+        对数正态分布下期末股价的离散情景。
+
+        返回:
+        tuple: (股价情景, 概率权重)，股价覆盖均值上下num_std个标准差。
+        """
+        volatility = sigma * np.sqrt(T)
+        z = np.linspace(-num_std, num_std, num_scenarios)
+        spots = S0 * np.exp((r - 0.5 * sigma ** 2) * T + volatility * z)
+        weights = np.exp(-0.5 * z ** 2)
+        return spots, weights / weights.sum()
+
+    def optimize_hedge(self, S0, stock_amount, strikes, premiums, T, r, sigma, horizon=None, option_type='put',
+                       max_contracts=None, spreads=True, target_floor=None, target_std=None, num_scenarios=201,
+                       multiplier=100):
+        """
+        在一条期权链上搜索对冲股票持仓的期权组合，找出满足目标的最低成本方案和有效前沿。
+
+        候选方案包括单一行权价 × 合约数，以及（spreads=True时）买入较高行权价、卖出较低行权价的价差组合 × 合约数。
+        所有候选在同一组期末股价情景下一次向量化计算收益。
+
+        参数:
+        S0 (float): 当前股价。
+        stock_amount (float): 持有的股数。
+        strikes, premiums (np.ndarray): 期权链的行权价和每股期权价格。
+        T (float): 期权剩余期限（年）。
+        r (float): 无风险利率。
+        sigma (float 或 np.ndarray): 每个行权价的隐含波动率，用于情景下重新定价和生成股价情景（取平均值）。
+        horizon (float): 评估时点（年），默认为期权到期日；早于到期日时期权按Black-Scholes估值。
+        option_type (str): 'put' 或 'call'（卖出股票时可用call对冲）。
+        max_contracts (int): 每个方案的最大合约数，默认为覆盖全部股数所需合约数的两倍。
+        spreads (bool): 是否包含价差组合。
+        target_floor (float): 最低可接受收益（所有情景中最差的组合收益），例如 -500。
+        target_std (float): 最大可接受收益标准差。
+        num_scenarios (int): 股价情景数。
+        multiplier (int): 每张合约对应的股数。
+
+        返回:
+        dict: 'best' 满足目标的最低成本方案（pd.Series，无满足目标的方案时为None），
+              'candidates' 所有候选方案（pd.DataFrame，列为 long_strike、short_strike、contracts、cost、
+              floor、expected、std），'frontier' 成本-最差收益的有效前沿（成本递增、最差收益严格递增）。
+        """
+        strikes = np.asarray(strikes, dtype=float)
+        order = np.argsort(strikes)
+        strikes = strikes[order]
+        premiums = np.asarray(premiums, dtype=float)[order]
+        sigma = np.broadcast_to(np.asarray(sigma, dtype=float), order.shape)[order]
+        horizon = T if horizon is None else horizon
+        if max_contracts is None:
+            max_contracts = 2 * int(np.ceil(stock_amount / multiplier))
+
+        spots, probabilities = self.scenario_grid(S0, horizon, r, float(np.mean(sigma)), num_scenarios)
+        stock_profit = (spots - S0) * stock_amount
 
+        # 每个行权价一张合约在每个情景下的收益，形状 (行权价, 情景)
+        if horizon >= T:
+            values = PositionProfitCalculator.option_value(spots, strikes[:, None], 0, r, sigma[:, None], option_type)
+        else:
+            values = OptionPriceCalculator.black_scholes_batch(spots, strikes[:, None], T - horizon, r,
+                                                               sigma[:, None], option_type)
+        unit_profit = (values - premiums[:, None]) * multiplier
+
+        # 结构：单一行权价，以及 买入long、卖出short 的价差
+        long_index, short_index = np.arange(len(strikes)), np.full(len(strikes), -1)
+        if spreads:
+            i, j = np.triu_indices(len(strikes), k=1)
+            # 看跌价差买高卖低，看涨价差买低卖高
+            long_leg, short_leg = (j, i) if option_type == 'put' else (i, j)
+            long_index = np.concatenate([long_index, long_leg])
+            short_index = np.concatenate([short_index, short_leg])
+        structure_profit = unit_profit[long_index] - np.where(short_index[:, None] >= 0, unit_profit[short_index], 0)
+        structure_cost = (premiums[long_index] - np.where(short_index >= 0, premiums[short_index], 0)) * multiplier
+
+        # 期望和方差可由各结构的一阶、二阶矩解析得到，只有最差收益需要遍历情景
+        contracts = np.arange(1, max_contracts + 1, dtype=float)
+        stock_mean = probabilities @ stock_profit
+        structure_mean = structure_profit @ probabilities
+        stock_centered = stock_profit - stock_mean
+        structure_centered = structure_profit - structure_mean[:, None]
+        covariance = structure_centered @ (probabilities * stock_centered)
+        structure_variance = (structure_centered ** 2) @ probabilities
+        stock_variance = probabilities @ stock_centered ** 2
+
+        expected = stock_mean + contracts * structure_mean[:, None]
+        variance = stock_variance + 2 * contracts * covariance[:, None] + contracts ** 2 * structure_variance[:, None]
+        floor = np.empty((len(structure_profit), len(contracts)))
+        for n, count in enumerate(contracts):
+            floor[:, n] = (stock_profit + count * structure_profit).min(axis=1)
+
+        candidates = pd.DataFrame({
+            'long_strike': np.repeat(strikes[long_index], len(contracts)),
+            'short_strike': np.repeat(np.where(short_index >= 0, strikes[short_index], np.nan), len(contracts)),
+            'contracts': np.tile(contracts, len(structure_profit)).astype(int),
+            'cost': (structure_cost[:, None] * contracts).ravel(),
+            'floor': floor.ravel(),
+            'expected': expected.ravel(),
+            'std': np.sqrt(np.maximum(variance, 0)).ravel(),
+        })
+        # 不对冲也作为一个候选方案
+        unhedged = pd.DataFrame({'long_strike': [np.nan], 'short_strike': [np.nan], 'contracts': [0], 'cost': [0.0],
+                                 'floor': [stock_profit.min()], 'expected': [stock_mean],
+                                 'std': [np.sqrt(stock_variance)]})
+        candidates = pd.concat([unhedged, candidates], ignore_index=True)
+
+        feasible = np.ones(len(candidates), dtype=bool)
+        if target_floor is not None:
+            feasible &= candidates['floor'].to_numpy() >= target_floor
+        if target_std is not None:
+            feasible &= candidates['std'].to_numpy() <= target_std
+        ranked = candidates[feasible].sort_values(['cost', 'floor'], ascending=[True, False])
+
+        ordered = candidates.sort_values(['cost', 'floor'], ascending=[True, False])
+        best_floor = np.maximum.accumulate(ordered['floor'].to_numpy())
+        improves = np.concatenate([[True], ordered['floor'].to_numpy()[1:] > best_floor[:-1]])
+        return {
+            'best': ranked.iloc[0] if len(ranked) else None,
+            'candidates': candidates.reset_index(drop=True),
+            'frontier': ordered[improves].reset_index(drop=True),
+        }
 
 
 if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+    from OptionChainLoader import OptionChainLoader, LocalFixtureChainSource
+
+    strategy = OptionStockStrategy()
+
     stock_start_price = 214.12
     stock_end_price = 211.62
     stock_amount = 50
-    stock_loss = (stock_end_price-stock_start_price)*stock_amount
-    print(stock_loss)
-
     option_start_price = 110
     option_end_price = 225
-    need_option = -stock_loss/(option_end_price-option_start_price)
-    print(need_option)
-    print(need_option*option_start_price)
-
+    print(f"Stock P&L: {strategy.f(stock_start_price, stock_end_price, stock_amount, 0, 0, 0):.2f}")
+    need_option = strategy.required_option_amount(stock_start_price, stock_end_price, stock_amount,
+                                                  option_start_price, option_end_price)
+    print(f"Contracts needed to offset the loss: {need_option:.4f}, premium: {need_option * option_start_price:.2f}")
 
     ## 模拟盘
     print("假设我在2024 06 18 买入苹果 214每股，我的预期是涨到217每股，最大下跌为210")
@@ -27,4 +166,29 @@ if __name__ == "__main__":
     print("如果下跌，我每股损失4，总共损失"+str(4*80))
     print("也就是说，我的option必须涨到320以上")
 
+    # 用本地保存的AAPL 2024-06-28到期看跌期权链，为2024-06-21收盘时持有的200股寻找对冲方案
+    S0, r, T = 207.49, 0.05, 7 / 365
+    chain = OptionChainLoader(LocalFixtureChainSource('.'), cache_dir=None).load('AAPL', ['2024-06-28'])
+    chain = chain.drop_duplicates('strike').sort_values('strike')
+    premiums = np.where(chain['bid'] > 0, 0.5 * (chain['bid'] + chain['ask']), chain['lastPrice']).astype(float)
+    implied_vols, status = OptionPriceCalculator.implied_volatility_batch(premiums, S0, chain['strike'].to_numpy(),
+                                                                          T, r, option_type='put')
+    implied_vols = np.where(np.isnan(implied_vols), np.nanmedian(implied_vols), implied_vols)
+
+    start = time.perf_counter()
+    result = strategy.optimize_hedge(S0, 200, chain['strike'].to_numpy(), premiums, T, r, implied_vols,
+                                     max_contracts=50, target_floor=-1500)
+    print(f"Evaluated {len(result['candidates']):,} hedges in {time.perf_counter() - start:.3f}s")
+    print("Cheapest hedge with worst-case loss above -1500:")
+    print(result['best'])
+    print(result['frontier'].head(15).to_string(index=False))
 
+    plt.figure(figsize=(10, 6))
+    plt.scatter(result['candidates']['cost'], result['candidates']['floor'], s=2, alpha=0.3, label='Candidates')
+    plt.step(result['frontier']['cost'], result['frontier']['floor'], where='post', color='r', label='Frontier')
+    plt.xlabel('Hedge Cost')
+    plt.ylabel('Worst-Case P&L')
+    plt.title('Hedge Cost vs Worst-Case P&L for 200 AAPL Shares')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from broker import Broker
+from stock import Stock
+from strategy import CatchUpHill
+
+
+class BacktestBroker(Broker):
+    """
+    回测券商：价格来自历史K线，由回测引擎推进时间。
+    市价单按当前K线收盘价加滑点全部成交。
+    """
+
+    def __init__(self, ticker, prices, timestamps, shares, average_cost, commission=0.0, slippage=0.0):
+        self.ticker = ticker
+        self.prices = prices
+        self.timestamps = timestamps
+        self.index = 0
+        self.shares = shares
+        self.average_cost = average_cost
+        self.cash = 0.0
+        self.commission = commission
+        self.slippage = slippage
+        self.fills = []
+
+    def build_holdings(self):
+        if self.shares <= 0:
+            return {}
+        return {self.ticker: {'quantity': self.shares, 'average_buy_price': self.average_cost}}
+
+    def get_latest_price(self, ticker):
+        return [self.prices[self.index]]
+
+    def order_sell_market(self, ticker, quantity):
+        quantity = min(float(quantity), self.shares)
+        if quantity <= 0:
+            return None
+        fill_price = self.prices[self.index] * (1 - self.slippage)
+        self.shares -= quantity
+        self.cash += quantity * fill_price - self.commission
+        self.fills.append({'time': self.timestamps[self.index], 'side': 'sell', 'price': fill_price,
+                           'quantity': quantity,
+                           'pnl': quantity * (fill_price - self.average_cost) - self.commission})
+        return {'id': len(self.fills), 'state': 'filled', 'cumulative_quantity': str(quantity),
+                'average_price': str(fill_price)}
+
+    def equity(self):
+        return self.cash + self.shares * self.prices[self.index]
+
+
+class CatchUpHillBacktest:
+
+    def __init__(self, prices, timestamps, ticker='AAPL', shares=100, ratio=0.9, stop_loss_ratio=0.9,
+                 hard_stop_loss_ratio=0.9, decline_threshold=2, increase_threshold=2, poll_interval=(60, 120),
+                 commission=0.0, slippage=0.0, seed=None):
+        """
+        用模拟时钟和模拟券商回放历史K线，驱动与实盘相同的Stock/CatchUpHill判断逻辑，不sleep、不联网。
+
+        实盘每次轮询后sleep 60~120秒；这里模拟时钟按同样的随机间隔前进，每次轮询看到时钟之前最新的一根K线。
+        两次轮询之间没有新K线时直接跳到下一根K线（价格不变时策略状态不会改变）。
+
+        参数:
+        prices (np.ndarray): 收盘价序列。
+        timestamps (np.ndarray): 对应的时间戳（秒）。
+        shares (float): 回测开始时以第一根K线价格建仓的股数。
+        ratio (float): CatchUpHill的卖出比例。
+        stop_loss_ratio, hard_stop_loss_ratio (float): 传给Stock.target_sell_price_with_input_ratio的止损比例。
+        decline_threshold, increase_threshold (int): 触发准备卖出/取消卖出所需的连续下跌/上涨次数。
+        poll_interval (tuple): 轮询间隔的最小/最大秒数。
+        commission (float): 每笔订单佣金。
+        slippage (float): 市价单相对成交价的滑点比例。
+        seed (int): 轮询间隔随机数种子。
+        """
+        self.prices = np.asarray(prices, dtype=float)
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.ticker = ticker
+        self.shares = shares
+        self.ratio = ratio
+        self.stop_loss_ratio = stop_loss_ratio
+        self.hard_stop_loss_ratio = hard_stop_loss_ratio
+        self.decline_threshold = decline_threshold
+        self.increase_threshold = increase_threshold
+        self.poll_interval = poll_interval
+        self.commission = commission
+        self.slippage = slippage
+        self.seed = seed
+
+    @staticmethod
+    def load_bars(path):
+        # 读取 AAPL_minute_data.csv 格式的文件，返回 (收盘价, 时间戳秒)
+        data = pd.read_csv(path, usecols=['Datetime', 'Close'])
+        datetimes = pd.to_datetime(data['Datetime'], utc=True)
+        timestamps = (datetimes - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+        return data['Close'].to_numpy(dtype=float), timestamps.to_numpy()
+
+    def run(self):
+        """
+        返回:
+        dict: 'fills' 成交记录(pd.DataFrame)、'equity' 每次轮询后的账户权益(pd.Series)、
+              'pnl' 总收益、'max_drawdown' 最大回撤（金额）、'max_drawdown_pct' 最大回撤比例、'num_polls' 轮询次数。
+        """
+        rng = np.random.default_rng(self.seed)
+        broker = BacktestBroker(self.ticker, self.prices, self.timestamps, self.shares, self.prices[0],
+                                self.commission, self.slippage)
+        stock = Stock(self.ticker, broker=broker, clock=lambda: float(broker.timestamps[broker.index]))
+        selling = False
+        equity_times, equity = [], []
+        clock = self.timestamps[0]
+        last_index = len(self.prices) - 1
+
+        while True:
+            stock.update()
+            if stock.hold:
+                if not selling:
+                    if CatchUpHill.should_prepare_to_sell(stock, self.decline_threshold):
+                        CatchUpHill.update_target_sell_price(stock, self.ratio, self.stop_loss_ratio,
+                                                             self.hard_stop_loss_ratio)
+                        selling = True
+                elif CatchUpHill.should_cancel_sell(stock, self.increase_threshold):
+                    selling = False
+                elif CatchUpHill.should_sell(stock) and CatchUpHill.sell(stock):
+                    selling = False
+            equity_times.append(self.timestamps[broker.index])
+            equity.append(broker.equity())
+
+            # 全部卖出后策略不再交易，权益保持不变
+            if broker.index == last_index or not stock.hold:
+                break
+            clock += rng.integers(self.poll_interval[0], self.poll_interval[1] + 1)
+            next_index = np.searchsorted(self.timestamps, clock, side='right') - 1
+            if next_index <= broker.index:
+                next_index = broker.index + 1
+                clock = self.timestamps[next_index]
+            broker.index = next_index
+
+        equity = pd.Series(equity, index=pd.to_datetime(equity_times, unit='s', utc=True), name='equity')
+        initial_equity = self.shares * self.prices[0]
+        drawdown = equity.cummax() - equity
+        fills = pd.DataFrame(broker.fills, columns=['time', 'side', 'price', 'quantity', 'pnl'])
+        fills['time'] = pd.to_datetime(fills['time'], unit='s', utc=True)
+        return {
+            'fills': fills,
+            'equity': equity,
+            'pnl': equity.iloc[-1] - initial_equity,
+            'max_drawdown': drawdown.max(),
+            'max_drawdown_pct': (drawdown / equity.cummax()).max(),
+            'num_polls': len(equity),
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    prices, timestamps = CatchUpHillBacktest.load_bars('test/AAPL_minute_data.csv')
+    start = time.perf_counter()
+    result = CatchUpHillBacktest(prices, timestamps, ticker='AAPL', shares=100, ratio=0.99, seed=0).run()
+    print(f"Backtest finished in {time.perf_counter() - start:.3f}s over {result['num_polls']} polls")
+    print(result['fills'])
+    print(f"P&L: {result['pnl']:.2f}, Max drawdown: {result['max_drawdown']:.2f} "
+          f"({result['max_drawdown_pct']:.2%})")
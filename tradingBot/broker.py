@@ -0,0 +1,193 @@
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+
+class Broker(ABC):
+    """
+    Stock和CatchUpHill使用的行情与下单接口，方法签名和返回格式与robin_stocks.robinhood相同。
+    """
+
+    @abstractmethod
+    def build_holdings(self):
+        # 返回 dict: ticker -> {'quantity': ..., 'average_buy_price': ...}
+        pass
+
+    @abstractmethod
+    def get_latest_price(self, tickers):
+        # tickers为str或list[str]，返回与之对应的价格列表；获取失败的ticker对应None
+        pass
+
+    @abstractmethod
+    def order_sell_market(self, ticker, quantity):
+        # 返回订单信息dict（包含'id'），失败时返回None或不含'id'的dict
+        pass
+
+
+class RobinhoodBroker(Broker):
+    # 实盘：直接转发给robin_stocks；在构造时才导入，模拟券商和回测不需要安装robin_stocks
+
+    def __init__(self):
+        import robin_stocks.robinhood as r
+        self.r = r
+
+    def login(self, username, password, **kwargs):
+        return self.r.login(username, password, **kwargs)
+
+    def logout(self):
+        return self.r.logout()
+
+    def build_holdings(self):
+        return self.r.build_holdings()
+
+    def get_latest_price(self, tickers):
+        return self.r.get_latest_price(tickers)
+
+    def order_sell_market(self, ticker, quantity):
+        return self.r.order_sell_market(ticker, quantity)
+
+
+class ArrayPriceFeed:
+    # 按顺序回放价格数组，接口与MockMinuteDataProvider相同：每次调用前进一个tick，数据用完后返回None
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.current_index = 0
+
+    def get_latest_price(self):
+        if self.current_index < len(self.prices):
+            current_price = self.prices[self.current_index]
+            self.current_index += 1
+            return [current_price]
+        return None
+
+
+class SimulatedBroker(Broker):
+
+    def __init__(self, feeds, holdings, latency=0.0, slippage=0.0, partial_fill_probability=0.0, commission=0.0,
+                 seed=None):
+        """
+        进程内模拟券商，用于在本地以高频率压测交易机器人，不访问真实API。
+
+        参数:
+        feeds (dict): ticker -> 行情源，需实现无参数的 get_latest_price()，每次调用返回 [价格] 并前进一个tick，
+                      数据用完返回None；例如MockMinuteDataProvider或ArrayPriceFeed。
+        holdings (dict): ticker -> (股数, 平均成本)。
+        latency (float 或 tuple): 每次调用的模拟延迟（秒），tuple表示在(最小, 最大)之间均匀随机。
+        slippage (float): 市价卖单相对最新价的滑点比例。
+        partial_fill_probability (float): 订单只部分成交的概率，部分成交时随机成交0~100%的数量。
+        commission (float): 每笔订单佣金。
+        seed (int): 延迟和部分成交的随机数种子。
+        """
+        self.feeds = feeds
+        self.holdings = {ticker: [float(shares), float(average_cost)] for ticker, (shares, average_cost)
+                         in holdings.items()}
+        self.latency = latency
+        self.slippage = slippage
+        self.partial_fill_probability = partial_fill_probability
+        self.commission = commission
+        self.random = random.Random(seed)
+        self.last_prices = {}
+        self.cash = 0.0
+        self.orders = []
+        self.calls = {'build_holdings': 0, 'get_latest_price': 0, 'order_sell_market': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_minute_data(holdings, directory='.', **kwargs):
+        # 以MockMinuteDataProvider使用的 {ticker}_minute_data.csv 分钟数据驱动模拟券商
+        feeds = {}
+        for ticker in holdings:
+            data = pd.read_csv(os.path.join(directory, f"{ticker}_minute_data.csv"), usecols=['Close'])
+            feeds[ticker] = ArrayPriceFeed(data['Close'].to_numpy(dtype=float))
+        return SimulatedBroker(feeds, holdings, **kwargs)
+
+    def _delay(self, name):
+        with self._lock:
+            self.calls[name] += 1
+            latency = self.random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency
+        if latency > 0:
+            time.sleep(latency)
+
+    def build_holdings(self):
+        self._delay('build_holdings')
+        with self._lock:
+            return {ticker: {'quantity': str(shares), 'average_buy_price': str(average_cost)}
+                    for ticker, (shares, average_cost) in self.holdings.items() if shares > 0}
+
+    def get_latest_price(self, tickers):
+        self._delay('get_latest_price')
+        tickers = [tickers] if isinstance(tickers, str) else tickers
+        prices = []
+        with self._lock:
+            for ticker in tickers:
+                feed = self.feeds.get(ticker)
+                quote = feed.get_latest_price() if feed is not None else None
+                if quote:
+                    self.last_prices[ticker] = float(quote[0])
+                prices.append(self.last_prices.get(ticker))
+        return prices
+
+    def order_sell_market(self, ticker, quantity):
+        self._delay('order_sell_market')
+        with self._lock:
+            position = self.holdings.get(ticker)
+            price = self.last_prices.get(ticker)
+            if position is None or price is None or position[0] <= 0:
+                return None
+            quantity = min(float(quantity), position[0])
+            state = 'filled'
+            if self.random.random() < self.partial_fill_probability:
+                quantity *= self.random.random()
+                state = 'partially_filled'
+            fill_price = price * (1 - self.slippage)
+            position[0] -= quantity
+            self.cash += quantity * fill_price - self.commission
+            order = {'id': str(len(self.orders) + 1), 'symbol': ticker, 'side': 'sell', 'state': state,
+                     'cumulative_quantity': str(quantity), 'average_price': str(fill_price)}
+            self.orders.append(order)
+            return order
+
+
+if __name__ == "__main__":
+    import logging
+
+    import numpy as np
+
+    from stock import Stock
+    from strategy import CatchUpHill
+
+    rng = np.random.default_rng(0)
+    tickers = [f'T{i:03d}' for i in range(20)]
+    feeds = {ticker: ArrayPriceFeed(100 * np.exp(np.cumsum(rng.normal(0, 0.001, 5000)))) for ticker in tickers}
+    broker = SimulatedBroker(feeds, {ticker: (10, 100.0) for ticker in tickers}, slippage=0.0005,
+                             partial_fill_probability=0.3, seed=0)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    stocks = [Stock(ticker, broker=broker) for ticker in tickers]
+    selling = {ticker: False for ticker in tickers}
+    start = time.perf_counter()
+    for _ in range(5000):
+        for stock in stocks:
+            stock.update()
+            if not stock.hold:
+                continue
+            if not selling[stock.ticker]:
+                if CatchUpHill.should_prepare_to_sell(stock, 3):
+                    CatchUpHill.update_target_sell_price(stock, 0.995)
+                    selling[stock.ticker] = True
+            elif CatchUpHill.should_cancel_sell(stock, 3):
+                selling[stock.ticker] = False
+            elif CatchUpHill.should_sell(stock):
+                selling[stock.ticker] = not CatchUpHill.sell(stock)
+    elapsed = time.perf_counter() - start
+    # 卖出后的股票只查询持仓、不再拉取价格，因此按实际的价格轮询次数计算吞吐量
+    price_polls = broker.calls['get_latest_price']
+    print(f"{price_polls:,} price polls in {elapsed:.2f}s ({price_polls / elapsed:,.0f} polls/s), "
+          f"{len(broker.orders)} orders, broker calls: {broker.calls}")
+    print(f"Stocks still held: {sum(shares > 0 for shares, _ in broker.holdings.values())}, "
+          f"partial fills: {sum(order['state'] == 'partially_filled' for order in broker.orders)}")
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import random
+
+from stock import Stock
+from strategy import CatchUpHill
+
+
+class AsyncCatchUpHillMonitor:
+
+    def __init__(self, stocks, ratio, max_concurrent_requests=8, poll_interval=(60, 120), retry_interval=60,
+                 stop_loss_ratio=0.9, hard_stop_loss_ratio=0.9, decline_threshold=2, increase_threshold=2,
+                 seed=None):
+        """
+        在一个事件循环中同时监控多只股票，对每只股票运行与CatchUpHill.check_and_trade/prepare_to_sell相同的规则。
+
+        每只股票有自己的轮询协程，轮询间隔随机抖动，避免所有请求同时打到券商；所有券商调用（阻塞的HTTP请求）
+        放到线程中执行，并由信号量限制同时在途的请求数。
+
+        参数:
+        stocks (list[Stock]): 要监控的股票。
+        ratio (float): CatchUpHill的卖出比例。
+        max_concurrent_requests (int): 同时进行的券商调用上限。
+        poll_interval (tuple): 轮询间隔的最小/最大秒数。
+        retry_interval (float): 卖出失败后重试前等待的秒数。
+        stop_loss_ratio, hard_stop_loss_ratio (float): 传给Stock.target_sell_price_with_input_ratio的止损比例。
+        decline_threshold, increase_threshold (int): 触发准备卖出/取消卖出所需的连续下跌/上涨次数。
+        seed (int): 轮询抖动的随机数种子。
+        """
+        self.ratio = ratio
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.stop_loss_ratio = stop_loss_ratio
+        self.hard_stop_loss_ratio = hard_stop_loss_ratio
+        self.decline_threshold = decline_threshold
+        self.increase_threshold = increase_threshold
+        self.max_concurrent_requests = max_concurrent_requests
+        self.random = random.Random(seed)
+        self.stocks = {stock.ticker: stock for stock in stocks}
+        self.tasks = {}
+        self._semaphore = None
+
+    @staticmethod
+    async def create_stocks(tickers, broker=None, max_concurrent_requests=8):
+        # Stock构造时会请求持仓和价格，这里并发创建，同样限制在途请求数
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+        async def create(ticker):
+            async with semaphore:
+                return await asyncio.to_thread(Stock, ticker, broker)
+
+        return list(await asyncio.gather(*(create(ticker) for ticker in tickers)))
+
+    async def _call_broker(self, function, *args):
+        async with self._semaphore:
+            return await asyncio.to_thread(function, *args)
+
+    async def _sleep(self):
+        await asyncio.sleep(self.random.uniform(*self.poll_interval))
+
+    async def _watch(self, stock):
+        selling = False
+        while True:
+            await self._call_broker(stock.update)
+            if not stock.hold:
+                logging.info(f"No longer holding {stock.ticker}. Stop monitoring.")
+                return
+
+            if not selling:
+                if CatchUpHill.should_prepare_to_sell(stock, self.decline_threshold):
+                    logging.info(f"Price drop detected for {stock.ticker} for {self.decline_threshold} consecutive "
+                                 f"checks. Preparing to sell...")
+                    CatchUpHill.update_target_sell_price(stock, self.ratio, self.stop_loss_ratio,
+                                                         self.hard_stop_loss_ratio)
+                    selling = True
+            elif CatchUpHill.should_cancel_sell(stock, self.increase_threshold):
+                logging.info(f"Price rise detected for {stock.ticker} for {self.increase_threshold} consecutive "
+                             f"checks. Canceling sell...")
+                selling = False
+            elif CatchUpHill.should_sell(stock):
+                if await self._call_broker(CatchUpHill.sell, stock):
+                    selling = False
+                else:
+                    await asyncio.sleep(self.retry_interval)
+                    continue
+            await self._sleep()
+
+    def add(self, stock):
+        # 运行中也可以加入新的股票
+        self.stocks[stock.ticker] = stock
+        if self._semaphore is not None and stock.ticker not in self.tasks:
+            self.tasks[stock.ticker] = asyncio.create_task(self._watch(stock), name=stock.ticker)
+
+    def cancel(self, ticker):
+        # 停止监控某只股票，正在进行的券商调用完成后协程退出
+        self.stocks.pop(ticker, None)
+        task = self.tasks.pop(ticker, None)
+        if task is not None:
+            task.cancel()
+
+    def stop(self):
+        for ticker in list(self.tasks):
+            self.cancel(ticker)
+
+    async def run(self):
+        """
+        监控所有股票直到全部卖出或被取消。某只股票的协程出错不会影响其他股票。
+
+        返回:
+        dict: ticker -> 该股票协程的异常；正常结束的股票不在其中。
+        """
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        for stock in self.stocks.values():
+            self.tasks[stock.ticker] = asyncio.create_task(self._watch(stock), name=stock.ticker)
+
+        errors = {}
+        while self.tasks:
+            done, _ = await asyncio.wait(list(self.tasks.values()), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                ticker = task.get_name()
+                if self.tasks.get(ticker) is task:
+                    del self.tasks[ticker]
+                if not task.cancelled() and task.exception() is not None:
+                    errors[ticker] = task.exception()
+                    logging.error(f"Monitoring {ticker} failed: {task.exception()}")
+        return errors
+
+
+if __name__ == "__main__":
+    import time
+    import numpy as np
+
+    from backtest import BacktestBroker
+
+    class LatencyBroker(BacktestBroker):
+        # 每次查询价格前进一根K线，并模拟20ms的网络延迟
+        def get_latest_price(self, ticker):
+            time.sleep(0.02)
+            self.index = min(self.index + 1, len(self.prices) - 1)
+            return super().get_latest_price(ticker)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = np.random.default_rng(0)
+    stocks = []
+    for i in range(100):
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, 500)))
+        broker = LatencyBroker(f'T{i:03d}', prices, np.arange(len(prices)), 10, 100.0)
+        stocks.append(Stock(f'T{i:03d}', broker=broker))
+
+    monitor = AsyncCatchUpHillMonitor(stocks, ratio=0.99, max_concurrent_requests=16, poll_interval=(0.01, 0.02),
+                                      retry_interval=0.01, seed=0)
+
+    async def main(duration):
+        # 运行一段时间后取消所有仍在监控的股票
+        run = asyncio.create_task(monitor.run())
+        await asyncio.sleep(duration)
+        monitor.stop()
+        return await run
+
+    start = time.perf_counter()
+    errors = asyncio.run(main(5))
+    sold = sum(not stock.hold for stock in stocks)
+    print(f"Monitored {len(stocks)} tickers in {time.perf_counter() - start:.2f}s, sold {sold}, errors: {errors}")
@@ -0,0 +1,103 @@
+import itertools
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import CatchUpHillBacktest
+
+# 工作进程中只读映射的K线数据，由_attach_bars在进程启动时设置
+_bars = {}
+
+
+def _attach_bars(prices_path, timestamps_path, backtest_options):
+    # 以内存映射方式打开父进程写好的.npy文件，所有进程共享同一份页缓存，不复制数据
+    _bars['prices'] = np.load(prices_path, mmap_mode='r')
+    _bars['timestamps'] = np.load(timestamps_path, mmap_mode='r')
+    _bars['options'] = backtest_options
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def _run_backtest(params):
+    result = CatchUpHillBacktest(_bars['prices'], _bars['timestamps'], **_bars['options'], **params).run()
+    return {**params, 'pnl': result['pnl'], 'max_drawdown': result['max_drawdown'],
+            'max_drawdown_pct': result['max_drawdown_pct'], 'num_fills': len(result['fills'])}
+
+
+class CatchUpHillParameterSweep:
+
+    def __init__(self, prices, timestamps, max_workers=None, **backtest_options):
+        """
+        在进程池中并行运行多组参数的CatchUpHill历史回测。
+
+        参数:
+        prices, timestamps (np.ndarray): 回测用的收盘价和时间戳（秒）。
+        max_workers (int): 进程数，默认为CPU核数。
+        backtest_options: 传给CatchUpHillBacktest的其他固定参数，例如 shares、poll_interval、commission、seed。
+        """
+        self.prices = np.ascontiguousarray(prices, dtype=float)
+        self.timestamps = np.ascontiguousarray(timestamps, dtype=np.int64)
+        self.max_workers = max_workers
+        self.backtest_options = backtest_options
+
+    @staticmethod
+    def grid(**values):
+        # 所有参数取值的笛卡尔积，例如 grid(ratio=[0.9, 0.95], decline_threshold=[2, 3])
+        names = list(values)
+        return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+    @staticmethod
+    def random_sample(num_samples, seed=None, **ranges):
+        """
+        随机抽样参数组合。ranges中 (low, high) 元组表示均匀分布（两端都是整数时抽整数），列表表示从中随机选取。
+        """
+        rng = np.random.default_rng(seed)
+        columns = {}
+        for name, value_range in ranges.items():
+            if isinstance(value_range, tuple):
+                low, high = value_range
+                if isinstance(low, int) and isinstance(high, int):
+                    columns[name] = rng.integers(low, high + 1, num_samples).tolist()
+                else:
+                    columns[name] = rng.uniform(low, high, num_samples).tolist()
+            else:
+                columns[name] = [value_range[i] for i in rng.integers(0, len(value_range), num_samples)]
+        return [{name: columns[name][i] for name in ranges} for i in range(num_samples)]
+
+    def run(self, param_sets):
+        """
+        返回:
+        pd.DataFrame: 每组参数一行，包含 pnl、max_drawdown、max_drawdown_pct、num_fills，
+                      按收益从高到低、回撤从小到大排序，rank列从1开始。
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            prices_path = os.path.join(directory, 'prices.npy')
+            timestamps_path = os.path.join(directory, 'timestamps.npy')
+            np.save(prices_path, self.prices)
+            np.save(timestamps_path, self.timestamps)
+
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_attach_bars,
+                                     initargs=(prices_path, timestamps_path, self.backtest_options)) as executor:
+                chunksize = max(1, len(param_sets) // (4 * (self.max_workers or os.cpu_count() or 1)))
+                results = list(executor.map(_run_backtest, param_sets, chunksize=chunksize))
+
+        table = pd.DataFrame(results).sort_values(['pnl', 'max_drawdown'], ascending=[False, True])
+        table.insert(0, 'rank', np.arange(1, len(table) + 1))
+        return table.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import time
+
+    prices, timestamps = CatchUpHillBacktest.load_bars('test/AAPL_minute_data.csv')
+    sweep = CatchUpHillParameterSweep(prices, timestamps, shares=100, poll_interval=(60, 60), seed=0)
+    param_sets = sweep.grid(ratio=[0.9, 0.95, 0.98, 0.99, 0.995], stop_loss_ratio=[0.9, 0.95, 0.98],
+                            hard_stop_loss_ratio=[0.9, 0.95], decline_threshold=[1, 2, 3, 4],
+                            increase_threshold=[1, 2, 3, 4])
+    start = time.perf_counter()
+    results = sweep.run(param_sets)
+    print(f"Ran {len(param_sets)} backtests in {time.perf_counter() - start:.2f}s")
+    print(results.head(10).to_string(index=False))
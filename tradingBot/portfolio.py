@@ -0,0 +1,125 @@
+import threading
+import time
+
+from broker import Broker, RobinhoodBroker
+
+
+class Portfolio(Broker):
+
+    def __init__(self, broker=None, ttl=30):
+        """
+        在券商接口前加一层短期缓存：一个轮询周期内所有Stock共享一次持仓请求和一次批量报价请求。
+
+        Portfolio本身也是Broker，
+        因此直接作为broker传给Stock即可，例如 Stock('AAPL', broker=portfolio)。
+
+        参数:
+        broker (Broker): 实际的券商接口，默认为RobinhoodBroker。
+        ttl (float): 持仓和报价缓存的有效期（秒），应小于轮询间隔。
+        """
+        self.broker = RobinhoodBroker() if broker is None else broker
+        self.ttl = ttl
+        self.tickers = set()
+        self._holdings = None
+        self._holdings_time = 0.0
+        self._prices = {}
+        self._prices_time = 0.0
+        # monitor等并发调用时保证同一周期只请求一次
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, fetched_time):
+        return time.monotonic() - fetched_time < self.ttl
+
+    def build_holdings(self):
+        with self._lock:
+            if self._holdings is None or not self._is_fresh(self._holdings_time):
+                self._holdings = self.broker.build_holdings()
+                self._holdings_time = time.monotonic()
+            return self._holdings
+
+    def latest_prices(self, tickers=None):
+        """
+        返回:
+        dict: ticker -> 最新价格（float，获取失败为None）。缓存过期或有新ticker时，
+              对所有登记过的ticker和当前持仓发一次批量报价请求。
+        """
+        tickers = self.tickers if tickers is None else set(tickers)
+        holdings = self.build_holdings()
+        with self._lock:
+            self.tickers |= tickers
+            if not self._is_fresh(self._prices_time) or not tickers <= self._prices.keys():
+                symbols = sorted(self.tickers | set(holdings))
+                quotes = self.broker.get_latest_price(symbols) if symbols else []
+                self._prices = {symbol: None if quote is None else float(quote)
+                                for symbol, quote in zip(symbols, quotes)}
+                self._prices_time = time.monotonic()
+            return {ticker: self._prices.get(ticker) for ticker in tickers}
+
+    def get_latest_price(self, tickers):
+        # 与robin_stocks相同，返回价格列表；单个ticker获取失败时返回空列表
+        if isinstance(tickers, str):
+            price = self.latest_prices([tickers])[tickers]
+            return [] if price is None else [price]
+        prices = self.latest_prices(tickers)
+        return [prices[ticker] for ticker in tickers]
+
+    def order_sell_market(self, ticker, quantity):
+        # 下单不缓存，成交后持仓已变化，清空缓存使下一次查询重新获取
+        order = self.broker.order_sell_market(ticker, quantity)
+        self.invalidate()
+        return order
+
+    def invalidate(self):
+        with self._lock:
+            self._holdings = None
+            self._prices_time = 0.0
+
+    def create_stocks(self, tickers):
+        # 先登记全部ticker，使所有Stock的初始化共用同一次批量报价
+        from stock import Stock
+        self.tickers |= set(tickers)
+        return [Stock(ticker, broker=self) for ticker in tickers]
+
+    def refresh(self, stocks):
+        # 一个轮询周期：先批量刷新缓存，再更新每只股票，总共只产生两次券商请求
+        self.invalidate()
+        self.latest_prices([stock.ticker for stock in stocks])
+        for stock in stocks:
+            stock.update()
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    from stock import Stock
+
+    class CountingBroker:
+        # 模拟券商，统计请求次数
+        def __init__(self, tickers):
+            self.prices = dict(zip(tickers, np.linspace(50, 150, len(tickers))))
+            self.calls = 0
+
+        def build_holdings(self):
+            self.calls += 1
+            return {ticker: {'quantity': '10', 'average_buy_price': '100'} for ticker in self.prices}
+
+        def get_latest_price(self, tickers):
+            self.calls += 1
+            tickers = [tickers] if isinstance(tickers, str) else tickers
+            return [f'{self.prices[ticker]:.4f}' for ticker in tickers]
+
+    tickers = [f'T{i:03d}' for i in range(100)]
+    direct_broker = CountingBroker(tickers)
+    stocks = [Stock(ticker, broker=direct_broker) for ticker in tickers]
+    direct_broker.calls = 0
+    for stock in stocks:
+        stock.update()
+    print(f"Direct broker: {direct_broker.calls} calls per cycle")
+
+    portfolio_broker = CountingBroker(tickers)
+    portfolio = Portfolio(portfolio_broker, ttl=30)
+    stocks = portfolio.create_stocks(tickers)
+    print(f"Portfolio: {portfolio_broker.calls} calls to create {len(stocks)} stocks")
+    portfolio_broker.calls = 0
+    portfolio.refresh(stocks)
+    print(f"Portfolio: {portfolio_broker.calls} calls per cycle")
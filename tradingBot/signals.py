@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class PriceSignals:
+    """
+    Stock.update中连续涨跌计数、最高卖价和目标卖价的计算规则。
+
+    step()是逐笔更新的版本，供实盘的Stock使用；其余方法对整段价格序列一次性向量化计算，结果与逐笔调用step()完全一致，
+    供回测和研究使用。
+    """
+
+    @staticmethod
+    def step(current_price, new_price, consecutive_declines, consecutive_increases, max_sell_price):
+        # 价格上涨：上涨计数+1、下跌计数清零并更新最高价；下跌反之；价格不变时计数保持不变
+        if new_price > current_price:
+            return 0, consecutive_increases + 1, max(new_price, max_sell_price)
+        if new_price < current_price:
+            return consecutive_declines + 1, 0, max_sell_price
+        return consecutive_declines, consecutive_increases, max_sell_price
+
+    @staticmethod
+    def consecutive_runs(prices, initial_price=None):
+        """
+        返回:
+        tuple: (连续下跌次数, 连续上涨次数) 两个int数组。第一个价格与initial_price比较（默认为自身，即不计数）。
+        """
+        prices = np.asarray(prices, dtype=float)
+        if len(prices) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        previous = np.empty_like(prices)
+        previous[0] = prices[0] if initial_price is None else initial_price
+        previous[1:] = prices[:-1]
+        up = prices > previous
+        down = prices < previous
+
+        index = np.arange(len(prices))
+        cumulative_up = np.cumsum(up)
+        cumulative_down = np.cumsum(down)
+        # 每个位置之前最近一次下跌/上涨的下标，之后的上涨/下跌次数即为当前的连续计数
+        last_down = np.maximum.accumulate(np.where(down, index, -1))
+        last_up = np.maximum.accumulate(np.where(up, index, -1))
+        increases = cumulative_up - np.where(last_down >= 0, cumulative_up[np.maximum(last_down, 0)], 0)
+        declines = cumulative_down - np.where(last_up >= 0, cumulative_down[np.maximum(last_up, 0)], 0)
+        return declines, increases
+
+    @staticmethod
+    def running_max(prices, initial_max=None):
+        # 只有价格上涨时才会刷新最高价，因此等于价格序列的累计最大值
+        prices = np.asarray(prices, dtype=float)
+        running = np.maximum.accumulate(prices)
+        return running if initial_max is None else np.maximum(running, initial_max)
+
+    @staticmethod
+    def target_sell_price_with_ratio(current_price, average_cost, ratio, stop_loss_ratio=0.9,
+                                     hard_stop_loss_ratio=0.9):
+        # Stock.target_sell_price_with_input_ratio的向量化版本
+        current_price = np.asarray(current_price, dtype=float)
+        stop_loss_price = np.where(average_cost * stop_loss_ratio <= current_price, average_cost * stop_loss_ratio,
+                                   current_price * hard_stop_loss_ratio)
+        return np.where(current_price >= average_cost, average_cost + (current_price - average_cost) * ratio,
+                        stop_loss_price)
+
+    @staticmethod
+    def trailing_target_sell_price(prices, max_prices, average_cost, ratio, stop_loss_ratio=0.9,
+                                   hard_stop_loss_ratio=0.9):
+        # CatchUpHill.update_target_sell_price在每个时点会设定的目标卖价
+        prices = np.asarray(prices, dtype=float)
+        best_sell_prices = np.asarray(max_prices, dtype=float) * ratio
+        ratio_sell_prices = PriceSignals.target_sell_price_with_ratio(prices, average_cost, ratio, stop_loss_ratio,
+                                                                      hard_stop_loss_ratio)
+        return np.where(best_sell_prices < prices, best_sell_prices, ratio_sell_prices)
+
+    @staticmethod
+    def compute(prices, average_cost, ratio, stop_loss_ratio=0.9, hard_stop_loss_ratio=0.9, decline_threshold=2,
+                increase_threshold=2):
+        """
+        对整段价格序列一次性计算CatchUpHill用到的全部状态。
+
+        返回:
+        dict: 'consecutive_declines'、'consecutive_increases'、'max_sell_price'、'target_sell_price'，
+              以及布尔数组 'prepare_to_sell'（连续下跌达到阈值）和 'cancel_sell'（连续上涨达到阈值）。
+        """
+        declines, increases = PriceSignals.consecutive_runs(prices)
+        max_prices = PriceSignals.running_max(prices)
+        return {
+            'consecutive_declines': declines,
+            'consecutive_increases': increases,
+            'max_sell_price': max_prices,
+            'target_sell_price': PriceSignals.trailing_target_sell_price(prices, max_prices, average_cost, ratio,
+                                                                         stop_loss_ratio, hard_stop_loss_ratio),
+            'prepare_to_sell': declines >= decline_threshold,
+            'cancel_sell': increases >= increase_threshold,
+        }
+
+
+if __name__ == "__main__":
+    import time
+    from backtest import CatchUpHillBacktest
+
+    prices, _ = CatchUpHillBacktest.load_bars('test/AAPL_minute_data.csv')
+    prices = np.tile(prices, 1000)
+    start = time.perf_counter()
+    signals = PriceSignals.compute(prices, average_cost=prices[0], ratio=0.95)
+    print(f"Computed signals for {len(prices):,} bars in {time.perf_counter() - start:.3f}s, "
+          f"{signals['prepare_to_sell'].sum():,} sell triggers")
@@ -1,9 +1,16 @@
-import robin_stocks.robinhood as r
+import time
+
+from broker import RobinhoodBroker
+from signals import PriceSignals
+from volatility import RollingVolatility
 
 
 class Stock:
-    def __init__(self, ticker):
+    def __init__(self, ticker, broker=None, volatility_window=60, volatility_periods_per_year=None, clock=time.time):
         self.ticker = ticker
+        # broker为Broker接口的实现：默认实盘RobinhoodBroker，回测和压测时换成BacktestBroker/SimulatedBroker；
+        # 监控多只股票时传入Portfolio，共享每个周期的持仓和批量报价
+        self.broker = RobinhoodBroker() if broker is None else broker
         self.hold = False
         self.shares = 0
         self.averageCost = 0
@@ -11,29 +18,34 @@ class Stock:
         self.currentPrice = 0
         self.maxSellPrice = 0
         self.targetSellPrice = 0
+        # 每次取到价格时增量更新的已实现波动率。CatchUpHill每60~120秒轮询一次，默认按clock记录的实际轮询间隔
+        # （中位数）年化；60次轮询约1.5小时，不跨越隔夜。回测时clock传入模拟时钟
+        self.clock = clock
+        self.realizedVolatility = RollingVolatility(volatility_window, volatility_periods_per_year)
         self.fetch_data()
         self.previousPrice = self.currentPrice
         self.consecutiveDeclines = 0  # 追踪连续下跌的次数
         self.consecutiveIncreases = 0
 
     def fetch_data(self):
-        holdings = r.build_holdings()
+        holdings = self.broker.build_holdings()
         if self.ticker in holdings:
             self.hold = True
             holding_info = holdings[self.ticker]
             self.shares = float(holding_info['quantity'])
             self.averageCost = float(holding_info['average_buy_price'])
             self.cost = self.shares * self.averageCost
-            current_prices = r.get_latest_price(self.ticker)
+            current_prices = self.broker.get_latest_price(self.ticker)
             if current_prices:
-                self.currentPrice = current_prices[0]
+                self.currentPrice = float(current_prices[0])
+                self.realizedVolatility.update(self.currentPrice, timestamp=self.clock())
                 self.maxSellPrice = self.currentPrice
                 self.targetSellPrice = self.maxSellPrice
             else:
                 print("Failed to fetch current price. Please check if ticker is correct.")
 
     def update(self):
-        holdings = r.build_holdings()
+        holdings = self.broker.build_holdings()
         if self.ticker in holdings:
             self.previousPrice = self.currentPrice
             self.hold = True
@@ -41,17 +53,15 @@ class Stock:
             self.shares = float(holding_info['quantity'])
             self.averageCost = float(holding_info['average_buy_price'])
             self.cost = self.shares * self.averageCost
-            current_prices = r.get_latest_price(self.ticker)
+            current_prices = self.broker.get_latest_price(self.ticker)
             if current_prices:
                 new_price = float(current_prices[0])
-                if new_price > self.currentPrice:
-                    self.consecutiveIncreases += 1
-                    self.consecutiveDeclines = 0
-                    self.maxSellPrice = max(new_price, self.maxSellPrice)
-                elif new_price < self.currentPrice:
-                    self.consecutiveDeclines += 1
-                    self.consecutiveIncreases = 0
+                # 与PriceSignals的向量化计算共用同一条更新规则
+                self.consecutiveDeclines, self.consecutiveIncreases, self.maxSellPrice = PriceSignals.step(
+                    self.currentPrice, new_price, self.consecutiveDeclines, self.consecutiveIncreases,
+                    self.maxSellPrice)
                 self.currentPrice = new_price
+                self.realizedVolatility.update(new_price, timestamp=self.clock())
             else:
                 print("Failed to fetch current price. Please check if ticker is correct.")
         else:
@@ -104,9 +114,9 @@ class Stock:
 
     # update_current_price function should not be use; User should use update function instead
     def update_current_price(self):
-        current_prices = r.get_latest_price(self.ticker)
+        current_prices = self.broker.get_latest_price(self.ticker)
         if current_prices:
-            current_price = current_prices[0]
+            current_price = float(current_prices[0])
             self.currentPrice = current_price
 
     def get_current_price(self):
@@ -115,6 +125,10 @@ class Stock:
     def print_current_price(self):
         print(f"Current price of {self.ticker} is {self.currentPrice}")
 
+    def get_realized_volatility(self):
+        # 最近volatility_window次更新的年化close-to-close波动率，更新次数不足时为NaN
+        return self.realizedVolatility.close_to_close()
+
     def calculate_earning_per_share(self):
         return self.currentPrice-self.averageCost
 
@@ -125,13 +139,8 @@ class Stock:
         return (self.currentPrice-self.averageCost)/self.averageCost
 
     def target_sell_price_with_input_ratio(self, ratio, stop_loss_ratio=0.9, hard_stop_loss_ratio=0.9):
-        if self.currentPrice >= self.averageCost:
-            return self.averageCost+(self.currentPrice-self.averageCost)*ratio
-        else:
-            if self.averageCost*stop_loss_ratio <= self.currentPrice:
-                return self.averageCost*stop_loss_ratio
-            else:
-                return self.currentPrice*hard_stop_loss_ratio
+        return float(PriceSignals.target_sell_price_with_ratio(self.currentPrice, self.averageCost, ratio,
+                                                               stop_loss_ratio, hard_stop_loss_ratio))
 
 
 if __name__ == "__main__":
@@ -1,6 +1,5 @@
 import time
 import random
-import robin_stocks.robinhood as r
 import logging
 
 
@@ -8,13 +7,65 @@ class CatchUpHill:
 
     logging.basicConfig(level=logging.INFO, format='%(asctime)s :: %(levelname)s :: %(message)s')
 
+    # 以下判断逻辑与轮询/下单分离，实盘循环和回测引擎共用同一套规则
+    @staticmethod
+    def should_prepare_to_sell(stock, decline_threshold=2):
+        return stock.consecutiveDeclines >= decline_threshold
+
+    @staticmethod
+    def should_cancel_sell(stock, increase_threshold=2):
+        return stock.consecutiveIncreases >= increase_threshold
+
+    @staticmethod
+    def should_sell(stock):
+        return stock.currentPrice <= stock.targetSellPrice
+
+    @staticmethod
+    def update_target_sell_price(stock, ratio, stop_loss_ratio=0.9, hard_stop_loss_ratio=0.9):
+        current_sell_price = stock.target_sell_price_with_input_ratio(ratio, stop_loss_ratio, hard_stop_loss_ratio)
+        best_sell_price = stock.maxSellPrice * ratio
+        if best_sell_price < stock.currentPrice:
+            stock.set_target_sell_price(best_sell_price)
+        else:
+            stock.set_target_sell_price(current_sell_price)
+
+    @staticmethod
+    def sell(stock, max_attempts=3):
+        # 部分成交时继续卖出剩余股数；只有全部成交（或券商已接受、尚在排队的订单）才返回True
+        logging.info(f"Attempting to sell {stock.ticker} at price {stock.currentPrice}")
+        remaining = stock.shares
+        earning = 0.0
+        for _ in range(max_attempts):
+            sell_order = stock.broker.order_sell_market(stock.ticker, remaining)
+            if not sell_order or 'id' not in sell_order:
+                logging.error(f"Failed to sell shares of {stock.ticker}. Response: {sell_order}")
+                break
+            if sell_order.get('state') not in ('filled', 'partially_filled'):
+                # 实盘市价单提交后通常先处于queued/confirmed状态，由券商异步成交
+                logging.info(f"Sell order for {remaining} shares of {stock.ticker} accepted "
+                             f"(state: {sell_order.get('state')})")
+                return True
+            filled = float(sell_order.get('cumulative_quantity') or 0)
+            fill_price = float(sell_order.get('average_price') or stock.currentPrice)
+            earning += filled * (fill_price - stock.averageCost)
+            remaining -= filled
+            if remaining <= 1e-9:
+                logging.info(f"Successfully sold all shares of {stock.ticker}")
+                logging.info(f"Total Earning: {earning}")
+                return True
+            logging.warning(f"Partially sold {filled} shares of {stock.ticker}, {remaining} shares remaining")
+        # 下次Stock.update会从券商刷新持仓，这里先记下剩余股数，回测和监控循环据此继续卖出
+        stock.shares = remaining
+        logging.error(f"Could not sell all shares of {stock.ticker}: {remaining} shares remaining")
+        return False
+
     @staticmethod
     def check_and_trade(stock, ratio):
         stock.update()
         if not stock.hold:
             return
 
-        if stock.consecutiveDeclines >= 2:
+        if CatchUpHill.should_prepare_to_sell(stock):
             logging.info(f"Price drop detected for {stock.ticker} for two consecutive checks. Preparing to sell...")
             CatchUpHill.prepare_to_sell(stock, ratio)
 
@@ -25,35 +76,20 @@ class CatchUpHill:
 
     @staticmethod
     def prepare_to_sell(stock, ratio):
-        current_sell_price = stock.target_sell_price_with_input_ratio(ratio)
-        best_sell_price = stock.maxSellPrice * ratio
-        if best_sell_price < stock.currentPrice:
-            stock.set_target_sell_price(best_sell_price)
-        else:
-            stock.set_target_sell_price(current_sell_price)
+        CatchUpHill.update_target_sell_price(stock, ratio)
 
         while True:
             stock.update()
-            if stock.consecutiveIncreases >= 2:
+            if CatchUpHill.should_cancel_sell(stock):
                 logging.info(f"Price rise detected for {stock.ticker} for two consecutive checks. Canceling sell...")
                 break
 
             logging.info(f"Monitoring {stock.ticker} for selling opportunity...")
-            if stock.currentPrice <= stock.targetSellPrice:
-                logging.info(f"Attempting to sell {stock.ticker} at price {stock.currentPrice}")
-                # 这里加入卖出股票的逻辑
-                sell_order = r.order_sell_market(stock.ticker, stock.shares)
-                if sell_order and 'id' in sell_order:
-                    # 如果卖出成功，记录成功信息并退出循环
-                    logging.info(f"Successfully sold all shares of {stock.ticker}")
-                    logging.info(f"Total Earning: {stock.shares * (stock.currentPrice-stock.averageCost)}")
+            if CatchUpHill.should_sell(stock):
+                # 如果卖出成功则退出循环；失败则继续监控股价变动
+                if CatchUpHill.sell(stock):
                     break
-                else:
-                    # 如果卖出失败，记录失败信息但不退出循环，继续监控股价变动
-                    logging.error(f"Failed to sell shares of {stock.ticker}. Response: {sell_order}")
-                    # 可选: 在这里加入延迟或重试逻辑
-                    time.sleep(60)  # 继续监控前等待一段时间
+                time.sleep(60)  # 继续监控前等待一段时间
             else:
                 sleep_time = 60 + random.randint(0, 60)
                 time.sleep(sleep_time)
-
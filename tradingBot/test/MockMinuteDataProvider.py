@@ -1,14 +1,176 @@
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
 
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+CSV_COLUMNS = {'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'}
+
+
+def _csv_chunk_to_arrays(chunk):
+    # Datetime列转成UTC秒，OHLCV列转成float64
+    datetimes = pd.to_datetime(chunk['Datetime'], utc=True)
+    arrays = {'timestamp': ((datetimes - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy(np.int64)}
+    for csv_column, column in CSV_COLUMNS.items():
+        arrays[column] = chunk[csv_column].to_numpy(dtype=np.float64)
+    return arrays
+
+
+def _cache_paths(csv_path):
+    # {ticker}_minute_data.csv 的各列缓存在同目录的 .minute_data_cache/{ticker}_minute_data_{列名}.npy
+    directory, filename = os.path.split(csv_path)
+    stem = os.path.splitext(filename)[0]
+    return {column: os.path.join(directory, '.minute_data_cache', f"{stem}_{column}.npy") for column in COLUMNS}
+
+
+def _is_cache_fresh(csv_path, paths):
+    csv_mtime = os.path.getmtime(csv_path)
+    return all(os.path.exists(path) and os.path.getmtime(path) >= csv_mtime for path in paths.values())
+
+
+def _build_cache(csv_path, paths, chunk_size=100_000):
+    # 分块解析CSV直接写入内存映射的.npy文件，内存占用只与chunk_size有关，不随文件大小增长
+    num_rows = sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=['Datetime'], chunksize=chunk_size))
+    directory = os.path.dirname(paths['close'])
+    os.makedirs(directory, exist_ok=True)
+    # 每个进程写自己的临时文件再原子替换，多个进程同时重建缓存时不会互相覆盖
+    temp_paths, arrays = {}, {}
+    try:
+        for column, path in paths.items():
+            fd, temp_paths[column] = tempfile.mkstemp(suffix='.tmp.npy', prefix=os.path.basename(path) + '.',
+                                                      dir=directory)
+            os.close(fd)
+            dtype = np.int64 if column == 'timestamp' else np.float64
+            arrays[column] = np.lib.format.open_memmap(temp_paths[column], mode='w+', dtype=dtype, shape=(num_rows,))
+        start = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size, usecols=['Datetime', *CSV_COLUMNS]):
+            chunk_arrays = _csv_chunk_to_arrays(chunk)
+            for column, array in arrays.items():
+                array[start:start + len(chunk)] = chunk_arrays[column]
+            start += len(chunk)
+        for array in arrays.values():
+            array.flush()
+        arrays.clear()
+        for column, path in paths.items():
+            os.replace(temp_paths[column], path)
+    finally:
+        for temp_path in temp_paths.values():
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
 
 class MockMinuteDataProvider:
-    def __init__(self, ticker):
-        self.data = pd.read_csv(f"{ticker}_minute_data.csv", index_col='Datetime', parse_dates=True)
+
+    # get_latest_price每次只把这么多个收盘价转换成Python float，内存占用与文件大小无关
+    CHUNK_SIZE = 4096
+
+    def __init__(self, ticker, directory='.', use_cache=True):
+        """
+        回放 {ticker}_minute_data.csv 分钟数据。OHLCV各列保存为连续的NumPy数组，逐tick读取不再经过pandas。
+
+        第一次分块读取CSV并把各列写成二进制.npy缓存（CSV更新后自动重建），之后以内存映射方式打开，
+        多个进程回放同一文件时共享页缓存。
+
+        参数:
+        ticker (str): 股票代码。
+        directory (str): CSV所在目录。
+        use_cache (bool): 是否使用.npy二进制缓存。
+        """
+        self.ticker = ticker
+        self.path = os.path.join(directory, f"{ticker}_minute_data.csv")
+        arrays = self._load_cached() if use_cache else _csv_chunk_to_arrays(pd.read_csv(self.path))
+        self.timestamps = arrays['timestamp']
+        self.open = arrays['open']
+        self.high = arrays['high']
+        self.low = arrays['low']
+        self.close = arrays['close']
+        self.volume = arrays['volume']
+        self._chunk_start = 0
+        self._chunk_values = []
         self.current_index = 0
 
+    def _load_cached(self):
+        paths = _cache_paths(self.path)
+        if not _is_cache_fresh(self.path, paths):
+            _build_cache(self.path, paths)
+        return {column: np.load(path, mmap_mode='r') for column, path in paths.items()}
+
+    def __len__(self):
+        return len(self.close)
+
     def get_latest_price(self):
-        if self.current_index < len(self.data):
-            current_price = self.data.iloc[self.current_index]['Close']
-            self.current_index += 1
-            return [current_price]
-        return None
\ No newline at end of file
+        # 逐tick返回Python float：按块从内存映射中转换，避免每次调用都构造NumPy标量，也不复制整列数据
+        offset = self.current_index - self._chunk_start
+        if not 0 <= offset < len(self._chunk_values):
+            if self.current_index >= len(self.close):
+                return None
+            self._chunk_start = self.current_index
+            self._chunk_values = self.close[self.current_index:self.current_index + self.CHUNK_SIZE].tolist()
+            offset = 0
+        self.current_index += 1
+        return [self._chunk_values[offset]]
+
+    def reset(self, index=0):
+        self.current_index = index
+
+    def bars(self, start=0, stop=None):
+        # 返回第start到stop根K线的各列切片（视图，不复制数据）
+        return {'timestamp': self.timestamps[start:stop], 'open': self.open[start:stop],
+                'high': self.high[start:stop], 'low': self.low[start:stop], 'close': self.close[start:stop],
+                'volume': self.volume[start:stop]}
+
+    def bars_between(self, start_time, end_time):
+        # 时间戳（UTC秒）在 [start_time, end_time) 内的K线
+        start, stop = np.searchsorted(self.timestamps, [start_time, end_time])
+        return self.bars(start, stop)
+
+    @staticmethod
+    def aligned_close(providers):
+        """
+        把多个ticker的收盘价按时间对齐。
+
+        返回:
+        tuple: (timestamps, closes)。timestamps为所有ticker时间戳的并集，closes形状为 (时间点数, ticker数)，
+               某个ticker在该时间点没有K线时沿用其上一根K线的收盘价，第一根K线之前为NaN。
+        """
+        timestamps = np.unique(np.concatenate([provider.timestamps for provider in providers]))
+        closes = np.empty((len(timestamps), len(providers)))
+        for j, provider in enumerate(providers):
+            index = np.searchsorted(provider.timestamps, timestamps, side='right') - 1
+            closes[:, j] = np.where(index >= 0, provider.close[np.maximum(index, 0)], np.nan)
+        return timestamps, closes
+
+    @staticmethod
+    def stream(path, chunk_size=100_000):
+        """
+        分块读取比内存更大的分钟数据文件，每次产出一个dict，包含该块的 timestamp/open/high/low/close/volume 数组。
+        如果该CSV已有最新的.npy缓存，直接对内存映射按块切片，否则分块解析CSV。
+        """
+        cache_paths = _cache_paths(path)
+        if _is_cache_fresh(path, cache_paths):
+            arrays = {column: np.load(cache_path, mmap_mode='r') for column, cache_path in cache_paths.items()}
+            for start in range(0, len(arrays['close']), chunk_size):
+                yield {column: np.asarray(array[start:start + chunk_size]) for column, array in arrays.items()}
+            return
+        for chunk in pd.read_csv(path, chunksize=chunk_size, usecols=['Datetime', *CSV_COLUMNS]):
+            yield _csv_chunk_to_arrays(chunk)
+
+
+if __name__ == "__main__":
+    import time
+
+    provider = MockMinuteDataProvider('AAPL')
+    num_ticks = 0
+    start = time.perf_counter()
+    for _ in range(500):
+        provider.reset()
+        while provider.get_latest_price() is not None:
+            num_ticks += 1
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {num_ticks:,} ticks in {elapsed:.2f}s ({num_ticks / elapsed:,.0f} ticks/s)")
+
+    first_day = provider.bars_between(provider.timestamps[0], provider.timestamps[0] + 86400)
+    print(f"First day: {len(first_day['close'])} bars, high {first_day['high'].max():.2f}")
+    num_rows = sum(len(chunk['close']) for chunk in MockMinuteDataProvider.stream('AAPL_minute_data.csv', 500))
+    print(f"Streamed {num_rows} rows")
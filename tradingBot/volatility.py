@@ -0,0 +1,394 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# 每年交易分钟数：默认按分钟K线年化；日K线传入 periods_per_year=252
+MINUTES_PER_YEAR = 252 * 390
+# 每年交易秒数：按实际更新间隔年化时使用
+TRADING_SECONDS_PER_YEAR = MINUTES_PER_YEAR * 60
+
+
+def _check_window(window):
+    # 样本方差（ddof=1）和Yang-Zhang的k都需要至少两个点
+    if window < 2:
+        raise ValueError(f"window must be at least 2, got {window}")
+
+
+class RealizedVolatility:
+    """
+    基于OHLC K线的已实现波动率和滚动统计，一次性向量化计算整段历史，供回测和研究使用。
+
+    所有滚动窗口用前缀和（cumsum）相减得到，每个位置O(1)，不依赖pandas rolling。返回的数组与输入等长，
+    窗口数据不足或窗口内含NaN（缺失K线）的位置为NaN（与pandas rolling一致）；波动率均按periods_per_year年化。
+    逐笔更新的版本见RollingVolatility，两者结果一致。
+    """
+
+    @staticmethod
+    def _rolling_sum(values, window, pad=0):
+        """
+        长度为window的滑动窗口求和，结果对齐到窗口最后一个位置。
+
+        pad为结果开头额外补的NaN个数：由相邻两根K线得到的序列（例如收益率）比价格少一个点，传入pad=1即可
+        直接对齐回价格的下标，不必再复制一次数组。
+        """
+        values = np.asarray(values, dtype=float)
+        result = np.full(len(values) + pad, np.nan)
+        if window <= len(values):
+            # NaN按0累加，另外累计NaN的个数，只有包含NaN的窗口结果为NaN
+            missing = np.isnan(values)
+            has_missing = missing.any()
+            if has_missing:
+                values = np.where(missing, 0.0, values)
+            cumulative = np.empty(len(values) + 1)
+            cumulative[0] = 0.0
+            np.cumsum(values, out=cumulative[1:])
+            windows = result[pad + window - 1:]
+            np.subtract(cumulative[window:], cumulative[:-window], out=windows)
+            if has_missing:
+                missing_count = np.concatenate([[0], np.cumsum(missing)])
+                windows[missing_count[window:] > missing_count[:-window]] = np.nan
+        return result
+
+    @staticmethod
+    def _rolling_mean(values, window, pad=0):
+        result = RealizedVolatility._rolling_sum(values, window, pad)
+        result /= window
+        return result
+
+    @staticmethod
+    def _rolling_variance(values, window, pad=0, ddof=1):
+        # 先减去整体均值再求平方和，避免前缀和相减时的精度损失；大数组上尽量原地计算
+        _check_window(window)
+        values = np.asarray(values, dtype=float)
+        mean = values.mean() if len(values) else 0.0
+        if np.isnan(mean):
+            mean = np.nanmean(values) if not np.isnan(values).all() else 0.0
+        centered = values - mean
+        total = RealizedVolatility._rolling_sum(centered, window, pad)
+        np.square(centered, out=centered)
+        variance = RealizedVolatility._rolling_sum(centered, window, pad)
+        total *= total
+        total /= window
+        variance -= total
+        np.maximum(variance, 0, out=variance)
+        variance /= window - ddof
+        return variance
+
+    @staticmethod
+    def _annualize(variance, periods_per_year):
+        variance *= periods_per_year
+        return np.sqrt(variance, out=variance)
+
+    @staticmethod
+    def log_returns(close):
+        # 返回与close等长的对数收益率，第一个为NaN
+        close = np.asarray(close, dtype=float)
+        result = np.full(close.shape, np.nan)
+        result[1:] = np.diff(np.log(close))
+        return result
+
+    @staticmethod
+    def rolling_return(close, window):
+        # 过去window根K线的简单收益率 close[t] / close[t - window] - 1
+        close = np.asarray(close, dtype=float)
+        result = np.full(close.shape, np.nan)
+        result[window:] = close[window:] / close[:-window] - 1
+        return result
+
+    @staticmethod
+    def close_to_close(close, window, periods_per_year=MINUTES_PER_YEAR):
+        # 最近window个对数收益率的样本标准差
+        close = np.asarray(close, dtype=float)
+        returns = np.diff(np.log(close))
+        variance = RealizedVolatility._rolling_variance(returns, window, pad=1)
+        return RealizedVolatility._annualize(variance, periods_per_year)
+
+    @staticmethod
+    def parkinson(high, low, window, periods_per_year=MINUTES_PER_YEAR):
+        # 只用最高价/最低价：sigma^2 = mean(ln(H/L)^2) / (4 ln2)
+        terms = np.log(np.asarray(high, dtype=float) / np.asarray(low, dtype=float)) ** 2 / (4 * math.log(2))
+        return RealizedVolatility._annualize(RealizedVolatility._rolling_mean(terms, window), periods_per_year)
+
+    @staticmethod
+    def garman_klass(open_price, high, low, close, window, periods_per_year=MINUTES_PER_YEAR):
+        # sigma^2 = mean(0.5 ln(H/L)^2 - (2 ln2 - 1) ln(C/O)^2)
+        open_price, high, low, close = (np.asarray(x, dtype=float) for x in (open_price, high, low, close))
+        terms = 0.5 * np.log(high / low) ** 2 - (2 * math.log(2) - 1) * np.log(close / open_price) ** 2
+        return RealizedVolatility._annualize(RealizedVolatility._rolling_mean(terms, window), periods_per_year)
+
+    @staticmethod
+    def rogers_satchell_terms(open_price, high, low, close):
+        # ln(H/C) ln(H/O) + ln(L/C) ln(L/O)，不受漂移影响
+        open_price, high, low, close = (np.asarray(x, dtype=float) for x in (open_price, high, low, close))
+        return np.log(high / close) * np.log(high / open_price) + np.log(low / close) * np.log(low / open_price)
+
+    @staticmethod
+    def yang_zhang(open_price, high, low, close, window, periods_per_year=MINUTES_PER_YEAR):
+        """
+        Yang-Zhang波动率: sigma^2 = sigma_o^2 + k * sigma_c^2 + (1 - k) * sigma_rs^2。
+
+        sigma_o为跳空收益 ln(O_t / C_t-1) 的样本方差，sigma_c为 ln(C_t / O_t) 的样本方差，sigma_rs为
+        Rogers-Satchell项的均值，k = 0.34 / (1.34 + (n + 1) / (n - 1))。第一根K线没有前一收盘价，不参与计算。
+        """
+        _check_window(window)
+        open_price, high, low, close = (np.asarray(x, dtype=float) for x in (open_price, high, low, close))
+        overnight = np.log(open_price[1:] / close[:-1])
+        open_to_close = np.log(close[1:] / open_price[1:])
+        rogers_satchell = RealizedVolatility.rogers_satchell_terms(open_price, high, low, close)[1:]
+        k = 0.34 / (1.34 + (window + 1) / (window - 1))
+        variance = (RealizedVolatility._rolling_variance(overnight, window, pad=1)
+                    + k * RealizedVolatility._rolling_variance(open_to_close, window, pad=1)
+                    + (1 - k) * RealizedVolatility._rolling_mean(rogers_satchell, window, pad=1))
+        return RealizedVolatility._annualize(np.maximum(variance, 0), periods_per_year)
+
+    @staticmethod
+    def rolling_correlation(x, y, window):
+        # 两个等长序列（例如两只股票对齐后的对数收益率）的滚动Pearson相关系数
+        _check_window(window)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        # 任一序列缺失的位置两边都视为缺失，与pandas的成对处理一致
+        missing = np.isnan(x) | np.isnan(y)
+        x = np.where(missing, np.nan, x)
+        y = np.where(missing, np.nan, y)
+        if not missing.all():
+            x -= x[~missing].mean()
+            y -= y[~missing].mean()
+        sum_x, sum_y = RealizedVolatility._rolling_sum(x, window), RealizedVolatility._rolling_sum(y, window)
+        covariance = RealizedVolatility._rolling_sum(x * y, window) - sum_x * sum_y / window
+        variance_x = RealizedVolatility._rolling_sum(x * x, window) - sum_x ** 2 / window
+        variance_y = RealizedVolatility._rolling_sum(y * y, window) - sum_y ** 2 / window
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.clip(covariance / np.sqrt(variance_x * variance_y), -1, 1)
+
+    @staticmethod
+    def compute(bars, window, periods_per_year=MINUTES_PER_YEAR):
+        """
+        参数:
+        bars (pd.DataFrame 或 dict): 包含 Open、High、Low、Close 列，例如 {ticker}_minute_data.csv 或
+                                     MockMinuteDataProvider.bars() 的结果。
+        window (int): 滚动窗口长度（K线根数）。
+
+        返回:
+        dict: 与K线等长的 'close_to_close'、'parkinson'、'garman_klass'、'yang_zhang'（年化波动率）
+              和 'rolling_return'（window根K线的收益率）。
+        """
+        open_price, high, low, close = (np.asarray(bars[column], dtype=float)
+                                        for column in ('Open', 'High', 'Low', 'Close'))
+        return {
+            'close_to_close': RealizedVolatility.close_to_close(close, window, periods_per_year),
+            'parkinson': RealizedVolatility.parkinson(high, low, window, periods_per_year),
+            'garman_klass': RealizedVolatility.garman_klass(open_price, high, low, close, window, periods_per_year),
+            'yang_zhang': RealizedVolatility.yang_zhang(open_price, high, low, close, window, periods_per_year),
+            'rolling_return': RealizedVolatility.rolling_return(close, window),
+        }
+
+
+class RollingMoments:
+
+    def __init__(self, window):
+        """
+        定长窗口内的和与平方和，每次更新O(1)。
+
+        每滚动满一个窗口就用缓冲区重新求和一次（均摊仍为O(1)），防止长时间运行时加减累积的浮点误差。
+        """
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.squares = 0.0
+        self._updates = 0
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            removed = self.values[0]
+            self.total -= removed
+            self.squares -= removed * removed
+        self.values.append(value)
+        self.total += value
+        self.squares += value * value
+        self._updates += 1
+        if self._updates % self.window == 0:
+            self.total = math.fsum(self.values)
+            self.squares = math.fsum(v * v for v in self.values)
+
+    def is_full(self):
+        return len(self.values) == self.window
+
+    def mean(self):
+        return self.total / self.window if self.is_full() else float('nan')
+
+    def variance(self, ddof=1):
+        # 窗口未满时为NaN；与RealizedVolatility._rolling_variance一致
+        if not self.is_full():
+            return float('nan')
+        return max(self.squares - self.total * self.total / self.window, 0.0) / (self.window - ddof)
+
+
+class RollingVolatility:
+
+    def __init__(self, window, periods_per_year=MINUTES_PER_YEAR):
+        """
+        RealizedVolatility的逐笔更新版本，每根K线或每个价格O(1)，供实盘的Stock.update使用。
+
+        参数:
+        window (int): 滚动窗口长度（更新次数），至少为2。
+        periods_per_year (float): 每年的更新次数，用于年化；None表示根据update传入的时间戳，
+                                  按窗口内更新间隔的中位数换算（TRADING_SECONDS_PER_YEAR / 间隔），
+                                  适用于间隔随机的轮询。用中位数是为了不被隔夜等长间隔拉偏。
+        """
+        _check_window(window)
+        self.window = window
+        self.periods_per_year = periods_per_year
+        self.timestamps = deque(maxlen=window + 1)
+        self.returns = RollingMoments(window)
+        self.parkinson_terms = RollingMoments(window)
+        self.garman_klass_terms = RollingMoments(window)
+        # Yang-Zhang的三项都从第二根K线开始（需要前一收盘价），与批量版本对齐
+        self.overnight = RollingMoments(window)
+        self.open_to_close = RollingMoments(window)
+        self.rogers_satchell_terms = RollingMoments(window)
+        self.closes = deque(maxlen=window + 1)
+        self.previous_close = None
+
+    def update(self, close, open_price=None, high=None, low=None, timestamp=None):
+        """
+        加入一根K线。只有价格（例如Stock轮询到的最新价）时只传close，此时只更新收盘价相关的统计，
+        Parkinson/Garman-Klass/Yang-Zhang保持NaN。timestamp（秒）在periods_per_year为None时用于年化。
+        """
+        close = float(close)
+        if timestamp is not None:
+            self.timestamps.append(float(timestamp))
+        if self.previous_close is not None:
+            self.returns.update(math.log(close / self.previous_close))
+        if high is not None and low is not None and open_price is not None:
+            log_high_low = math.log(high / low)
+            log_close_open = math.log(close / open_price)
+            self.parkinson_terms.update(log_high_low ** 2 / (4 * math.log(2)))
+            self.garman_klass_terms.update(0.5 * log_high_low ** 2 - (2 * math.log(2) - 1) * log_close_open ** 2)
+            if self.previous_close is not None:
+                self.overnight.update(math.log(open_price / self.previous_close))
+                self.open_to_close.update(log_close_open)
+                self.rogers_satchell_terms.update(math.log(high / close) * math.log(high / open_price)
+                                                  + math.log(low / close) * math.log(low / open_price))
+        self.closes.append(close)
+        self.previous_close = close
+
+    def annualization_factor(self):
+        if self.periods_per_year is not None:
+            return self.periods_per_year
+        if len(self.timestamps) < 2:
+            return float('nan')
+        interval = float(np.median(np.diff(self.timestamps)))
+        return TRADING_SECONDS_PER_YEAR / interval if interval > 0 else float('nan')
+
+    def _annualize(self, variance):
+        periods_per_year = self.annualization_factor()
+        if variance != variance or periods_per_year != periods_per_year:
+            return float('nan')
+        return math.sqrt(variance * periods_per_year)
+
+    def close_to_close(self):
+        return self._annualize(self.returns.variance())
+
+    def parkinson(self):
+        return self._annualize(self.parkinson_terms.mean())
+
+    def garman_klass(self):
+        return self._annualize(self.garman_klass_terms.mean())
+
+    def yang_zhang(self):
+        k = 0.34 / (1.34 + (self.window + 1) / (self.window - 1))
+        variance = (self.overnight.variance() + k * self.open_to_close.variance()
+                    + (1 - k) * self.rogers_satchell_terms.mean())
+        return self._annualize(max(variance, 0.0) if variance == variance else variance)
+
+    def rolling_return(self):
+        if len(self.closes) <= self.window:
+            return float('nan')
+        return self.closes[-1] / self.closes[0] - 1
+
+
+class RollingCorrelation:
+
+    def __init__(self, window):
+        # RealizedVolatility.rolling_correlation的逐笔更新版本
+        _check_window(window)
+        self.window = window
+        self.x = RollingMoments(window)
+        self.y = RollingMoments(window)
+        self.products = RollingMoments(window)
+
+    def update(self, x, y):
+        self.x.update(x)
+        self.y.update(y)
+        self.products.update(x * y)
+
+    def correlation(self):
+        if not self.x.is_full():
+            return float('nan')
+        n = self.window
+        covariance = self.products.total - self.x.total * self.y.total / n
+        variance_x = self.x.squares - self.x.total ** 2 / n
+        variance_y = self.y.squares - self.y.total ** 2 / n
+        if variance_x <= 0 or variance_y <= 0:
+            return float('nan')
+        return min(max(covariance / math.sqrt(variance_x * variance_y), -1.0), 1.0)
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+
+    bars = pd.read_csv('test/AAPL_minute_data.csv')
+    window = 30
+    start = time.perf_counter()
+    result = RealizedVolatility.compute(bars, window)
+    print(f"Batch estimators over {len(bars):,} bars in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    # 与pandas rolling对比
+    returns = np.log(bars['Close']).diff()
+    expected = returns.rolling(window).std() * np.sqrt(MINUTES_PER_YEAR)
+    print(f"Max close-to-close difference vs pandas: {np.nanmax(np.abs(result['close_to_close'] - expected)):.2e}")
+
+    # 逐根K线更新，与批量结果对比
+    rolling = RollingVolatility(window)
+    incremental = {name: np.empty(len(bars)) for name in ('close_to_close', 'parkinson', 'garman_klass',
+                                                           'yang_zhang', 'rolling_return')}
+    start = time.perf_counter()
+    for i, (open_price, high, low, close) in enumerate(bars[['Open', 'High', 'Low', 'Close']].itertuples(index=False)):
+        rolling.update(close, open_price, high, low)
+        for name, values in incremental.items():
+            values[i] = getattr(rolling, name)()
+    elapsed = time.perf_counter() - start
+    print(f"Incremental updates: {elapsed / len(bars) * 1e6:.1f}us per bar")
+    for name, values in incremental.items():
+        print(f"  {name:>15}: last {values[-1]:.4f}, max difference vs batch "
+              f"{np.nanmax(np.abs(values - result[name])):.2e}")
+
+    # 已实现波动率与PutOptionPriceCalculator.py中使用的隐含波动率0.4614对比
+    print(f"Latest realized vol (Yang-Zhang, {window} min): {result['yang_zhang'][-1]:.2%} vs implied 46.14%")
+
+    # 缺失K线只影响包含它的窗口
+    gapped = bars['Close'].to_numpy().copy()
+    gapped[1000] = np.nan
+    volatility = RealizedVolatility.close_to_close(gapped, window)
+    expected = np.log(pd.Series(gapped)).diff().rolling(window).std().to_numpy() * np.sqrt(MINUTES_PER_YEAR)
+    print(f"With one missing close: {np.isnan(volatility).sum()} NaN (pandas {np.isnan(expected).sum()}), "
+          f"max difference {np.nanmax(np.abs(volatility - expected)):.2e}")
+
+    # 滚动相关系数：收盘收益率与开盘跳空的相关性
+    overnight = np.log(bars['Open'].to_numpy()[1:] / bars['Close'].to_numpy()[:-1])
+    correlation = RealizedVolatility.rolling_correlation(returns.to_numpy()[1:], overnight, window)
+    expected = pd.Series(returns.to_numpy()[1:]).rolling(window).corr(pd.Series(overnight))
+    print(f"Max rolling correlation difference vs pandas: {np.nanmax(np.abs(correlation - expected)):.2e}")
+
+    # 大规模历史：1000万根K线
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, 10_000_000)))
+    start = time.perf_counter()
+    RealizedVolatility.close_to_close(close, 390)
+    print(f"Close-to-close over 10,000,000 bars: {time.perf_counter() - start:.3f}s")
+    start = time.perf_counter()
+    pd.Series(np.log(close)).diff().rolling(390).std()
+    print(f"pandas rolling std over 10,000,000 bars: {time.perf_counter() - start:.3f}s")